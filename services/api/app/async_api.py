@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+from functools import partial
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import get_async_db
+from . import cache, crud, crud_async, etag, startup
+from .expand import DEVIS, VENTE, parse_expand
+from .models import Devis, Produit, Vente
+from .pagination import decode_cursor, page_response
+from .schemas import ProduitOut, DevisSummaryOut, DevisOut, DevisProduitOut, VenteOut
+
+# Endpoints async (DB_MODE=async): même contrat que ceux de main.py, servis
+# par asyncpg/AsyncSession sans passer par le threadpool. Le router est inclus
+# avant les routes sync, qu'il masque donc pour les mêmes chemins; il est
+# exclu du schéma OpenAPI (la doc reste celle des routes sync, identique).
+router = APIRouter(include_in_schema=False)
+
+
+# GET conditionnels: mêmes ETag que main.py (etag.py)
+async def _page_or_304(db: AsyncSession, page, model, limit: int, if_none_match: str | None) -> Response:
+    tag = await etag.page_etag_async(db, page, model)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    return etag.tagged(page_response(await crud_async.fetch_page(db, page), limit), tag)
+
+
+async def _detail_or_304(tag: str | None, if_none_match: str | None, load, schema, not_found: str) -> Response:
+    if tag is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    obj = await load()
+    if obj is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    return etag.tagged(ORJSONResponse(schema.model_validate(obj).model_dump()), tag)
+
+
+# Health
+@router.get("/health")
+async def health(db: AsyncSession = Depends(get_async_db)):
+    await db.execute(text("SELECT 1"))
+    return {"status": "ok", "seed": startup.seed_state.as_dict()}
+
+
+# --- Produits ---
+@router.get("/produits", response_model=list[ProduitOut])
+async def list_produits(
+    limit: int = 50,
+    offset: int = 0,
+    cursor: str | None = None,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    key, hit = await cache.lookup_async(cache.PRODUITS, limit, offset, cursor)
+    if hit is not None:
+        return etag.conditional(hit, if_none_match)
+    page = crud.produits_page(limit, offset, decode_cursor(cursor))
+    return await cache.store_async(key, await _page_or_304(db, page, Produit, limit, if_none_match))
+
+
+@router.post("/produits", response_model=ProduitOut)
+async def create_produit(
+    sku: str,
+    name: str,
+    unit_price: float | None = None,
+    currency: str = "EUR",
+    description: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    existing = await crud_async.get_produit_by_sku(db, sku=sku)
+    if existing:
+        raise HTTPException(status_code=409, detail="SKU already exists")
+    return await crud_async.create_produit(db, sku=sku, name=name, unit_price=unit_price, currency=currency, description=description)
+
+
+@router.get("/produits/{produit_id}", response_model=ProduitOut)
+async def get_produit(
+    produit_id: int, if_none_match: str | None = Header(None), db: AsyncSession = Depends(get_async_db)
+):
+    key, hit = await cache.lookup_async(cache.PRODUIT, produit_id)
+    if hit is not None:
+        return etag.conditional(hit, if_none_match)
+    tag = await etag.detail_etag_async(db, Produit, produit_id)
+    load = partial(crud_async.get_produit, db, produit_id)
+    return await cache.store_async(key, await _detail_or_304(tag, if_none_match, load, ProduitOut, "Produit not found"))
+
+
+@router.delete("/produits/{produit_id}")
+async def delete_produit(produit_id: int, db: AsyncSession = Depends(get_async_db)):
+    ok = await crud_async.delete_produit(db, produit_id)
+    if not ok:
+        raise HTTPException(status_code=404, detail="Produit not found")
+    return {"deleted": True}
+
+
+# --- Devis ---
+@router.get("/devis", response_model=list[DevisSummaryOut])
+async def list_devis(
+    limit: int = 50,
+    offset: int = 0,
+    cursor: str | None = None,
+    expand: str | None = None,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    names = parse_expand(expand, DEVIS)
+    if not names:
+        page = crud.devis_page(limit, offset, decode_cursor(cursor))
+        return await _page_or_304(db, page, Devis, limit, if_none_match)
+    rows = await crud_async.list_devis_expanded(
+        db, names, limit=limit, offset=offset, before_id=decode_cursor(cursor)
+    )
+    return page_response(rows, limit)
+
+
+@router.post("/devis", response_model=DevisOut)
+async def create_devis(
+    owner_id: int,
+    entreprise_id: int,
+    code: str,
+    interlocuteur_id: int | None = None,
+    campagne_id: int | None = None,
+    title: str | None = None,
+    status: str = "draft",
+    currency: str = "EUR",
+    notes: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    existing = await crud_async.get_devis_by_code(db, code=code)
+    if existing:
+        raise HTTPException(status_code=409, detail="Devis code already exists")
+    return await crud_async.create_devis(
+        db,
+        owner_id=owner_id,
+        entreprise_id=entreprise_id,
+        interlocuteur_id=interlocuteur_id,
+        campagne_id=campagne_id,
+        code=code,
+        title=title,
+        status=status,
+        currency=currency,
+        notes=notes,
+    )
+
+
+@router.get("/devis/{devis_id}", response_model=DevisOut)
+async def get_devis(
+    devis_id: int,
+    expand: str | None = None,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    names = parse_expand(expand, DEVIS)
+    if names:
+        # toujours avec les lignes: reste un sur-ensemble de DevisOut
+        d = await crud_async.get_devis_expanded(db, devis_id, names | {"lines"})
+        if not d:
+            raise HTTPException(status_code=404, detail="Devis not found")
+        return ORJSONResponse(d)
+    key, hit = await cache.lookup_async(cache.DEVIS, devis_id)
+    if hit is not None:
+        return etag.conditional(hit, if_none_match)
+    tag = await etag.devis_etag_async(db, devis_id)
+    load = partial(crud_async.get_devis, db, devis_id)
+    return await cache.store_async(key, await _detail_or_304(tag, if_none_match, load, DevisOut, "Devis not found"))
+
+
+@router.get("/devis/{devis_id}/lines", response_model=list[DevisProduitOut])
+async def list_devis_lines(devis_id: int, db: AsyncSession = Depends(get_async_db)):
+    d = await crud_async.get_devis(db, devis_id)
+    if not d:
+        raise HTTPException(status_code=404, detail="Devis not found")
+    return ORJSONResponse(await crud_async.list_devis_lines(db, devis_id=devis_id))
+
+
+@router.post("/devis/{devis_id}/lines", response_model=DevisProduitOut)
+async def add_or_update_devis_line(
+    devis_id: int,
+    produit_id: int,
+    quantity: int = 1,
+    unit_price: float | None = None,
+    currency: str = "EUR",
+    db: AsyncSession = Depends(get_async_db),
+):
+    line = await crud_async.add_or_update_devis_line(
+        db,
+        devis_id=devis_id,
+        produit_id=produit_id,
+        quantity=quantity,
+        unit_price=unit_price,
+        currency=currency,
+    )
+    if not line:
+        raise HTTPException(status_code=404, detail="Devis or Produit not found")
+    return line
+
+
+@router.delete("/devis/{devis_id}/lines/{produit_id}")
+async def remove_devis_line(devis_id: int, produit_id: int, db: AsyncSession = Depends(get_async_db)):
+    ok = await crud_async.remove_devis_line(db, devis_id=devis_id, produit_id=produit_id)
+    if not ok:
+        raise HTTPException(status_code=404, detail="Line not found")
+    return {"deleted": True}
+
+
+# --- Ventes ---
+@router.get("/ventes", response_model=list[VenteOut])
+async def list_ventes(
+    limit: int = 50,
+    offset: int = 0,
+    cursor: str | None = None,
+    expand: str | None = None,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    names = parse_expand(expand, VENTE)
+    if not names:
+        page = crud.ventes_page(limit, offset, decode_cursor(cursor))
+        return await _page_or_304(db, page, Vente, limit, if_none_match)
+    rows = await crud_async.list_ventes_expanded(
+        db, names, limit=limit, offset=offset, before_id=decode_cursor(cursor)
+    )
+    return page_response(rows, limit)
+
+
+@router.post("/ventes/from-devis", response_model=VenteOut)
+async def create_vente_from_devis(
+    owner_id: int,
+    entreprise_id: int,
+    devis_id: int,
+    interlocuteur_id: int | None = None,
+    campagne_id: int | None = None,
+    reference: str | None = None,
+    status: str = "open",
+    probability: int | None = None,
+    notes: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    v = await crud_async.create_vente_from_devis(
+        db,
+        owner_id=owner_id,
+        entreprise_id=entreprise_id,
+        devis_id=devis_id,
+        interlocuteur_id=interlocuteur_id,
+        campagne_id=campagne_id,
+        reference=reference,
+        status=status,
+        probability=probability,
+        notes=notes,
+    )
+    if not v:
+        raise HTTPException(status_code=404, detail="Devis not found")
+    return v
+
+
+@router.get("/ventes/{vente_id}", response_model=VenteOut)
+async def get_vente(
+    vente_id: int,
+    expand: str | None = None,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    names = parse_expand(expand, VENTE)
+    if names:
+        v = await crud_async.get_vente_expanded(db, vente_id, names)
+        if not v:
+            raise HTTPException(status_code=404, detail="Vente not found")
+        return ORJSONResponse(v)
+    tag = await etag.detail_etag_async(db, Vente, vente_id)
+    load = partial(crud_async.get_vente, db, vente_id)
+    return await _detail_or_304(tag, if_none_match, load, VenteOut, "Vente not found")
@@ -0,0 +1,396 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import rollups
+from .bulk import IdAllocator, TableLoadStats, copy_columns, disabled_triggers, log_load_stats
+from .columnar import ACTION_KINDS, ColumnBatch, _encode, concat, digits, pick
+from .db import SessionLocal
+from .models import Campagne, Interlocuteur, Produit, User
+from .partitioning import ensure_partitions, split_default
+
+logger = logging.getLogger(__name__)
+
+# Backfill historique sur horloge virtuelle: rejoue N années d'activité CRM
+# (actions, cycle de vie des devis draft -> sent -> accepted/rejected/expired,
+# ventes open -> won/lost) sur les entreprises / users / produits existants.
+#
+# Le cycle de vie de chaque entité est tiré à sa création (dates de chaque
+# transition), puis l'état final "vu depuis `end`" est écrit une seule fois:
+# une transition postérieure à `end` n'a pas encore eu lieu. Pas d'UPDATE,
+# uniquement du COPY, par mois virtuel (une transaction par mois), dans
+# l'ordre chronologique: les lots suivent le découpage temporel des tables.
+#
+# Déterministe pour (seed, start, end, débits): chaque mois a ses flux RNG
+# dérivés de (seed, mois), comme les blocs de columnar.py.
+#
+#   python -m app.backfill --years 3 --actions-per-day 500 --devis-per-day 80
+
+BACKFILL_TABLES = ("devis", "devis_produits", "ventes", "actions")
+
+DEVIS_VALIDITY_DAYS = 30
+P_SENT = 0.85  # draft -> sent
+P_ACCEPTED = 0.35  # sent -> accepted (sinon rejected / expired)
+P_REJECTED = 0.30
+P_VENTE = 0.9  # accepted -> vente
+P_WON = 0.6  # vente open -> won (sinon lost)
+P_ACTION_DONE = 0.75
+P_ACTION_CANCELED = 0.10
+
+_DAY = np.timedelta64(86_400, "s")
+
+
+def _seconds(rng: np.random.Generator, lo_days: float, hi_days: float, n: int) -> np.ndarray:
+    return (rng.uniform(lo_days, hi_days, n) * 86_400).astype("timedelta64[s]")
+
+
+def _month_starts(start: datetime, end: datetime) -> list[datetime]:
+    months = []
+    m = start.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while m < end:
+        months.append(m)
+        m = (m + timedelta(days=32)).replace(day=1)
+    return months
+
+
+@dataclass
+class MonthPlan:
+    """Volumes et issues du cycle de vie d'un mois (flux RNG "structure")."""
+
+    month: int
+    start: np.datetime64
+    end: np.datetime64
+    n_actions: int
+    devis_created: np.ndarray  # datetime64[s]
+    devis_status: np.ndarray  # statut final (bytes)
+    devis_updated: np.ndarray  # date de la dernière transition
+    accepted_at: np.ndarray  # NaT si pas accepté
+    n_lines: np.ndarray
+    vente_mask: np.ndarray
+
+    @property
+    def counts(self) -> dict[str, int]:
+        return {
+            "devis": len(self.devis_created),
+            "devis_produits": int(self.n_lines.sum()),
+            "ventes": int(self.vente_mask.sum()),
+            "actions": self.n_actions,
+        }
+
+
+class BackfillGenerator:
+    def __init__(
+        self,
+        seed: int,
+        *,
+        start: datetime,
+        end: datetime,
+        actions_per_day: float,
+        devis_per_day: float,
+        user_ids: np.ndarray,
+        interlocuteurs: np.ndarray,  # (n, 2): id, entreprise_id
+        campagne_ids: np.ndarray,
+        produit_ids: np.ndarray,
+        produit_prices: np.ndarray,
+    ):
+        self.seed = seed
+        self.actions_per_day = actions_per_day
+        self.devis_per_day = devis_per_day
+        self.user_ids = user_ids
+        self.interlocuteurs = interlocuteurs
+        self.campagne_ids = campagne_ids
+        self.produit_ids = produit_ids
+        self.produit_prices = produit_prices
+
+        self.months = _month_starts(start, end)
+        self.start = np.datetime64(start.replace(microsecond=0), "s")
+        self.end = np.datetime64(end.replace(microsecond=0), "s")
+
+    def _rng(self, *key: int) -> np.random.Generator:
+        return np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=key))
+
+    def _bounds(self, month: int) -> tuple[np.datetime64, np.datetime64]:
+        lo = max(np.datetime64(self.months[month], "s"), self.start)
+        hi = np.datetime64(self.months[month + 1], "s") if month + 1 < len(self.months) else self.end
+        return lo, min(hi, self.end)
+
+    def plan(self, month: int) -> MonthPlan:
+        rng = self._rng(month, 0)
+        lo, hi = self._bounds(month)
+        days = (hi - lo) / _DAY
+        end = self.end
+
+        n_actions = int(rng.poisson(self.actions_per_day * days))
+        nd = int(rng.poisson(self.devis_per_day * days))
+        created = np.sort(lo + (rng.random(nd) * (hi - lo).astype(np.int64)).astype("timedelta64[s]"))
+
+        # draft -> sent -> accepted / rejected / (sans réponse) expired
+        sent_at = created + _seconds(rng, 0, 5, nd)
+        is_sent = (rng.random(nd) < P_SENT) & (sent_at <= end)
+        answer = rng.random(nd)
+        answered_at = sent_at + _seconds(rng, 1, DEVIS_VALIDITY_DAYS - 5, nd)
+        expires_at = created.astype("datetime64[D]") + np.timedelta64(DEVIS_VALIDITY_DAYS + 1, "D")
+        is_accepted = is_sent & (answer < P_ACCEPTED) & (answered_at <= end)
+        is_rejected = is_sent & (answer >= P_ACCEPTED) & (answer < P_ACCEPTED + P_REJECTED) & (answered_at <= end)
+        is_expired = is_sent & ~is_accepted & ~is_rejected & (expires_at <= end) & (answer >= P_ACCEPTED + P_REJECTED)
+
+        status = np.full(nd, b"draft", dtype="S8")
+        updated = created.copy()
+        status[is_sent] = b"sent"
+        updated[is_sent] = sent_at[is_sent]
+        for mask, name, at in (
+            (is_accepted, b"accepted", answered_at),
+            (is_rejected, b"rejected", answered_at),
+            (is_expired, b"expired", expires_at.astype("datetime64[s]")),
+        ):
+            status[mask] = name
+            updated[mask] = at[mask]
+
+        accepted_at = np.where(is_accepted, answered_at, np.datetime64("NaT"))
+        n_lines = np.minimum(rng.integers(1, 5, nd), len(self.produit_ids))
+        vente_mask = is_accepted & (rng.random(nd) < P_VENTE)
+        return MonthPlan(month, lo, hi, n_actions, created, status, updated, accepted_at, n_lines, vente_mask)
+
+    def month_batches(self, plan: MonthPlan, first_ids: dict[str, int]) -> list[ColumnBatch]:
+        rng = self._rng(plan.month, 1)
+        counts = plan.counts
+        ids = {t: first_ids[t] + np.arange(counts[t], dtype=np.int64) for t in BACKFILL_TABLES}
+        end = self.end
+
+        # DEVIS
+        nd = counts["devis"]
+        d_inter = self.interlocuteurs[rng.integers(0, len(self.interlocuteurs), nd)]
+        d_owner = pick(rng, self.user_ids, nd)
+        d_camp = pick(rng, self.campagne_ids, nd)
+        d_camp_null = rng.random(nd) >= 0.6
+        issue_date = plan.devis_created.astype("datetime64[D]")
+
+        # LIGNES: 1 à 4 produits distincts par devis
+        n_prod = len(self.produit_ids)
+        order = np.argsort(rng.random((nd, n_prod)), axis=1)
+        chosen = np.arange(n_prod)[None, :] < plan.n_lines[:, None]
+        line_prod = order[chosen]
+        line_devis = np.repeat(np.arange(nd), plan.n_lines)
+        qty = rng.integers(1, 11, len(line_prod))
+        unit_price = self.produit_prices[line_prod]
+        line_total = np.round(qty * unit_price, 2)
+        totals = np.round(np.bincount(line_devis, weights=line_total, minlength=nd), 2)
+
+        devis = ColumnBatch(
+            "devis",
+            {
+                "id": ids["devis"],
+                "owner_id": d_owner,
+                "entreprise_id": d_inter[:, 1],
+                "interlocuteur_id": d_inter[:, 0],
+                "campagne_id": d_camp,
+                "code": concat(b"BF-DEV-", digits(ids["devis"], 10)),
+                "title": np.full(nd, b"Devis backfill"),
+                "status": plan.devis_status,
+                "issue_date": issue_date,
+                "valid_until": issue_date + DEVIS_VALIDITY_DAYS,
+                "total_amount": totals,
+                "currency": np.full(nd, b"EUR"),
+                "notes": np.full(nd, b"Backfilled devis"),
+                "created_at": plan.devis_created,
+                "updated_at": plan.devis_updated,
+            },
+            nulls={"campagne_id": d_camp_null},
+        )
+
+        lines = ColumnBatch(
+            "devis_produits",
+            {
+                "id": ids["devis_produits"],
+                "devis_id": ids["devis"][line_devis],
+                "produit_id": self.produit_ids[line_prod],
+                "quantity": qty,
+                "unit_price": unit_price,
+                "currency": np.full(len(line_prod), b"EUR"),
+                "line_total": line_total,
+                "created_at": plan.devis_created[line_devis],
+            },
+        )
+
+        # VENTES: ouvertes à l'acceptation, won/lost à la clôture si avant `end`
+        vm = plan.vente_mask
+        nv = counts["ventes"]
+        v_created = plan.accepted_at[vm].astype("datetime64[s]")
+        v_closed = v_created + _seconds(rng, 5, 60, nv)
+        is_closed = v_closed <= end
+        won = rng.random(nv) < P_WON
+        v_status = np.where(is_closed, np.where(won, b"won", b"lost"), b"open")
+        v_devis_ids = ids["devis"][vm]
+        ventes = ColumnBatch(
+            "ventes",
+            {
+                "id": ids["ventes"],
+                "owner_id": d_owner[vm],
+                "entreprise_id": d_inter[vm, 1],
+                "interlocuteur_id": d_inter[vm, 0],
+                "campagne_id": d_camp[vm],
+                "devis_id": v_devis_ids,
+                "reference": concat(b"BF-SALE-", digits(v_devis_ids, 10)),
+                "amount": totals[vm],
+                "currency": np.full(nv, b"EUR"),
+                "status": v_status,
+                "probability": np.where(is_closed, np.where(won, 100, 0), 50),
+                "expected_close_date": v_created.astype("datetime64[D]") + 30,
+                "closed_at": v_closed,
+                "notes": np.full(nv, b"Backfilled vente"),
+                "created_at": v_created,
+                "updated_at": np.where(is_closed, v_closed, v_created),
+            },
+            nulls={"campagne_id": d_camp_null[vm], "closed_at": ~is_closed},
+        )
+
+        # ACTIONS: échéance 0-14 j après création; done / canceled si échue avant `end`
+        na = counts["actions"]
+        span = (plan.end - plan.start).astype(np.int64)
+        a_created = plan.start + (rng.random(na) * span).astype("timedelta64[s]")
+        due = a_created + _seconds(rng, 0, 14, na)
+        outcome = rng.random(na)
+        is_due = due <= end
+        done_at = due + _seconds(rng, 0, 2, na)
+        is_done = is_due & (outcome < P_ACTION_DONE) & (done_at <= end)
+        is_canceled = is_due & (outcome >= P_ACTION_DONE) & (outcome < P_ACTION_DONE + P_ACTION_CANCELED)
+        a_status = np.where(is_done, b"done", np.where(is_canceled, b"canceled", b"todo"))
+        a_inter = self.interlocuteurs[rng.integers(0, len(self.interlocuteurs), na)]
+        kinds = _encode(ACTION_KINDS)
+        a_kind = pick(rng, kinds, na)
+        actions = ColumnBatch(
+            "actions",
+            {
+                "id": ids["actions"],
+                "owner_id": pick(rng, self.user_ids, na),
+                "entreprise_id": a_inter[:, 1],
+                "interlocuteur_id": a_inter[:, 0],
+                "campagne_id": pick(rng, self.campagne_ids, na),
+                "kind": a_kind,
+                "status": a_status,
+                "title": concat(b"Action ", a_kind),
+                "notes": np.full(na, b"Backfilled action"),
+                "due_at": due,
+                "done_at": done_at,
+                "created_at": a_created,
+                "updated_at": np.where(is_done, done_at, np.where(is_canceled, due, a_created)),
+            },
+            nulls={"campagne_id": rng.random(na) >= 0.5, "done_at": ~is_done},
+        )
+
+        return [devis, lines, ventes, actions]
+
+
+def _load_reference(db: Session) -> dict[str, np.ndarray]:
+    """Ids existants (users, interlocuteurs + entreprise, campagnes, produits + prix)."""
+    produits = db.execute(select(Produit.id, Produit.unit_price).where(Produit.unit_price.is_not(None))).all()
+    return {
+        "user_ids": np.array(db.scalars(select(User.id)).all(), dtype=np.int64),
+        "interlocuteurs": np.array(
+            db.execute(select(Interlocuteur.id, Interlocuteur.entreprise_id)).all(), dtype=np.int64
+        ).reshape(-1, 2),
+        "campagne_ids": np.array(db.scalars(select(Campagne.id)).all(), dtype=np.int64),
+        "produit_ids": np.array([p[0] for p in produits], dtype=np.int64),
+        "produit_prices": np.array([float(p[1]) for p in produits], dtype=np.float64),
+    }
+
+
+def backfill(
+    db: Session,
+    *,
+    years: float = 1.0,
+    end: datetime | None = None,
+    actions_per_day: float = 200.0,
+    devis_per_day: float = 40.0,
+    seed: int = 42,
+) -> dict[str, TableLoadStats]:
+    """
+    Rejoue `years` années d'activité jusqu'à `end` (défaut: maintenant), un
+    mois virtuel par transaction. Nécessite des données de base (seed).
+
+    devis.total_amount est écrit directement (somme des lignes générées) et
+    le trigger d'INSERT de devis_produits est désactivé le temps de chaque
+    mois: il écraserait updated_at avec l'heure du backfill. Contrôle
+    possible après coup avec `python -m app.totals verify`.
+    """
+    # horloge virtuelle en UTC naïf (comme columnar.py)
+    end = end or datetime.now(timezone.utc)
+    if end.tzinfo is not None:
+        end = end.astimezone(timezone.utc).replace(tzinfo=None)
+    start = end - timedelta(days=365.25 * years)
+    ref = _load_reference(db)
+    if not len(ref["user_ids"]) or not len(ref["interlocuteurs"]) or not len(ref["produit_ids"]):
+        raise RuntimeError("backfill needs seeded users, interlocuteurs and produits")
+    if not len(ref["campagne_ids"]):
+        raise RuntimeError("backfill needs at least one campagne")
+
+    gen = BackfillGenerator(
+        seed,
+        start=start,
+        end=end,
+        actions_per_day=actions_per_day,
+        devis_per_day=devis_per_day,
+        **ref,
+    )
+    allocs = {t: IdAllocator(db, t) for t in BACKFILL_TABLES}
+    stats: dict[str, TableLoadStats] = {}
+
+    # partitionnement: un mois virtuel = une partition, créée vide avant le COPY
+    ensure_partitions(db.connection(), start, end)
+    db.commit()
+
+    t0 = time.perf_counter()
+    for month in range(len(gen.months)):
+        plan = gen.plan(month)
+        first_ids = {t: (allocs[t].reserve(n) if n else 0) for t, n in plan.counts.items()}
+        with disabled_triggers(db, "devis_produits", "devis_produits_totals_insert"):
+            for batch in gen.month_batches(plan, first_ids):
+                copy_columns(db, batch, stats=stats)
+        db.commit()
+        logger.info("backfill %s: %s", gen.months[month].strftime("%Y-%m"), plan.counts)
+    split_default(db.connection())  # échéances au-delà de `end`
+    rollups.invalidate(db.connection())  # updated_at historiques: rebuild au prochain refresh
+    db.commit()
+
+    log_load_stats(stats, label="backfill")
+    elapsed = time.perf_counter() - t0
+    total = sum(s.rows for s in stats.values())
+    rate = total / elapsed if elapsed > 0 else 0.0
+    logger.info("backfill %d months, %d rows in %.2fs (%.0f rows/s)", len(gen.months), total, elapsed, rate)
+    return stats
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.backfill")
+    parser.add_argument("--years", type=float, default=1.0, help="simulated years to replay")
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None, help="end of the virtual clock (default: now)")
+    parser.add_argument("--actions-per-day", type=float, default=200.0)
+    parser.add_argument("--devis-per-day", type=float, default=40.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    db = SessionLocal()
+    try:
+        backfill(
+            db,
+            years=args.years,
+            end=args.end,
+            actions_per_day=args.actions_per_day,
+            devis_per_day=args.devis_per_day,
+            seed=args.seed,
+        )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+from __future__ import annotations
+
+import io
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Sequence
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .columnar import ColumnBatch
+
+logger = logging.getLogger(__name__)
+
+
+# STATS
+@dataclass
+class TableLoadStats:
+    table: str
+    rows: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+def log_load_stats(stats: dict[str, TableLoadStats], *, label: str = "seed") -> None:
+    for s in stats.values():
+        logger.info(
+            "%s %-15s %10d rows in %7.2fs (%.0f rows/s)",
+            label,
+            s.table,
+            s.rows,
+            s.seconds,
+            s.rows_per_second,
+        )
+
+
+# IDS (pré-allocation depuis les séquences)
+class IdAllocator:
+    """
+    Réserve des blocs d'ids contigus dans la séquence SERIAL d'une table,
+    pour câbler les FK côté Python sans refresh.
+
+    Le bloc est pris avec `setval(seq, nextval(seq) + n - 1)`: suffisant tant
+    que personne d'autre n'insère dans la table pendant le seed.
+    """
+
+    def __init__(self, db: Session, table: str, block_size: int = 10_000):
+        self.db = db
+        self.table = table
+        self.block_size = block_size
+        self.sequence = db.scalar(text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": table})
+        self._next = 0
+        self._end = 0  # exclusif
+
+    def reserve(self, n: int) -> int:
+        """Réserve `n` ids contigus et renvoie le premier."""
+        if n <= 0:
+            raise ValueError("n must be > 0")
+        last = self.db.scalar(
+            text("SELECT setval(CAST(:seq AS regclass), nextval(CAST(:seq AS regclass)) + :n - 1)"),
+            {"seq": self.sequence, "n": n},
+        )
+        return last - n + 1
+
+    def next(self) -> int:
+        if self._next >= self._end:
+            self._next = self.reserve(self.block_size)
+            self._end = self._next + self.block_size
+        v = self._next
+        self._next += 1
+        return v
+
+    __call__ = next
+
+    def release(self) -> None:
+        """Rend la fin du bloc courant à la séquence (évite les trous après le seed)."""
+        if self._end and self._next < self._end:
+            self.db.execute(
+                text("SELECT setval(CAST(:seq AS regclass), :v)"),
+                {"seq": self.sequence, "v": self._next - 1},
+            )
+            self._end = self._next
+
+
+# TRIGGERS
+@contextmanager
+def disabled_triggers(db: Session, table: str, *triggers: str) -> Iterator[None]:
+    """
+    Désactive des triggers de `table` le temps d'un chargement, dans la
+    transaction courante (ALTER TABLE est transactionnel: un rollback les
+    réactive aussi). Verrouille la table en écriture jusqu'au commit.
+    """
+    for trg in triggers:
+        db.execute(text(f"ALTER TABLE {table} DISABLE TRIGGER {trg}"))
+    yield
+    for trg in triggers:
+        db.execute(text(f"ALTER TABLE {table} ENABLE TRIGGER {trg}"))
+
+
+# INDEX / FK DIFFÉRÉS
+@dataclass
+class SecondaryObjects:
+    """Index secondaires et FK retirés pendant un chargement: (table, nom, DDL)."""
+
+    indexes: list[tuple[str, str, str]]
+    foreign_keys: list[tuple[str, str, str]]
+
+
+def drop_secondary_objects(db: Session, tables: Sequence[str]) -> SecondaryObjects:
+    """
+    Retire les index secondaires et les FK qui touchent `tables` (dans les deux
+    sens), en gardant leur définition pour `rebuild_secondary_objects`. Les PK
+    et contraintes UNIQUE restent en place (ON CONFLICT, cibles des FK).
+    """
+    fks = db.execute(
+        text(
+            """
+            SELECT c.conrelid::regclass::text, c.conname, pg_get_constraintdef(c.oid)
+            FROM pg_constraint c
+            WHERE c.contype = 'f'
+              AND c.conparentid = 0  -- pas les copies portées par les partitions
+              AND (c.conrelid = ANY(CAST(:tables AS regclass[])) OR c.confrelid = ANY(CAST(:tables AS regclass[])))
+            ORDER BY 1, 2
+            """
+        ),
+        {"tables": list(tables)},
+    ).all()
+    indexes = db.execute(
+        text(
+            """
+            SELECT i.tablename, i.indexname, i.indexdef
+            FROM pg_indexes i
+            WHERE i.schemaname = current_schema()
+              AND i.tablename = ANY(:tables)
+              AND NOT EXISTS (
+                  SELECT 1 FROM pg_constraint c
+                  WHERE c.conindid = to_regclass(quote_ident(i.indexname)) AND c.contype IN ('p', 'u', 'x')
+              )
+            ORDER BY 1, 2
+            """
+        ),
+        {"tables": list(tables)},
+    ).all()
+
+    for table, name, _ in fks:
+        db.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"'))
+    for _, name, _ in indexes:
+        db.execute(text(f'DROP INDEX "{name}"'))
+    return SecondaryObjects([tuple(r) for r in indexes], [tuple(r) for r in fks])
+
+
+def partitioned_tables(db, tables: Iterable[str]) -> set[str]:
+    rows = db.execute(
+        text("SELECT relname FROM pg_class WHERE relkind = 'p' AND oid = ANY(CAST(:tables AS regclass[]))"),
+        {"tables": list(tables)},
+    )
+    return {r[0] for r in rows}
+
+
+def add_foreign_key_sql(table: str, name: str, ddl: str, partitioned: bool) -> list[str]:
+    # Postgres refuse NOT VALID sur une table partitionnée: FK validée à l'ajout
+    if partitioned:
+        return [f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {ddl}']
+    return [
+        f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {ddl} NOT VALID',
+        f'ALTER TABLE {table} VALIDATE CONSTRAINT "{name}"',
+    ]
+
+
+def rebuild_secondary_objects(
+    db: Session,
+    objects: SecondaryObjects,
+    *,
+    maintenance_work_mem: str = "512MB",
+    parallel_workers: int = 4,
+    stats: dict[str, TableLoadStats] | None = None,
+) -> None:
+    """
+    Recrée les index (tri parallèle côté serveur: max_parallel_maintenance_workers)
+    puis les FK, ajoutées NOT VALID et validées ensuite (VALIDATE ne prend
+    qu'un verrou SHARE UPDATE EXCLUSIVE). Les durées sont cumulées par table
+    dans `stats` (clé "<table>:index" / "<table>:fk").
+    """
+    db.execute(text(f"SET LOCAL maintenance_work_mem = '{maintenance_work_mem}'"))
+    db.execute(text(f"SET LOCAL max_parallel_maintenance_workers = {int(parallel_workers)}"))
+
+    def timed(table: str, kind: str, *sql: str) -> None:
+        t0 = time.perf_counter()
+        for stmt in sql:
+            db.execute(text(stmt))
+        if stats is not None:
+            s = stats.setdefault(f"{table}:{kind}", TableLoadStats(f"{table}:{kind}"))
+            s.rows += 1
+            s.seconds += time.perf_counter() - t0
+
+    for table, _, ddl in objects.indexes:
+        timed(table, "index", ddl)
+    partitioned = partitioned_tables(db, {t for t, _, _ in objects.foreign_keys})
+    for table, name, ddl in objects.foreign_keys:
+        timed(table, "fk", *add_foreign_key_sql(table, name, ddl, table in partitioned))
+
+
+class DeferredIndexBuild:
+    """
+    Chargement en masse sans index secondaires ni FK (données committées en
+    plusieurs transactions / process):
+
+        build = DeferredIndexBuild(engine, tables, workers=4)
+        ... premier paquet chargé avec les index (étalonnage) ...
+        build.drop(db, stats)
+        ... reste du chargement ...
+        build.rebuild(stats)
+
+    Les index sont reconstruits en parallèle sur `workers` connexions (CREATE
+    INDEX ne prend qu'un verrou SHARE: plusieurs index d'une même table peuvent
+    se construire en même temps), chacune avec `maintenance_work_mem` et
+    `parallel_workers` workers de tri côté serveur. Les FK sont ajoutées NOT
+    VALID puis validées, une connexion par table.
+
+    Le premier paquet, chargé index en place, donne le débit "avec index" de
+    chaque table: le rapport compare le temps estimé avec index pour le reste
+    des lignes au temps réel (chargement + index + FK). Estimation prudente:
+    le coût d'un index grandit avec sa taille.
+    """
+
+    def __init__(
+        self,
+        engine,
+        tables: Sequence[str],
+        *,
+        workers: int = 4,
+        maintenance_work_mem: str = "512MB",
+        parallel_workers: int = 2,
+    ):
+        self.engine = engine
+        self.tables = list(tables)
+        self.workers = max(1, workers)
+        self.maintenance_work_mem = maintenance_work_mem
+        self.parallel_workers = parallel_workers
+        self.objects: SecondaryObjects | None = None
+        self._calibration: dict[str, tuple[int, float]] = {}
+
+    def drop(self, db: Session, stats: dict[str, TableLoadStats]) -> None:
+        self._calibration = {t: (s.rows, s.seconds) for t, s in stats.items()}
+        self.objects = drop_secondary_objects(db, self.tables)
+        db.commit()
+
+    def _run(self, table: str, kind: str, sql: Sequence[str]) -> tuple[str, str, float]:
+        t0 = time.perf_counter()
+        with self.engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL maintenance_work_mem = '{self.maintenance_work_mem}'"))
+            conn.execute(text(f"SET LOCAL max_parallel_maintenance_workers = {int(self.parallel_workers)}"))
+            for stmt in sql:
+                conn.execute(text(stmt))
+        return table, kind, time.perf_counter() - t0
+
+    def rebuild(self, stats: dict[str, TableLoadStats]) -> dict[str, dict[str, float]]:
+        if self.objects is None:
+            return {}
+        timings: dict[str, dict[str, float]] = {}
+
+        def record(results) -> None:
+            for table, kind, seconds in results:
+                t = timings.setdefault(table, {"index": 0.0, "fk": 0.0})
+                t[kind] += seconds
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            record(pool.map(lambda o: self._run(o[0], "index", [o[2]]), self.objects.indexes))
+
+            with self.engine.begin() as conn:
+                partitioned = partitioned_tables(conn, {t for t, _, _ in self.objects.foreign_keys})
+                for table, name, ddl in self.objects.foreign_keys:
+                    if table not in partitioned:  # partitionnée: ajout + validation en une fois, plus bas
+                        conn.execute(text(add_foreign_key_sql(table, name, ddl, False)[0]))
+            by_table: dict[str, list[str]] = {}
+            for table, name, ddl in self.objects.foreign_keys:
+                by_table.setdefault(table, []).append(add_foreign_key_sql(table, name, ddl, table in partitioned)[-1])
+            record(pool.map(lambda item: self._run(item[0], "fk", item[1]), by_table.items()))
+
+        self.objects = None
+        self._report(stats, timings)
+        return timings
+
+    def _report(self, stats: dict[str, TableLoadStats], timings: dict[str, dict[str, float]]) -> None:
+        for table in self.tables:
+            s = stats.get(table)
+            t = timings.get(table, {"index": 0.0, "fk": 0.0})
+            c_rows, c_seconds = self._calibration.get(table, (0, 0.0))
+            rest_rows = (s.rows if s else 0) - c_rows
+            rest_seconds = (s.seconds if s else 0.0) - c_seconds
+            actual = rest_seconds + t["index"] + t["fk"]
+            if rest_rows > 0 and c_rows > 0 and c_seconds > 0:
+                estimated = rest_rows * c_seconds / c_rows
+                saved = f"{estimated - actual:+.2f}s saved (est. {estimated:.2f}s with indexes)"
+            else:
+                saved = "no calibration"
+            logger.info(
+                "deferred %-15s load %7.2fs + index %6.2fs + fk %6.2fs = %7.2fs, %s",
+                table,
+                rest_seconds,
+                t["index"],
+                t["fk"],
+                actual,
+                saved,
+            )
+
+
+def reset_sequences(db: Session, tables: Sequence[str]) -> None:
+    """Repositionne la séquence `id` de chaque table sur max(id) (après un chargement avec ids)."""
+    for table in tables:
+        db.execute(
+            text(
+                f"""
+                SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL)
+                FROM {table}
+                """
+            )
+        )
+
+
+# COPY FROM STDIN
+def _copy_value(v) -> str:
+    if v is None:
+        return "\\N"
+    if v is True:
+        return "t"
+    if v is False:
+        return "f"
+    s = str(v)
+    if "\\" in s or "\t" in s or "\n" in s or "\r" in s:
+        s = s.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return s
+
+
+def copy_rows(
+    db: Session,
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence],
+    *,
+    batch_size: int = 50_000,
+    stats: dict[str, TableLoadStats] | None = None,
+) -> int:
+    """
+    Écrit `rows` (tuples dans l'ordre de `columns`) via `COPY ... FROM STDIN`
+    dans la transaction courante de la session. Les lignes sont envoyées par
+    paquets de `batch_size` pour borner la mémoire du buffer.
+    """
+    raw = db.connection().connection.dbapi_connection
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+
+    t0 = time.perf_counter()
+    total = 0
+    buf = io.StringIO()
+    pending = 0
+
+    with raw.cursor() as cur:
+        for row in rows:
+            buf.write("\t".join(map(_copy_value, row)))
+            buf.write("\n")
+            pending += 1
+            if pending >= batch_size:
+                buf.seek(0)
+                cur.copy_expert(sql, buf)
+                total += pending
+                pending = 0
+                buf = io.StringIO()
+        if pending:
+            buf.seek(0)
+            cur.copy_expert(sql, buf)
+            total += pending
+
+    if stats is not None:
+        s = stats.setdefault(table, TableLoadStats(table))
+        s.rows += total
+        s.seconds += time.perf_counter() - t0
+    return total
+
+
+def _copy_column(values: np.ndarray, nulls: np.ndarray | None) -> np.ndarray:
+    kind = values.dtype.kind
+    if kind == "b":
+        out = np.where(values, b"t", b"f")
+    elif kind == "S":
+        out = values
+        for ch, esc in ((b"\\", b"\\\\"), (b"\t", b"\\t"), (b"\n", b"\\n"), (b"\r", b"\\r")):
+            if (np.char.find(out, ch) >= 0).any():
+                out = np.char.replace(out, ch, esc)
+    else:
+        # entiers, flottants, datetime64 (ISO 8601, accepté par Postgres)
+        out = values.astype("S")
+    if nulls is not None:
+        out = np.where(nulls, b"\\N", out)
+    return out
+
+
+def copy_columns(
+    db: Session,
+    batch: ColumnBatch,
+    *,
+    stats: dict[str, TableLoadStats] | None = None,
+) -> int:
+    """
+    Variante colonnaire de `copy_rows`: le texte COPY est assemblé colonne par
+    colonne (opérations NumPy), puis envoyé en un seul `COPY ... FROM STDIN`.
+    """
+    n = len(batch)
+    if n == 0:
+        return 0
+
+    t0 = time.perf_counter()
+    cols = [_copy_column(v, batch.nulls.get(name)) for name, v in batch.columns.items()]
+    line = cols[0]
+    for c in cols[1:]:
+        line = np.char.add(np.char.add(line, b"\t"), c)
+    buf = io.BytesIO(b"\n".join(line.tolist()) + b"\n")
+
+    raw = db.connection().connection.dbapi_connection
+    with raw.cursor() as cur:
+        cur.copy_expert(f"COPY {batch.table} ({', '.join(batch.columns)}) FROM STDIN", buf)
+
+    if stats is not None:
+        s = stats.setdefault(batch.table, TableLoadStats(batch.table))
+        s.rows += n
+        s.seconds += time.perf_counter() - t0
+    return n
@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import orjson
+from fastapi import Response
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Cache de réponses des GET chauds (read-through): /produits, /produits/{id},
+# /devis/{id} (sans expand). La valeur est le corps JSON déjà sérialisé (+ les
+# en-têtes utiles, X-Next-Cursor et ETag), la clé = endpoint + paramètres.
+#
+# Invalidation par les écritures de crud.py / crud_async.py, après commit:
+#   - un produit modifié / supprimé: sa clé + toutes les pages /produits
+#   - un devis ou ses lignes modifiés: la clé du devis
+# Rien n'est supprimé: chaque clé porte une version (du namespace pour les
+# pages de liste, de l'entité pour /produits/{id} et /devis/{id}), lue avant
+# la lecture en base; l'invalidation incrémente la version. Une réponse lue
+# avant un commit est donc rangée sous l'ancienne version et jamais resservie,
+# les anciennes entrées sortent par LRU / TTL. Les compteurs expirent
+# VERSION_TTL_FACTOR x TTL après leur dernière incrémentation: toutes les
+# entrées des versions précédentes ont alors expiré, repartir de 0 est sûr.
+#
+# Erreurs du backend (Redis indisponible...): comptées, loguées, traitées
+# comme un miss; les GET ne dépendent jamais du cache pour répondre.
+#
+# Routes async (async_api.py, crud_async.py): variantes `*_async`, qui passent
+# par le threadpool quand le backend bloque (Redis), pour ne jamais attendre
+# le réseau sur la boucle d'événements.
+#
+# Écritures hors API (simulation, backfill...): non vues, la fraîcheur est
+# bornée par CACHE_TTL_SECONDS. Reset / seed au démarrage et restore de
+# snapshot vident le cache.
+#
+# Backends (CACHE_BACKEND):
+#   - memory: LRU + TTL dans le process (par worker uvicorn)
+#   - redis: partagé entre workers / process (CACHE_REDIS_URL, paquet `redis`)
+#   - off: pas de cache
+
+CACHE_HEADER = "X-Cache"
+CACHED_HEADERS = ("X-Next-Cursor", "ETag")
+VERSION_TTL_FACTOR = 2
+
+# Namespaces; invalidations appelées par crud.py / crud_async.py après commit
+PRODUITS = "produits"  # pages de /produits
+PRODUIT = "produit"  # /produits/{id}
+DEVIS = "devis"  # /devis/{id}
+ENTITY_NAMESPACES = (PRODUIT, DEVIS)  # version par entité
+
+
+class CacheMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "sets": self.sets,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "errors": self.errors,
+            }
+
+
+class MemoryBackend:
+    """LRU + TTL dans le process (OrderedDict sous verrou)."""
+
+    name = "memory"
+    blocking = False
+
+    def __init__(self, max_entries: int, metrics: CacheMetrics):
+        self.max_entries = max_entries
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._versions: dict[str, tuple[int, float]] = {}  # scope -> (version, expire)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.metrics.incr("expirations")
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self.metrics.incr("evictions", evicted)
+
+    def version(self, scope: str) -> int:
+        with self._lock:
+            version, expires_at = self._versions.get(scope, (0, 0.0))
+            return version if expires_at > time.monotonic() else 0
+
+    def bump(self, scope: str, ttl: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if len(self._versions) >= self.max_entries:
+                self._versions = {s: v for s, v in self._versions.items() if v[1] > now}
+            version, expires_at = self._versions.get(scope, (0, 0.0))
+            self._versions[scope] = ((version if expires_at > now else 0) + 1, now + ttl)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "max_entries": self.max_entries}
+
+
+class RedisBackend:
+    """Partagé entre process; TTL et éviction (maxmemory-policy) gérés par Redis."""
+
+    name = "redis"
+    blocking = True  # E/S réseau: hors de la boucle pour les routes async
+
+    def __init__(self, url: str, prefix: str = "crm:cache:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the `redis` package") from e
+        # timeouts courts: Redis indisponible = miss rapide, pas un GET bloqué
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.client.set(self.prefix + key, value, px=int(ttl * 1000))
+
+    def version(self, scope: str) -> int:
+        return int(self.client.get(f"{self.prefix}v:{scope}") or 0)
+
+    def bump(self, scope: str, ttl: float) -> None:
+        key = f"{self.prefix}v:{scope}"
+        with self.client.pipeline() as pipe:
+            pipe.incr(key).pexpire(key, int(ttl * 1000)).execute()
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(match=self.prefix + "*", count=1000):
+            self.client.delete(key)
+
+    def stats(self) -> dict:
+        return {}
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl: float, metrics: CacheMetrics):
+        self.backend = backend
+        self.ttl = ttl
+        self.metrics = metrics
+
+    def _failed(self, op: str, e: Exception) -> None:
+        self.metrics.incr("errors")
+        logger.warning("cache %s failed: %r", op, e)
+
+    def _scope(self, namespace: str, params: tuple) -> str:
+        # portée de la version: l'entité (premier paramètre) ou tout le namespace
+        return f"{namespace}:{params[0]}" if namespace in ENTITY_NAMESPACES and params else namespace
+
+    def key(self, namespace: str, *params) -> Optional[str]:
+        """None: pas de cache pour cette requête (cache désactivé ou en erreur)."""
+        if self.backend is None:
+            return None
+        # version lue une fois par requête, avant la lecture en base: une
+        # invalidation entre les deux range la réponse sous l'ancienne version
+        try:
+            version = self.backend.version(self._scope(namespace, params))
+        except Exception as e:
+            self._failed("version", e)
+            return None
+        return f"{namespace}:v{version}:" + ":".join("" if p is None else str(p) for p in params)
+
+    def get(self, key: Optional[str]) -> Optional[Response]:
+        if key is None:
+            return None
+        try:
+            raw = self.backend.get(key)
+        except Exception as e:
+            self._failed("get", e)
+            raw = None
+        if raw is None:
+            self.metrics.incr("misses")
+            return None
+        self.metrics.incr("hits")
+        head, body = raw.split(b"\n", 1)
+        response = Response(content=body, media_type="application/json", headers=orjson.loads(head))
+        response.headers[CACHE_HEADER] = "HIT"
+        return response
+
+    def put(self, key: Optional[str], response: Response) -> Response:
+        if key is None or response.status_code != 200:
+            return response
+        headers = {h: response.headers[h] for h in CACHED_HEADERS if h in response.headers}
+        try:
+            self.backend.set(key, orjson.dumps(headers) + b"\n" + response.body, self.ttl)
+        except Exception as e:
+            self._failed("set", e)
+            return response
+        self.metrics.incr("sets")
+        response.headers[CACHE_HEADER] = "MISS"
+        return response
+
+    def invalidate(self, namespace: str, *params) -> None:
+        """Une entité (params) ou tout le namespace (sans params)."""
+        if self.backend is None:
+            return
+        try:
+            self.backend.bump(self._scope(namespace, params), self.ttl * VERSION_TTL_FACTOR)
+        except Exception as e:
+            # pas d'exception après le commit de l'écriture: fraîcheur bornée par le TTL
+            self._failed("invalidate", e)
+            return
+        self.metrics.incr("invalidations")
+
+    def clear(self) -> None:
+        if self.backend is None:
+            return
+        try:
+            self.backend.clear()
+        except Exception as e:
+            self._failed("clear", e)
+
+    def snapshot(self) -> dict:
+        data = {
+            "backend": self.backend.name if self.backend is not None else "off",
+            "ttl_seconds": self.ttl,
+            **self.metrics.snapshot(),
+        }
+        if self.backend is not None:
+            data.update(self.backend.stats())
+        return data
+
+
+def build_cache() -> ResponseCache:
+    metrics = CacheMetrics()
+    if settings.CACHE_BACKEND == "memory":
+        backend = MemoryBackend(settings.CACHE_MAX_ENTRIES, metrics)
+    elif settings.CACHE_BACKEND == "redis":
+        backend = RedisBackend(settings.CACHE_REDIS_URL)
+    elif settings.CACHE_BACKEND == "off":
+        backend = None
+    else:
+        raise ValueError(f"unknown CACHE_BACKEND: {settings.CACHE_BACKEND!r}")
+    return ResponseCache(backend, settings.CACHE_TTL_SECONDS, metrics)
+
+
+response_cache = build_cache()
+
+
+def lookup(namespace: str, *params) -> tuple[Optional[str], Optional[Response]]:
+    """Clé de la requête + réponse en cache (None: à calculer puis `store`)."""
+    key = response_cache.key(namespace, *params)
+    return key, response_cache.get(key)
+
+
+def store(key: Optional[str], response: Response) -> Response:
+    return response_cache.put(key, response)
+
+
+def invalidate_produit(produit_id: int) -> None:
+    response_cache.invalidate(PRODUIT, produit_id)
+    response_cache.invalidate(PRODUITS)
+
+
+def invalidate_devis(devis_id: int) -> None:
+    response_cache.invalidate(DEVIS, devis_id)
+
+
+def _blocking() -> bool:
+    return getattr(response_cache.backend, "blocking", False)
+
+
+async def lookup_async(namespace: str, *params) -> tuple[Optional[str], Optional[Response]]:
+    if _blocking():
+        return await run_in_threadpool(lookup, namespace, *params)
+    return lookup(namespace, *params)
+
+
+async def store_async(key: Optional[str], response: Response) -> Response:
+    if key is not None and _blocking():
+        return await run_in_threadpool(store, key, response)
+    return store(key, response)
+
+
+async def invalidate_produit_async(produit_id: int) -> None:
+    if _blocking():
+        await run_in_threadpool(invalidate_produit, produit_id)
+    else:
+        invalidate_produit(produit_id)
+
+
+async def invalidate_devis_async(devis_id: int) -> None:
+    if _blocking():
+        await run_in_threadpool(invalidate_devis, devis_id)
+    else:
+        invalidate_devis(devis_id)
@@ -0,0 +1,445 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+
+
+# Générateur colonnaire (NumPy) pour le seed: chaque colonne est produite en
+# une passe vectorisée, sans boucle Python par ligne. Les entreprises sont
+# découpées en blocs; chaque bloc a ses propres flux RNG dérivés de
+# (seed, bloc), donc le résultat ne dépend que du seed et de la taille de bloc.
+
+BLOCK_SIZE = 10_000  # entreprises par bloc
+
+SECTEURS = ["Retail", "Services", "Finance", "Industrie", "Tech", "Santé", "Éducation"]
+VILLES = ["Paris", "Lyon", "Marseille", "Nantes", "Lille", "Bordeaux", "Toulouse"]
+LAST_NAMES = ["Martin", "Bernard", "Thomas", "Petit", "Robert", "Richard", "Durand", "Dubois"]
+FIRST_NAMES = ["Alice", "Bob", "Chloé", "David", "Emma", "Fares", "Inès", "Jules"]
+ROLES = ["CEO", "DAF", "DSI", "Directeur Achats", "Directeur Commercial", "RH"]
+CAMPAGNE_TYPES = ["email", "call", "linkedin", "webinar", "ads"]
+PRODUCT_NAMES = [
+    "Licence CRM - Basic",
+    "Licence CRM - Pro",
+    "Module Reporting",
+    "Module Automatisation",
+    "Intégration API",
+    "Support Premium",
+]
+PRODUCT_PRICES = [49.0, 99.0, 199.0, 299.0, 499.0]
+N_CAMPAGNES = 6
+DEVIS_STATUSES = ["draft", "sent", "accepted", "rejected"]
+VENTE_STATUSES = ["open", "won"]
+VENTE_PROBABILITIES = [30, 50, 70, 90]
+ACTION_KINDS = ["call", "email", "meeting", "linkedin"]
+ACTION_STATUSES = ["todo", "done", "canceled"]
+ACTIONS_PER_ENTREPRISE = 4
+
+_ACCEPTED = DEVIS_STATUSES.index("accepted")
+_DONE = ACTION_STATUSES.index("done")
+
+_HEX_UPPER = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+_HEX_LOWER = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+
+def _encode(values: list[str]) -> np.ndarray:
+    return np.array([v.encode() for v in values])
+
+
+# ----------------------------
+# Helpers colonnes
+# ----------------------------
+def digits(values: np.ndarray, width: int) -> np.ndarray:
+    """Entiers -> chaînes décimales de largeur fixe (zéros à gauche)."""
+    pows = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    d = (values.astype(np.int64)[:, None] // pows) % 10
+    return np.ascontiguousarray((d + 48).astype(np.uint8)).view(f"S{width}").ravel()
+
+
+def hexa(values: np.ndarray, width: int, *, upper: bool = False) -> np.ndarray:
+    """Entiers -> chaînes hexadécimales de largeur fixe."""
+    shifts = 4 * np.arange(width - 1, -1, -1, dtype=np.int64)
+    nibbles = (values.astype(np.int64)[:, None] >> shifts) & 0xF
+    table = _HEX_UPPER if upper else _HEX_LOWER
+    return np.ascontiguousarray(table[nibbles]).view(f"S{width}").ravel()
+
+
+def concat(*parts) -> np.ndarray:
+    """Concatène colonnes et constantes (bytes) élément par élément."""
+    out = parts[0]
+    for p in parts[1:]:
+        out = np.char.add(out, p)
+    return out
+
+
+def phones(rng: np.random.Generator, n: int) -> np.ndarray:
+    return concat(b"0", digits(rng.integers(0, 10**9, n), 9))
+
+
+def postcodes(rng: np.random.Generator, n: int) -> np.ndarray:
+    return digits(rng.integers(1000, 96000, n), 5)
+
+
+def sirens(index: np.ndarray, a: int, b: int) -> np.ndarray:
+    """
+    SIREN uniques par permutation affine de [0, 10^9): i -> (a*i + b) mod 10^9,
+    bijective tant que `a` est premier avec 10^9. Aucun ensemble à maintenir,
+    et le SIREN d'une entreprise ne dépend que de son index global.
+    """
+    return digits((a * index.astype(np.int64) + b) % 10**9, 9)
+
+
+def pick(rng: np.random.Generator, values: np.ndarray, n: int) -> np.ndarray:
+    return values[rng.integers(0, len(values), n)]
+
+
+# ----------------------------
+# Batches
+# ----------------------------
+@dataclass
+class ColumnBatch:
+    """
+    Un paquet de lignes d'une table, en colonnes NumPy. `nulls[col]` est un
+    masque booléen (True = NULL) pour les colonnes nullables.
+    Les chaînes sont en bytes UTF-8 (dtype S).
+    """
+
+    table: str
+    columns: dict[str, np.ndarray]
+    nulls: dict[str, np.ndarray] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def to_arrow(self):
+        """Conversion en `pyarrow.Table` (pyarrow est optionnel)."""
+        try:
+            import pyarrow as pa
+        except ImportError as e:  # pragma: no cover
+            raise RuntimeError("pyarrow is required for ColumnBatch.to_arrow()") from e
+
+        arrays = []
+        for name, values in self.columns.items():
+            mask = self.nulls.get(name)
+            if values.dtype.kind == "S":
+                arr = pa.array(values, mask=mask, type=pa.binary()).cast(pa.string())
+            else:
+                arr = pa.array(values, mask=mask)
+            arrays.append(arr)
+        return pa.Table.from_arrays(arrays, names=list(self.columns))
+
+
+@dataclass
+class BlockPlan:
+    """
+    Structure d'un bloc (nombre de lignes par table), tirée sur un flux RNG
+    séparé: on peut connaître les volumes (donc réserver les ids) avant de
+    générer les valeurs.
+    """
+
+    block: int
+    start: int  # index global de la première entreprise
+    n_inter: np.ndarray  # interlocuteurs par entreprise
+    devis_ent: np.ndarray  # index local des entreprises qui ont un devis
+    devis_status: np.ndarray  # index dans DEVIS_STATUSES
+    n_lines: np.ndarray  # lignes par devis
+    vente_mask: np.ndarray  # devis -> vente ?
+
+    @property
+    def counts(self) -> dict[str, int]:
+        n_ent = len(self.n_inter)
+        return {
+            "entreprises": n_ent,
+            "interlocuteurs": int(self.n_inter.sum()),
+            "devis": len(self.devis_ent),
+            "devis_produits": int(self.n_lines.sum()),
+            "ventes": int(self.vente_mask.sum()),
+            "actions": n_ent * ACTIONS_PER_ENTREPRISE,
+        }
+
+
+class ColumnarGenerator:
+    """
+    Mêmes tables et mêmes distributions que `seeders._iter_crm_chunks`,
+    mais colonne par colonne. Déterministe pour (seed, block_size, now).
+
+    Usage:
+        gen = ColumnarGenerator(seed, n_users=..., n_entreprises=..., now=...)
+        ref = gen.reference_batches(first_ids)        # users/campagnes/produits
+        for b in gen.blocks():
+            plan = gen.plan(b)
+            batches = gen.block_batches(plan, first_ids_for(plan.counts))
+    """
+
+    REFERENCE_TABLES = ("users", "campagnes", "produits")
+    BLOCK_TABLES = ("entreprises", "interlocuteurs", "devis", "devis_produits", "ventes", "actions")
+
+    def __init__(
+        self,
+        seed: int,
+        *,
+        n_users: int,
+        n_entreprises: int,
+        now: datetime,
+        block_size: int = BLOCK_SIZE,
+    ):
+        self.seed = seed
+        self.n_users = n_users
+        self.n_entreprises = n_entreprises
+        self.block_size = block_size
+        self.now = np.datetime64(now.replace(tzinfo=None, microsecond=0), "s")
+        self.today = self.now.astype("datetime64[D]")
+
+        # Paramètres de la permutation SIREN (a premier avec 10^9)
+        rng = self._rng()
+        a = int(rng.integers(1, 10**9))
+        while a % 2 == 0 or a % 5 == 0:
+            a += 1
+        self._siren_a = a
+        self._siren_b = int(rng.integers(0, 10**9))
+
+        self.user_ids: np.ndarray | None = None
+        self.campagne_ids: np.ndarray | None = None
+        self.produit_ids: np.ndarray | None = None
+        self.produit_prices: np.ndarray | None = None
+
+    def _rng(self, *key: int) -> np.random.Generator:
+        return np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=key))
+
+    @property
+    def reference_counts(self) -> dict[str, int]:
+        return {"users": self.n_users, "campagnes": N_CAMPAGNES, "produits": len(PRODUCT_NAMES)}
+
+    def blocks(self) -> range:
+        return range((self.n_entreprises + self.block_size - 1) // self.block_size)
+
+    # ----------------------------
+    # USERS / CAMPAGNES / PRODUITS
+    # ----------------------------
+    def reference_batches(self, first_ids: dict[str, int]) -> list[ColumnBatch]:
+        rng = self._rng(0)
+
+        n = self.n_users
+        self.user_ids = first_ids["users"] + np.arange(n, dtype=np.int64)
+        num = (np.arange(n) + 1).astype("S")
+        users = ColumnBatch(
+            "users",
+            {
+                "id": self.user_ids,
+                "email": concat(b"user", num, b"@crm.local"),
+                "full_name": concat(b"User ", num),
+                "phone": phones(rng, n),
+                "is_active": np.ones(n, dtype=bool),
+            },
+        )
+
+        self.campagne_ids = first_ids["campagnes"] + np.arange(N_CAMPAGNES, dtype=np.int64)
+        num = np.arange(1, N_CAMPAGNES + 1)
+        campagnes = ColumnBatch(
+            "campagnes",
+            {
+                "id": self.campagne_ids,
+                "code": concat(b"CAMP-2026-", digits(num, 3)),
+                "nom": concat(b"Campagne ", num.astype("S")),
+                "type": pick(rng, _encode(CAMPAGNE_TYPES), N_CAMPAGNES),
+                "is_active": np.ones(N_CAMPAGNES, dtype=bool),
+            },
+        )
+
+        n = len(PRODUCT_NAMES)
+        self.produit_ids = first_ids["produits"] + np.arange(n, dtype=np.int64)
+        self.produit_prices = pick(rng, np.array(PRODUCT_PRICES), n)
+        names = _encode(PRODUCT_NAMES)
+        produits = ColumnBatch(
+            "produits",
+            {
+                "id": self.produit_ids,
+                "sku": concat(b"SKU-", digits(np.arange(1, n + 1), 3)),
+                "name": names,
+                "description": concat(b"Produit: ", names),
+                "unit_price": self.produit_prices,
+                "currency": np.full(n, b"EUR"),
+                "is_active": np.ones(n, dtype=bool),
+            },
+        )
+        return [users, campagnes, produits]
+
+    # ----------------------------
+    # BLOCS
+    # ----------------------------
+    def plan(self, block: int) -> BlockPlan:
+        rng = self._rng(block + 1, 0)
+        start = block * self.block_size
+        n = min(self.block_size, self.n_entreprises - start)
+
+        n_inter = rng.integers(1, 4, n)
+        # ~ 1 devis sur 2 entreprises (index global pair)
+        devis_ent = np.flatnonzero((start + np.arange(n)) % 2 == 0)
+        nd = len(devis_ent)
+        devis_status = rng.integers(0, len(DEVIS_STATUSES), nd)
+        n_lines = np.minimum(rng.integers(1, 5, nd), len(PRODUCT_NAMES))
+        vente_mask = (devis_status == _ACCEPTED) & (rng.random(nd) < 0.9)
+        return BlockPlan(block, start, n_inter, devis_ent, devis_status, n_lines, vente_mask)
+
+    def block_batches(self, plan: BlockPlan, first_ids: dict[str, int]) -> list[ColumnBatch]:
+        if self.user_ids is None:
+            raise RuntimeError("reference_batches() must be called before block_batches()")
+
+        rng = self._rng(plan.block + 1, 1)
+        counts = plan.counts
+        ids = {t: first_ids[t] + np.arange(counts[t], dtype=np.int64) for t in self.BLOCK_TABLES}
+
+        # ENTREPRISES
+        n_ent = counts["entreprises"]
+        g = plan.start + np.arange(n_ent, dtype=np.int64)
+        num = (g + 1).astype("S")
+        tag = rng.integers(0, 1 << 24, n_ent)
+        noms = concat(b"Entreprise ", num, b" ", hexa(tag, 6, upper=True))
+        entreprises = ColumnBatch(
+            "entreprises",
+            {
+                "id": ids["entreprises"],
+                "siren": sirens(g, self._siren_a, self._siren_b),
+                "nom": noms,
+                "nb_employe": rng.integers(1, 5001, n_ent),
+                "cp": postcodes(rng, n_ent),
+                "ville": pick(rng, _encode(VILLES), n_ent),
+                "pays": np.full(n_ent, b"France"),
+                "secteur": pick(rng, _encode(SECTEURS), n_ent),
+                "website": concat(b"https://entreprise", num, b".example.com"),
+                "email": concat(b"contact", num, b"@entreprises.local"),
+                "phone": phones(rng, n_ent),
+            },
+        )
+
+        # INTERLOCUTEURS (1 à 3 / entreprise)
+        n_it = counts["interlocuteurs"]
+        inter_ent = np.repeat(np.arange(n_ent), plan.n_inter)
+        inter_first = ids["interlocuteurs"][0] + np.concatenate(([0], np.cumsum(plan.n_inter)[:-1]))
+        slug = concat(b"entreprise", num, hexa(tag, 6))
+        interlocuteurs = ColumnBatch(
+            "interlocuteurs",
+            {
+                "id": ids["interlocuteurs"],
+                "entreprise_id": ids["entreprises"][inter_ent],
+                "first_name": pick(rng, _encode(FIRST_NAMES), n_it),
+                "last_name": pick(rng, _encode(LAST_NAMES), n_it),
+                "role": pick(rng, _encode(ROLES), n_it),
+                "email": concat(hexa(rng.integers(0, 1 << 32, n_it), 8), b"@", slug[inter_ent], b".local"),
+                "phone": phones(rng, n_it),
+                "is_primary": ids["interlocuteurs"] == inter_first[inter_ent],
+            },
+        )
+
+        # DEVIS
+        nd = counts["devis"]
+        de = plan.devis_ent
+        d_owner = pick(rng, self.user_ids, nd)
+        d_inter = inter_first[de] + rng.integers(0, plan.n_inter[de])
+        d_camp = pick(rng, self.campagne_ids, nd)
+        d_camp_null = rng.random(nd) >= 0.7
+
+        # LIGNES: 1 à 4 produits distincts par devis
+        n_prod = len(self.produit_ids)
+        order = np.argsort(rng.random((nd, n_prod)), axis=1)
+        chosen = np.arange(n_prod)[None, :] < plan.n_lines[:, None]
+        line_prod = order[chosen]
+        line_devis = np.repeat(np.arange(nd), plan.n_lines)
+        qty = rng.integers(1, 11, len(line_prod))
+        unit_price = self.produit_prices[line_prod]
+        line_total = np.round(qty * unit_price, 2)
+        totals = np.round(np.bincount(line_devis, weights=line_total, minlength=nd), 2)
+
+        nl = counts["devis_produits"]
+        lines = ColumnBatch(
+            "devis_produits",
+            {
+                "id": ids["devis_produits"],
+                "devis_id": ids["devis"][line_devis],
+                "produit_id": self.produit_ids[line_prod],
+                "quantity": qty,
+                "unit_price": unit_price,
+                "currency": np.full(nl, b"EUR"),
+                "line_total": line_total,
+            },
+        )
+
+        devis = ColumnBatch(
+            "devis",
+            {
+                "id": ids["devis"],
+                "owner_id": d_owner,
+                "entreprise_id": ids["entreprises"][de],
+                "interlocuteur_id": d_inter,
+                "campagne_id": d_camp,
+                "code": concat(b"DEV-2026-", np.char.zfill((g[de] + 1).astype("S"), 4)),
+                "title": concat(b"Devis - ", noms[de]),
+                "status": _encode(DEVIS_STATUSES)[plan.devis_status],
+                "issue_date": self.today - rng.integers(0, 61, nd),
+                "valid_until": self.today + rng.integers(10, 91, nd),
+                "currency": np.full(nd, b"EUR"),
+                "notes": np.full(nd, b"Seeded devis"),
+            },
+            nulls={"campagne_id": d_camp_null},
+        )
+
+        # VENTES: devis "accepted" (~90%)
+        vm = plan.vente_mask
+        nv = counts["ventes"]
+        v_devis_ids = ids["devis"][vm]
+        ventes = ColumnBatch(
+            "ventes",
+            {
+                "id": ids["ventes"],
+                "owner_id": d_owner[vm],
+                "entreprise_id": ids["entreprises"][de[vm]],
+                "interlocuteur_id": d_inter[vm],
+                "campagne_id": d_camp[vm],
+                "devis_id": v_devis_ids,
+                "reference": concat(b"SALE-2026-", np.char.zfill(v_devis_ids.astype("S"), 5)),
+                "amount": totals[vm],
+                "currency": np.full(nv, b"EUR"),
+                "status": pick(rng, _encode(VENTE_STATUSES), nv),
+                "probability": pick(rng, np.array(VENTE_PROBABILITIES), nv),
+                "expected_close_date": self.today + rng.integers(5, 46, nv),
+                "notes": np.full(nv, b"Seeded vente from accepted devis"),
+            },
+            nulls={"campagne_id": d_camp_null[vm]},
+        )
+
+        # ACTIONS (~ 4 / entreprise, même owner/interlocuteur par entreprise)
+        na = counts["actions"]
+        a_ent = np.repeat(np.arange(n_ent), ACTIONS_PER_ENTREPRISE)
+        a_owner = pick(rng, self.user_ids, n_ent)[a_ent]
+        a_inter = (inter_first + rng.integers(0, plan.n_inter))[a_ent]
+        due = (
+            self.now
+            + rng.integers(-10, 21, na).astype("timedelta64[D]")
+            + rng.integers(0, 24, na).astype("timedelta64[h]")
+        )
+        a_status = rng.integers(0, len(ACTION_STATUSES), na)
+        kinds = _encode(ACTION_KINDS)
+        actions = ColumnBatch(
+            "actions",
+            {
+                "id": ids["actions"],
+                "owner_id": a_owner,
+                "entreprise_id": ids["entreprises"][a_ent],
+                "interlocuteur_id": a_inter,
+                "campagne_id": pick(rng, self.campagne_ids, na),
+                "kind": pick(rng, kinds, na),
+                "status": _encode(ACTION_STATUSES)[a_status],
+                "title": concat(b"Action ", pick(rng, kinds, na), b" - ", noms[a_ent]),
+                "notes": np.full(na, b"Seeded action"),
+                "due_at": due,
+                "done_at": due + np.timedelta64(1, "h"),
+            },
+            nulls={
+                "interlocuteur_id": rng.random(na) >= 0.9,
+                "campagne_id": rng.random(na) >= 0.5,
+                "done_at": a_status != _DONE,
+            },
+        )
+
+        return [entreprises, interlocuteurs, devis, lines, ventes, actions]
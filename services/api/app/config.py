@@ -7,5 +7,57 @@ class Settings(BaseSettings):
     DATABASE_URL: str = "postgresql+psycopg2://postgres:postgres@db:5432/postgres"
     APP_TIMEZONE: str = "Europe/Paris"
 
+    # Stack DB des endpoints: "sync" (psycopg2 + threadpool) ou "async" (asyncpg)
+    DB_MODE: str = "sync"
+    # Par défaut: DATABASE_URL avec le driver asyncpg
+    ASYNC_DATABASE_URL: str | None = None
+
+    # Pool de connexions (par engine). DB_POOL_MODE: "queue" ou "null" (PgBouncer)
+    DB_POOL_MODE: str = "queue"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # secondes d'attente max d'une connexion
+    DB_POOL_RECYCLE: int = -1  # secondes, -1 = jamais
+
+    # Démarrage: "check" (reset + seed seulement si schéma / seed ont changé)
+    # ou "reset" (DROP SCHEMA + seed à chaque démarrage)
+    STARTUP_MODE: str = "check"
+    # Seed dans un thread: l'API répond pendant le seed (état dans /health)
+    SEED_IN_BACKGROUND: bool = True
+
+    # Seed au démarrage: "orm", "copy" (COPY FROM STDIN) ou "columnar" (NumPy + COPY)
+    SEED_MODE: str = "orm"
+    # Process parallèles pour SEED_MODE=columnar
+    SEED_WORKERS: int = 1
+    # Entreprises (+ dépendants) par paquet: borne la mémoire du seed
+    SEED_CHUNK_SIZE: int = 10_000
+    # Index secondaires / FK retirés pendant le seed puis reconstruits en parallèle
+    SEED_DEFER_INDEXES: bool = False
+    SEED_INDEX_WORKERS: int = 4  # connexions pour la reconstruction
+    SEED_MAINTENANCE_WORK_MEM: str = "512MB"
+
+    # Partitionnement mensuel de actions (due_at) et ventes (created_at)
+    PARTITIONING: bool = False
+    PARTITION_PREMAKE_MONTHS: int = 3  # mois créés à l'avance par le job runner
+    PARTITION_RETENTION_MONTHS: int = 0  # mois gardés attachés (0 = tout garder)
+
+    # Rollups KPI (rollups.py): /stats servi depuis les agrégats journaliers
+    STATS_FROM_ROLLUPS: bool = True
+    ROLLUP_REFRESH_SECONDS: float = 60.0  # période du job de rafraîchissement
+    ROLLUP_LAG_SECONDS: float = 30.0  # marge pour les transactions encore ouvertes
+
+    # Cache de réponses des GET chauds (cache.py): "memory", "redis" ou "off"
+    CACHE_BACKEND: str = "memory"
+    CACHE_TTL_SECONDS: float = 30.0  # fraîcheur max face aux écritures hors API
+    CACHE_MAX_ENTRIES: int = 10_000  # backend memory (LRU)
+    CACHE_REDIS_URL: str = "redis://redis:6379/0"
+
+    # Simulation haut débit (0 = désactivée): événements/s visés par le scheduler
+    SIM_EVENTS_PER_SECOND: float = 0.0
+    # Mix pondéré: actions, devis, lines, ventes, transitions
+    SIM_MIX: str = "actions=50,devis=10,lines=20,ventes=5,transitions=15"
+    SIM_BATCH_SIZE: int = 500  # événements par transaction
+    SIM_TICK_SECONDS: float = 60.0  # durée d'un passage du job
+
 
 settings = Settings()
@@ -1,12 +1,64 @@
 from __future__ import annotations
 
 from typing import Optional, List
+from datetime import datetime
 from decimal import Decimal
 
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-
-from .models import Produit, Devis, DevisProduit, Vente
+from sqlalchemy import select, cast, Float, Numeric, Select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from . import cache
+from .expand import DEVIS, VENTE, dump, loader_options
+from .models import Produit, Devis, DevisProduit, Vente, User, Entreprise, Interlocuteur, Campagne, Action
+from .schemas import (
+    ProduitOut,
+    DevisSummaryOut,
+    DevisProduitOut,
+    VenteOut,
+    DevisLineUpsert,
+    UserOut,
+    EntrepriseOut,
+    InterlocuteurOut,
+    CampagneOut,
+    ActionOut,
+)
+
+
+# Lectures "liste": on sélectionne uniquement les colonnes du schéma de sortie
+# et on renvoie des dicts construits depuis les tuples (pas d'objets ORM).
+# Les Numeric sont castés en float côté SQL (les schémas exposent des float).
+# Une page de liste est construite par `<table>_page` (filtres + pagination),
+# puis lue par `fetch_page` une fois l'ETag contrôlé (voir etag.py).
+def _out_columns(model, schema) -> list:
+    cols = []
+    for name in schema.model_fields:
+        col = model.__table__.c[name]
+        if isinstance(col.type, Numeric) and not isinstance(col.type, Float):
+            col = cast(col, Float).label(name)
+        cols.append(col)
+    return cols
+
+
+def _select_out(model, schema) -> Select:
+    return select(*_out_columns(model, schema))
+
+
+def _rows(db: Session, stmt: Select) -> List[dict]:
+    return [dict(r) for r in db.execute(stmt).mappings()]
+
+
+def fetch_page(db: Session, page: Select) -> List[dict]:
+    """Lignes d'une page construite par `<table>_page` (après le contrôle d'ETag)."""
+    return _rows(db, page)
+
+
+def _page(stmt: Select, model, limit: int, offset: int, before_id: Optional[int]) -> Select:
+    # before_id (curseur) => seek sur la PK, l'offset est ignoré
+    stmt = stmt.order_by(model.id.desc()).limit(limit)
+    if before_id is not None:
+        return stmt.where(model.id < before_id)
+    return stmt.offset(offset)
 
 
 # PRODUITS CRUD
@@ -28,6 +80,7 @@ def create_produit(
     )
     db.add(p)
     db.commit()
+    cache.invalidate_produit(p.id)
     db.refresh(p)
     return p
 
@@ -40,8 +93,8 @@ def get_produit_by_sku(db: Session, sku: str) -> Optional[Produit]:
     return db.scalar(select(Produit).where(Produit.sku == sku))
 
 
-def list_produits(db: Session, limit: int = 50, offset: int = 0) -> List[Produit]:
-    return list(db.scalars(select(Produit).order_by(Produit.id.desc()).offset(offset).limit(limit)))
+def produits_page(limit: int = 50, offset: int = 0, before_id: Optional[int] = None) -> Select:
+    return _page(_select_out(Produit, ProduitOut), Produit, limit, offset, before_id)
 
 
 def update_produit(
@@ -70,6 +123,7 @@ def update_produit(
         p.is_active = is_active
 
     db.commit()
+    cache.invalidate_produit(produit_id)
     db.refresh(p)
     return p
 
@@ -80,6 +134,7 @@ def delete_produit(db: Session, produit_id: int) -> bool:
         return False
     db.delete(p)
     db.commit()
+    cache.invalidate_produit(produit_id)
     return True
 
 
@@ -122,8 +177,22 @@ def get_devis_by_code(db: Session, code: str) -> Optional[Devis]:
     return db.scalar(select(Devis).where(Devis.code == code))
 
 
-def list_devis(db: Session, limit: int = 50, offset: int = 0) -> List[Devis]:
-    return list(db.scalars(select(Devis).order_by(Devis.id.desc()).offset(offset).limit(limit)))
+def devis_page(limit: int = 50, offset: int = 0, before_id: Optional[int] = None) -> Select:
+    return _page(_select_out(Devis, DevisSummaryOut), Devis, limit, offset, before_id)
+
+
+# Lectures avec `expand` (voir expand.py): objets ORM chargés en une poignée
+# de requêtes (joinedload / selectinload), puis convertis en dicts.
+def get_devis_expanded(db: Session, devis_id: int, expand: frozenset[str]) -> Optional[dict]:
+    d = db.scalar(select(Devis).where(Devis.id == devis_id).options(*loader_options(DEVIS, expand)))
+    return dump(d, DEVIS, expand) if d else None
+
+
+def list_devis_expanded(
+    db: Session, expand: frozenset[str], limit: int = 50, offset: int = 0, before_id: Optional[int] = None
+) -> List[dict]:
+    stmt = _page(select(Devis).options(*loader_options(DEVIS, expand)), Devis, limit, offset, before_id)
+    return [dump(d, DEVIS, expand) for d in db.scalars(stmt)]
 
 
 def update_devis(
@@ -158,6 +227,7 @@ def update_devis(
         d.campagne_id = campagne_id
 
     db.commit()
+    cache.invalidate_devis(devis_id)
     db.refresh(d)
     return d
 
@@ -168,6 +238,7 @@ def delete_devis(db: Session, devis_id: int) -> bool:
         return False
     db.delete(d)
     db.commit()
+    cache.invalidate_devis(devis_id)
     return True
 
 
@@ -178,22 +249,6 @@ def _compute_line_total(quantity: int, unit_price: Optional[Decimal]) -> Optiona
     return Decimal(quantity) * Decimal(unit_price)
 
 
-def _recompute_devis_total(db: Session, devis_id: int) -> None:
-    d = db.get(Devis, devis_id)
-    if not d:
-        return
-
-    total = Decimal("0.00")
-    has_any = False
-    for line in d.lines:
-        if line.line_total is not None:
-            total += Decimal(line.line_total)
-            has_any = True
-
-    d.total_amount = total if has_any else None
-    db.commit()
-
-
 def add_or_update_devis_line(
     db: Session,
     *,
@@ -238,10 +293,10 @@ def add_or_update_devis_line(
         )
         db.add(line)
 
+    # devis.total_amount est mis à jour par trigger (voir models.py)
     db.commit()
+    cache.invalidate_devis(devis_id)
     db.refresh(line)
-
-    _recompute_devis_total(db, devis_id)
     return line
 
 
@@ -257,13 +312,62 @@ def remove_devis_line(db: Session, *, devis_id: int, produit_id: int) -> bool:
 
     db.delete(line)
     db.commit()
-
-    _recompute_devis_total(db, devis_id)
+    cache.invalidate_devis(devis_id)
     return True
 
 
-def list_devis_lines(db: Session, devis_id: int) -> List[DevisProduit]:
-    return list(db.scalars(select(DevisProduit).where(DevisProduit.devis_id == devis_id)))
+def upsert_devis_lines(db: Session, *, devis_id: int, lines: List[DevisLineUpsert]) -> Optional[List[dict]]:
+    """
+    Upsert de plusieurs lignes en une transaction: un seul
+    INSERT ... ON CONFLICT (devis_id, produit_id) DO UPDATE; le total du devis
+    suit via les triggers. Renvoie None si le devis ou un produit n'existe pas.
+    """
+    if not db.scalar(select(Devis.id).where(Devis.id == devis_id)):
+        return None
+
+    # un même produit deux fois dans le lot: la dernière ligne gagne
+    # (ON CONFLICT ne peut pas toucher deux fois la même ligne)
+    by_produit = {line.produit_id: line for line in lines}
+    if not by_produit:
+        return []
+
+    prices = dict(db.execute(select(Produit.id, Produit.unit_price).where(Produit.id.in_(by_produit))).all())
+    if len(prices) != len(by_produit):
+        return None
+
+    values = []
+    for produit_id, line in by_produit.items():
+        # si unit_price non fourni => prix du produit (si existant)
+        unit_price = Decimal(str(line.unit_price)) if line.unit_price is not None else prices[produit_id]
+        values.append(
+            {
+                "devis_id": devis_id,
+                "produit_id": produit_id,
+                "quantity": line.quantity,
+                "unit_price": unit_price,
+                "currency": line.currency,
+                "line_total": _compute_line_total(line.quantity, unit_price),
+            }
+        )
+
+    stmt = pg_insert(DevisProduit).values(values)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_devis_produit",
+        set_={
+            "quantity": stmt.excluded.quantity,
+            "unit_price": stmt.excluded.unit_price,
+            "currency": stmt.excluded.currency,
+            "line_total": stmt.excluded.line_total,
+        },
+    ).returning(*_out_columns(DevisProduit, DevisProduitOut))
+    rows = [dict(r) for r in db.execute(stmt).mappings()]
+    db.commit()
+    cache.invalidate_devis(devis_id)
+    return rows
+
+
+def list_devis_lines(db: Session, devis_id: int) -> List[dict]:
+    return _rows(db, _select_out(DevisProduit, DevisProduitOut).where(DevisProduit.devis_id == devis_id))
 
 
 # VENTES CRUD (liée à un devis)
@@ -281,11 +385,13 @@ def create_vente_from_devis(
     expected_close_date: Optional[object] = None,  # date
     notes: Optional[str] = None,
 ) -> Optional[Vente]:
-    d = db.get(Devis, devis_id)
+    # devis verrouillé (FOR UPDATE) avant le check: avec PARTITIONING il n'y a
+    # plus de uq_ventes_devis_id, deux créations concurrentes sont sérialisées ici
+    d = db.get(Devis, devis_id, with_for_update=True)
     if not d:
         return None
 
-    # 1 vente max par devis (UniqueConstraint + check logique)
+    # 1 vente max par devis
     existing = db.scalar(select(Vente).where(Vente.devis_id == devis_id))
     if existing:
         return existing
@@ -317,8 +423,20 @@ def get_vente(db: Session, vente_id: int) -> Optional[Vente]:
     return db.get(Vente, vente_id)
 
 
-def list_ventes(db: Session, limit: int = 50, offset: int = 0) -> List[Vente]:
-    return list(db.scalars(select(Vente).order_by(Vente.id.desc()).offset(offset).limit(limit)))
+def ventes_page(limit: int = 50, offset: int = 0, before_id: Optional[int] = None) -> Select:
+    return _page(_select_out(Vente, VenteOut), Vente, limit, offset, before_id)
+
+
+def get_vente_expanded(db: Session, vente_id: int, expand: frozenset[str]) -> Optional[dict]:
+    v = db.scalar(select(Vente).where(Vente.id == vente_id).options(*loader_options(VENTE, expand)))
+    return dump(v, VENTE, expand) if v else None
+
+
+def list_ventes_expanded(
+    db: Session, expand: frozenset[str], limit: int = 50, offset: int = 0, before_id: Optional[int] = None
+) -> List[dict]:
+    stmt = _page(select(Vente).options(*loader_options(VENTE, expand)), Vente, limit, offset, before_id)
+    return [dump(v, VENTE, expand) for v in db.scalars(stmt)]
 
 
 def update_vente(
@@ -358,3 +476,114 @@ def delete_vente(db: Session, vente_id: int) -> bool:
     db.delete(v)
     db.commit()
     return True
+
+
+# USERS / ENTREPRISES / INTERLOCUTEURS / CAMPAGNES / ACTIONS (lecture)
+# Chaque filtre a son index composite (voir models.py): (filtre, id) pour les
+# listes triées par id, (filtre, due_at) pour les actions.
+def get_user(db: Session, user_id: int) -> Optional[User]:
+    return db.get(User, user_id)
+
+
+def users_page(
+    limit: int = 50,
+    offset: int = 0,
+    before_id: Optional[int] = None,
+    *,
+    is_active: Optional[bool] = None,
+) -> Select:
+    stmt = _select_out(User, UserOut)
+    if is_active is not None:
+        stmt = stmt.where(User.is_active == is_active)
+    return _page(stmt, User, limit, offset, before_id)
+
+
+def get_entreprise(db: Session, entreprise_id: int) -> Optional[Entreprise]:
+    return db.get(Entreprise, entreprise_id)
+
+
+def entreprises_page(
+    limit: int = 50,
+    offset: int = 0,
+    before_id: Optional[int] = None,
+    *,
+    ville: Optional[str] = None,
+    secteur: Optional[str] = None,
+    cp: Optional[str] = None,
+) -> Select:
+    stmt = _select_out(Entreprise, EntrepriseOut)
+    if ville is not None:
+        stmt = stmt.where(Entreprise.ville == ville)
+    if secteur is not None:
+        stmt = stmt.where(Entreprise.secteur == secteur)
+    if cp is not None:
+        # préfixe (département: "75"); motif constant => ix_entreprises_cp (varchar_pattern_ops)
+        stmt = stmt.where(Entreprise.cp.like(cp + "%"))
+    return _page(stmt, Entreprise, limit, offset, before_id)
+
+
+def get_interlocuteur(db: Session, interlocuteur_id: int) -> Optional[Interlocuteur]:
+    return db.get(Interlocuteur, interlocuteur_id)
+
+
+def interlocuteurs_page(
+    limit: int = 50,
+    offset: int = 0,
+    before_id: Optional[int] = None,
+    *,
+    entreprise_id: Optional[int] = None,
+) -> Select:
+    stmt = _select_out(Interlocuteur, InterlocuteurOut)
+    if entreprise_id is not None:
+        stmt = stmt.where(Interlocuteur.entreprise_id == entreprise_id)
+    return _page(stmt, Interlocuteur, limit, offset, before_id)
+
+
+def get_campagne(db: Session, campagne_id: int) -> Optional[Campagne]:
+    return db.get(Campagne, campagne_id)
+
+
+def campagnes_page(
+    limit: int = 50,
+    offset: int = 0,
+    before_id: Optional[int] = None,
+    *,
+    type: Optional[str] = None,
+    is_active: Optional[bool] = None,
+) -> Select:
+    stmt = _select_out(Campagne, CampagneOut)
+    if type is not None:
+        stmt = stmt.where(Campagne.type == type)
+    if is_active is not None:
+        stmt = stmt.where(Campagne.is_active == is_active)
+    return _page(stmt, Campagne, limit, offset, before_id)
+
+
+def get_action(db: Session, action_id: int) -> Optional[Action]:
+    return db.get(Action, action_id)
+
+
+def actions_page(
+    limit: int = 50,
+    offset: int = 0,
+    before_id: Optional[int] = None,
+    *,
+    owner_id: Optional[int] = None,
+    status: Optional[str] = None,
+    kind: Optional[str] = None,
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
+) -> Select:
+    stmt = _select_out(Action, ActionOut)
+    if owner_id is not None:
+        stmt = stmt.where(Action.owner_id == owner_id)
+    if status is not None:
+        stmt = stmt.where(Action.status == status)
+    if kind is not None:
+        stmt = stmt.where(Action.kind == kind)
+    # bornes sur due_at: partition pruning si PARTITIONING
+    if due_after is not None:
+        stmt = stmt.where(Action.due_at >= due_after)
+    if due_before is not None:
+        stmt = stmt.where(Action.due_at < due_before)
+    return _page(stmt, Action, limit, offset, before_id)
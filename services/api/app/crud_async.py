@@ -0,0 +1,375 @@
+from __future__ import annotations
+
+from typing import Optional, List
+from decimal import Decimal
+
+from sqlalchemy import select, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from . import cache
+from .crud import _select_out, _page, _compute_line_total
+from .expand import DEVIS, VENTE, dump, loader_options
+from .models import Produit, Devis, DevisProduit, Vente
+from .schemas import DevisProduitOut
+
+# Versions async de crud.py (DB_MODE=async). Mêmes signatures et mêmes
+# requêtes; les relations nécessaires aux schémas de sortie sont chargées
+# explicitement (pas de lazy load en async).
+
+
+async def _rows(db: AsyncSession, stmt: Select) -> List[dict]:
+    return [dict(r) for r in (await db.execute(stmt)).mappings()]
+
+
+async def fetch_page(db: AsyncSession, page: Select) -> List[dict]:
+    """Lignes d'une page de crud.py (`<table>_page`): même requête qu'en sync."""
+    return await _rows(db, page)
+
+
+# PRODUITS CRUD
+async def create_produit(
+    db: AsyncSession,
+    sku: str,
+    name: str,
+    unit_price: Optional[Decimal] = None,
+    currency: str = "EUR",
+    description: Optional[str] = None,
+) -> Produit:
+    p = Produit(
+        sku=sku,
+        name=name,
+        unit_price=unit_price,
+        currency=currency,
+        description=description,
+        is_active=True,
+    )
+    db.add(p)
+    await db.commit()
+    await cache.invalidate_produit_async(p.id)
+    await db.refresh(p)
+    return p
+
+
+async def get_produit(db: AsyncSession, produit_id: int) -> Optional[Produit]:
+    return await db.get(Produit, produit_id)
+
+
+async def get_produit_by_sku(db: AsyncSession, sku: str) -> Optional[Produit]:
+    return await db.scalar(select(Produit).where(Produit.sku == sku))
+
+
+async def update_produit(
+    db: AsyncSession,
+    produit_id: int,
+    *,
+    name: Optional[str] = None,
+    unit_price: Optional[Decimal] = None,
+    currency: Optional[str] = None,
+    description: Optional[str] = None,
+    is_active: Optional[bool] = None,
+) -> Optional[Produit]:
+    p = await db.get(Produit, produit_id)
+    if not p:
+        return None
+
+    if name is not None:
+        p.name = name
+    if unit_price is not None:
+        p.unit_price = unit_price
+    if currency is not None:
+        p.currency = currency
+    if description is not None:
+        p.description = description
+    if is_active is not None:
+        p.is_active = is_active
+
+    await db.commit()
+    await cache.invalidate_produit_async(produit_id)
+    await db.refresh(p)
+    return p
+
+
+async def delete_produit(db: AsyncSession, produit_id: int) -> bool:
+    p = await db.get(Produit, produit_id)
+    if not p:
+        return False
+    await db.delete(p)
+    await db.commit()
+    await cache.invalidate_produit_async(produit_id)
+    return True
+
+
+# DEVIS CRUD
+async def create_devis(
+    db: AsyncSession,
+    *,
+    owner_id: int,
+    entreprise_id: int,
+    code: str,
+    interlocuteur_id: Optional[int] = None,
+    campagne_id: Optional[int] = None,
+    title: Optional[str] = None,
+    status: str = "draft",
+    currency: str = "EUR",
+    notes: Optional[str] = None,
+) -> Devis:
+    d = Devis(
+        owner_id=owner_id,
+        entreprise_id=entreprise_id,
+        interlocuteur_id=interlocuteur_id,
+        campagne_id=campagne_id,
+        code=code,
+        title=title,
+        status=status,
+        currency=currency,
+        notes=notes,
+    )
+    db.add(d)
+    await db.commit()
+    await db.refresh(d)
+    await db.refresh(d, ["lines"])
+    return d
+
+
+async def get_devis(db: AsyncSession, devis_id: int) -> Optional[Devis]:
+    return await db.get(Devis, devis_id, options=[selectinload(Devis.lines)])
+
+
+async def get_devis_by_code(db: AsyncSession, code: str) -> Optional[Devis]:
+    return await db.scalar(select(Devis).where(Devis.code == code))
+
+
+async def get_devis_expanded(db: AsyncSession, devis_id: int, expand: frozenset[str]) -> Optional[dict]:
+    d = await db.scalar(select(Devis).where(Devis.id == devis_id).options(*loader_options(DEVIS, expand)))
+    return dump(d, DEVIS, expand) if d else None
+
+
+async def list_devis_expanded(
+    db: AsyncSession, expand: frozenset[str], limit: int = 50, offset: int = 0, before_id: Optional[int] = None
+) -> List[dict]:
+    stmt = _page(select(Devis).options(*loader_options(DEVIS, expand)), Devis, limit, offset, before_id)
+    return [dump(d, DEVIS, expand) for d in await db.scalars(stmt)]
+
+
+async def update_devis(
+    db: AsyncSession,
+    devis_id: int,
+    *,
+    title: Optional[str] = None,
+    status: Optional[str] = None,
+    notes: Optional[str] = None,
+    issue_date: Optional[object] = None,  # date
+    valid_until: Optional[object] = None,  # date
+    interlocuteur_id: Optional[int] = None,
+    campagne_id: Optional[int] = None,
+) -> Optional[Devis]:
+    d = await get_devis(db, devis_id)
+    if not d:
+        return None
+
+    if title is not None:
+        d.title = title
+    if status is not None:
+        d.status = status
+    if notes is not None:
+        d.notes = notes
+    if issue_date is not None:
+        d.issue_date = issue_date
+    if valid_until is not None:
+        d.valid_until = valid_until
+    if interlocuteur_id is not None:
+        d.interlocuteur_id = interlocuteur_id
+    if campagne_id is not None:
+        d.campagne_id = campagne_id
+
+    await db.commit()
+    await cache.invalidate_devis_async(devis_id)
+    await db.refresh(d)
+    return d
+
+
+async def delete_devis(db: AsyncSession, devis_id: int) -> bool:
+    d = await get_devis(db, devis_id)
+    if not d:
+        return False
+    await db.delete(d)
+    await db.commit()
+    await cache.invalidate_devis_async(devis_id)
+    return True
+
+
+# LIGNES DE DEVIS (DevisProduit) CRUD
+async def add_or_update_devis_line(
+    db: AsyncSession,
+    *,
+    devis_id: int,
+    produit_id: int,
+    quantity: int = 1,
+    unit_price: Optional[Decimal] = None,
+    currency: str = "EUR",
+) -> Optional[DevisProduit]:
+    d = await db.get(Devis, devis_id)
+    if not d:
+        return None
+
+    p = await db.get(Produit, produit_id)
+    if not p:
+        return None
+
+    # si unit_price non fourni => prix du produit (si existant)
+    if unit_price is None and p.unit_price is not None:
+        unit_price = Decimal(p.unit_price)
+
+    line = await db.scalar(
+        select(DevisProduit).where(
+            DevisProduit.devis_id == devis_id,
+            DevisProduit.produit_id == produit_id,
+        )
+    )
+
+    if line:
+        line.quantity = quantity
+        line.unit_price = unit_price
+        line.currency = currency
+        line.line_total = _compute_line_total(quantity, unit_price)
+    else:
+        line = DevisProduit(
+            devis_id=devis_id,
+            produit_id=produit_id,
+            quantity=quantity,
+            unit_price=unit_price,
+            currency=currency,
+            line_total=_compute_line_total(quantity, unit_price),
+        )
+        db.add(line)
+
+    # devis.total_amount est mis à jour par trigger (voir models.py)
+    await db.commit()
+    await cache.invalidate_devis_async(devis_id)
+    await db.refresh(line)
+    return line
+
+
+async def remove_devis_line(db: AsyncSession, *, devis_id: int, produit_id: int) -> bool:
+    line = await db.scalar(
+        select(DevisProduit).where(
+            DevisProduit.devis_id == devis_id,
+            DevisProduit.produit_id == produit_id,
+        )
+    )
+    if not line:
+        return False
+
+    await db.delete(line)
+    await db.commit()
+    await cache.invalidate_devis_async(devis_id)
+    return True
+
+
+async def list_devis_lines(db: AsyncSession, devis_id: int) -> List[dict]:
+    return await _rows(db, _select_out(DevisProduit, DevisProduitOut).where(DevisProduit.devis_id == devis_id))
+
+
+# VENTES CRUD (liée à un devis)
+async def create_vente_from_devis(
+    db: AsyncSession,
+    *,
+    owner_id: int,
+    entreprise_id: int,
+    devis_id: int,
+    interlocuteur_id: Optional[int] = None,
+    campagne_id: Optional[int] = None,
+    reference: Optional[str] = None,
+    status: str = "open",
+    probability: Optional[int] = None,
+    expected_close_date: Optional[object] = None,  # date
+    notes: Optional[str] = None,
+) -> Optional[Vente]:
+    # devis verrouillé (FOR UPDATE) avant le check: avec PARTITIONING il n'y a
+    # plus de uq_ventes_devis_id, deux créations concurrentes sont sérialisées ici
+    d = await db.get(Devis, devis_id, with_for_update=True)
+    if not d:
+        return None
+
+    # 1 vente max par devis
+    existing = await db.scalar(select(Vente).where(Vente.devis_id == devis_id))
+    if existing:
+        return existing
+
+    # amount par défaut = total du devis si dispo
+    amount = d.total_amount
+
+    v = Vente(
+        owner_id=owner_id,
+        entreprise_id=entreprise_id,
+        interlocuteur_id=interlocuteur_id,
+        campagne_id=campagne_id,
+        devis_id=devis_id,
+        reference=reference,
+        amount=amount,
+        currency=d.currency,
+        status=status,
+        probability=probability,
+        expected_close_date=expected_close_date,
+        notes=notes,
+    )
+    db.add(v)
+    await db.commit()
+    await db.refresh(v)
+    return v
+
+
+async def get_vente(db: AsyncSession, vente_id: int) -> Optional[Vente]:
+    return await db.get(Vente, vente_id)
+
+
+async def get_vente_expanded(db: AsyncSession, vente_id: int, expand: frozenset[str]) -> Optional[dict]:
+    v = await db.scalar(select(Vente).where(Vente.id == vente_id).options(*loader_options(VENTE, expand)))
+    return dump(v, VENTE, expand) if v else None
+
+
+async def list_ventes_expanded(
+    db: AsyncSession, expand: frozenset[str], limit: int = 50, offset: int = 0, before_id: Optional[int] = None
+) -> List[dict]:
+    stmt = _page(select(Vente).options(*loader_options(VENTE, expand)), Vente, limit, offset, before_id)
+    return [dump(v, VENTE, expand) for v in await db.scalars(stmt)]
+
+
+async def update_vente(
+    db: AsyncSession,
+    vente_id: int,
+    *,
+    status: Optional[str] = None,
+    probability: Optional[int] = None,
+    expected_close_date: Optional[object] = None,  # date
+    closed_at: Optional[object] = None,  # datetime
+    notes: Optional[str] = None,
+) -> Optional[Vente]:
+    v = await db.get(Vente, vente_id)
+    if not v:
+        return None
+
+    if status is not None:
+        v.status = status
+    if probability is not None:
+        v.probability = probability
+    if expected_close_date is not None:
+        v.expected_close_date = expected_close_date
+    if closed_at is not None:
+        v.closed_at = closed_at
+    if notes is not None:
+        v.notes = notes
+
+    await db.commit()
+    await db.refresh(v)
+    return v
+
+
+async def delete_vente(db: AsyncSession, vente_id: int) -> bool:
+    v = await db.get(Vente, vente_id)
+    if not v:
+        return False
+    await db.delete(v)
+    await db.commit()
+    return True
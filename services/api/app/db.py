@@ -1,15 +1,59 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from .config import settings
+from . import pool_metrics
+
+
+def pool_kwargs(name: str, queue_pool_class=QueuePool) -> dict:
+    """
+    Options de pool depuis Settings. DB_POOL_MODE=null: pas de pool côté app
+    (une connexion par checkout), à utiliser derrière PgBouncer.
+    """
+    metrics = pool_metrics.registry.setdefault(name, pool_metrics.PoolMetrics(name))
+    if settings.DB_POOL_MODE == "null":
+        return {"poolclass": pool_metrics.instrumented_pool_class(NullPool, metrics)}
+    return {
+        "poolclass": pool_metrics.instrumented_pool_class(queue_pool_class, metrics),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
 
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
+    **pool_kwargs("sync"),
 )
+pool_metrics.attach(engine, pool_metrics.registry["sync"])
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+# Stack async (DB_MODE=async): asyncpg + AsyncSession.
+# expire_on_commit=False: pas de lazy load implicite après commit en async.
+def async_database_url() -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    return make_url(settings.DATABASE_URL).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+
+async_engine: AsyncEngine | None = None
+AsyncSessionLocal: async_sessionmaker | None = None
+
+if settings.DB_MODE == "async":
+    async_engine = create_async_engine(
+        async_database_url(),
+        pool_pre_ping=True,
+        **pool_kwargs("async", AsyncAdaptedQueuePool),
+    )
+    pool_metrics.attach(async_engine.sync_engine, pool_metrics.registry["async"])
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -20,3 +64,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
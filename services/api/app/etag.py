@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Optional
+
+from fastapi import Response
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .models import Devis, DevisProduit
+
+# GET conditionnels: ETag calculé par une requête légère avant la vraie
+# lecture, `If-None-Match` qui correspond => 304 sans corps.
+#   - détail: ETag fort sur (id, updated_at); devis: + nombre de lignes
+#   - page de liste: ETag faible sur (nombre de lignes, id min / max,
+#     max(updated_at)) de la page: les ids sont croissants, une insertion,
+#     une suppression ou une modification dans la page change l'un des quatre
+# Les deux lisent ix_<table>_id (id) INCLUDE (updated_at) (voir models.py):
+# index-only scan, pas de lecture des lignes.
+#
+# Non couverts: `expand` (relations modifiées sans toucher updated_at) et les
+# endpoints sans updated_at (lignes de devis, stats).
+
+ETAG_HEADER = "ETag"
+
+
+def _digest(*parts) -> str:
+    return hashlib.blake2b("|".join(str(p) for p in parts).encode(), digest_size=8).hexdigest()
+
+
+def detail_query(model, id: int) -> Select:
+    return select(model.id, model.updated_at).where(model.id == id)
+
+
+def devis_query(devis_id: int) -> Select:
+    lines = select(func.count()).where(DevisProduit.devis_id == devis_id).scalar_subquery()
+    return detail_query(Devis, devis_id).add_columns(lines)
+
+
+def page_query(page: Select, model) -> Select:
+    """Résumé d'une page de liste (même filtre / ordre / limite que `page`)."""
+    sub = page.with_only_columns(model.id, model.updated_at).subquery()
+    return select(func.count(), func.min(sub.c.id), func.max(sub.c.id), func.max(sub.c.updated_at))
+
+
+def strong(row) -> Optional[str]:
+    return None if row is None else f'"{_digest(*row)}"'
+
+
+def weak(row) -> str:
+    return f'W/"{_digest(*row)}"'
+
+
+def detail_etag(db: Session, model, id: int) -> Optional[str]:
+    """None si la ligne n'existe pas."""
+    return strong(db.execute(detail_query(model, id)).first())
+
+
+def devis_etag(db: Session, devis_id: int) -> Optional[str]:
+    return strong(db.execute(devis_query(devis_id)).first())
+
+
+def page_etag(db: Session, page: Select, model) -> str:
+    return weak(db.execute(page_query(page, model)).one())
+
+
+async def detail_etag_async(db: AsyncSession, model, id: int) -> Optional[str]:
+    return strong((await db.execute(detail_query(model, id))).first())
+
+
+async def devis_etag_async(db: AsyncSession, devis_id: int) -> Optional[str]:
+    return strong((await db.execute(devis_query(devis_id))).first())
+
+
+async def page_etag_async(db: AsyncSession, page: Select, model) -> str:
+    return weak((await db.execute(page_query(page, model))).one())
+
+
+def matches(if_none_match: Optional[str], tag: Optional[str]) -> bool:
+    # If-None-Match: comparaison faible (W/ ignoré), liste ou "*"
+    if not if_none_match or not tag:
+        return False
+    wanted = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return "*" in wanted or tag.removeprefix("W/") in wanted
+
+
+def not_modified(tag: str) -> Response:
+    return Response(status_code=304, headers={ETAG_HEADER: tag})
+
+
+def conditional(response: Response, if_none_match: Optional[str]) -> Response:
+    """Réponse déjà construite (cache.py): 304 si son ETag correspond."""
+    tag = response.headers.get(ETAG_HEADER)
+    return not_modified(tag) if matches(if_none_match, tag) else response
+
+
+def tagged(response: Response, tag: str) -> Response:
+    response.headers[ETAG_HEADER] = tag
+    return response
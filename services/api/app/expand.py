@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy.orm import joinedload, selectinload
+
+from .models import Devis, DevisProduit, Vente
+from .schemas import (
+    CampagneOut,
+    DevisProduitOut,
+    DevisSummaryOut,
+    EntrepriseOut,
+    InterlocuteurOut,
+    ProduitOut,
+    UserOut,
+    VenteOut,
+)
+
+# Paramètre `expand` des endpoints devis / ventes: relations à inclure dans la
+# réponse, séparées par des virgules, chemins pointés pour aller plus loin
+# (`lines.produit`, `devis.lines.produit`), `*` pour tout le premier niveau.
+#
+# Chaque relation a sa stratégie de chargement, choisie une fois pour toutes:
+#   - many-to-one (owner, entreprise, ...): joinedload, dans la requête
+#     principale (INNER JOIN quand la FK est NOT NULL)
+#   - collections / one-to-one inverses (lines, vente): selectinload, une
+#     requête `WHERE ... IN (...)` pour toute la page
+# Une page de 200 devis entièrement dépliés coûte donc 3 requêtes, pas une
+# par relation et par devis.
+
+
+@dataclass(frozen=True)
+class Edge:
+    attr: object  # relation ORM
+    strategy: str  # "joined", "joined_inner" ou "selectin"
+    node: "Node"
+
+
+@dataclass(frozen=True)
+class Node:
+    schema: type[BaseModel]
+    edges: dict[str, Edge] = field(default_factory=dict)
+
+
+PRODUIT = Node(ProduitOut)
+LINE = Node(DevisProduitOut, {"produit": Edge(DevisProduit.produit, "joined_inner", PRODUIT)})
+
+
+def _parties(model) -> dict[str, Edge]:
+    return {
+        "owner": Edge(model.owner, "joined_inner", Node(UserOut)),
+        "entreprise": Edge(model.entreprise, "joined_inner", Node(EntrepriseOut)),
+        "interlocuteur": Edge(model.interlocuteur, "joined", Node(InterlocuteurOut)),
+        "campagne": Edge(model.campagne, "joined", Node(CampagneOut)),
+    }
+
+
+DEVIS = Node(
+    DevisSummaryOut,
+    {
+        **_parties(Devis),
+        "lines": Edge(Devis.lines, "selectin", LINE),
+        "vente": Edge(Devis.vente, "selectin", Node(VenteOut)),
+    },
+)
+VENTE = Node(
+    VenteOut,
+    {
+        **_parties(Vente),
+        # le devis d'une vente, sans repartir vers la vente
+        "devis": Edge(Vente.devis, "joined_inner", Node(DevisSummaryOut, {"lines": Edge(Devis.lines, "selectin", LINE)})),
+    },
+)
+
+
+def _paths(node: Node, prefix: str = "") -> list[str]:
+    out = []
+    for name, edge in node.edges.items():
+        out.append(prefix + name)
+        out += _paths(edge.node, f"{prefix}{name}.")
+    return out
+
+
+def parse_expand(value: Optional[str], root: Node) -> frozenset[str]:
+    """`expand` -> chemins demandés (avec leurs préfixes); 400 si un chemin est inconnu."""
+    if not value:
+        return frozenset()
+    allowed = set(_paths(root))
+    names = set()
+    for raw in value.split(","):
+        path = raw.strip()
+        if not path:
+            continue
+        if path == "*":
+            names.update(root.edges)
+            continue
+        if path not in allowed:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown expand {path!r} (allowed: {', '.join(sorted(allowed))})"
+            )
+        parts = path.split(".")
+        names.update(".".join(parts[: i + 1]) for i in range(len(parts)))
+    return frozenset(names)
+
+
+def _load(parent, edge: Edge):
+    if edge.strategy == "selectin":
+        return selectinload(edge.attr) if parent is None else parent.selectinload(edge.attr)
+    inner = edge.strategy == "joined_inner"
+    return joinedload(edge.attr, innerjoin=inner) if parent is None else parent.joinedload(edge.attr, innerjoin=inner)
+
+
+def loader_options(root: Node, names: frozenset[str]) -> list:
+    """Options de chargement pour les chemins demandés (une par feuille)."""
+    options = []
+
+    def walk(node: Node, prefix: str, parent) -> None:
+        for name, edge in node.edges.items():
+            path = prefix + name
+            if path not in names:
+                continue
+            loader = _load(parent, edge)
+            children = [n for n in edge.node.edges if f"{path}.{n}" in names]
+            if children:
+                walk(edge.node, f"{path}.", loader)
+            else:
+                options.append(loader)
+
+    walk(root, "", None)
+    return options
+
+
+def dump(obj, root: Node, names: frozenset[str], prefix: str = "") -> dict:
+    """Objet ORM -> dict (champs du schéma + relations demandées, déjà chargées)."""
+    out = root.schema.model_validate(obj).model_dump()
+    for name, edge in root.edges.items():
+        path = prefix + name
+        if path not in names:
+            continue
+        value = getattr(obj, name)
+        if isinstance(value, list):
+            out[name] = [dump(v, edge.node, names, f"{path}.") for v in value]
+        else:
+            out[name] = None if value is None else dump(value, edge.node, names, f"{path}.")
+    return out
@@ -1,15 +1,22 @@
 from __future__ import annotations
 
+import argparse
+import logging
 import random
+import threading
+import time
 from datetime import datetime, timedelta, date
+from decimal import Decimal
 
-from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from sqlalchemy import select
+from sqlalchemy import select, text
 from sqlalchemy.orm import Session
 
+from . import sampling
 from .config import settings
-from .db import SessionLocal
+from .crud import _compute_line_total
+from .db import SessionLocal, engine
 from .models import (
     User,
     Entreprise,
@@ -21,16 +28,15 @@ from .models import (
     Vente,
     Action,
 )
+from .partitioning import partition_maintenance
+from .rollups import rollup_rebuild, rollup_refresh
 
-scheduler: BackgroundScheduler | None = None
+logger = logging.getLogger(__name__)
 
 
 def _pick_one(db: Session, model):
-    ids = list(db.scalars(select(model.id)))
-    if not ids:
-        return None
-    chosen_id = random.choice(ids)
-    return db.get(model, chosen_id)
+    # ligne aléatoire en temps constant (plage d'ids en cache + accès PK), voir sampling.py
+    return sampling.pick_one(db, model)
 
 
 def _create_action(db: Session) -> None:
@@ -96,28 +102,19 @@ def _create_devis_and_sale_sometimes(db: Session) -> None:
         valid_until=date.today() + timedelta(days=30),
         currency=prod.currency or "EUR",
         notes="Generated by hourly scheduler",
-        total_amount=None,
     )
     db.add(d)
     db.commit()
     db.refresh(d)
 
     # ajout 1-3 lignes (produits aléatoires)
-    product_ids = list(db.scalars(select(Produit.id)))
-    if not product_ids:
+    chosen_products = sampling.pick_many(db, Produit, random.randint(1, 3))
+    if not chosen_products:
         return
 
-    chosen_products = random.sample(product_ids, k=min(random.randint(1, 3), len(product_ids)))
-
-    total = 0.0
-    for pid in chosen_products:
-        p = db.get(Produit, pid)
-        if not p:
-            continue
+    for p in chosen_products:
         qty = random.randint(1, 8)
-        unit_price = float(p.unit_price) if p.unit_price is not None else random.choice([49.0, 99.0, 199.0])
-        line_total = qty * unit_price
-        total += line_total
+        unit_price = p.unit_price if p.unit_price is not None else Decimal(random.choice(["49.00", "99.00", "199.00"]))
 
         line = DevisProduit(
             devis_id=d.id,
@@ -125,11 +122,11 @@ def _create_devis_and_sale_sometimes(db: Session) -> None:
             quantity=qty,
             unit_price=unit_price,
             currency=p.currency or "EUR",
-            line_total=line_total,
+            line_total=_compute_line_total(qty, unit_price),
         )
         db.add(line)
 
-    d.total_amount = total
+    # total_amount maintenu par les triggers de devis_produits; refresh le relit
     db.commit()
     db.refresh(d)
 
@@ -138,6 +135,8 @@ def _create_devis_and_sale_sometimes(db: Session) -> None:
     if not should_create_sale:
         return
 
+    # verrou du devis avant le check (une vente par devis, même sans uq_ventes_devis_id)
+    db.execute(select(Devis.id).where(Devis.id == d.id).with_for_update())
     existing_sale = db.scalar(select(Vente).where(Vente.devis_id == d.id).limit(1))
     if existing_sale:
         return
@@ -172,12 +171,8 @@ def hourly_crm_job() -> None:
         db.close()
 
 
-def start_scheduler() -> None:
-    global scheduler
-    if scheduler is not None:
-        return
-
-    scheduler = BackgroundScheduler(timezone=settings.APP_TIMEZONE)
+def build_scheduler() -> BlockingScheduler:
+    scheduler = BlockingScheduler(timezone=settings.APP_TIMEZONE)
 
     scheduler.add_job(
         hourly_crm_job,
@@ -189,11 +184,129 @@ def start_scheduler() -> None:
         coalesce=True,
     )
 
-    scheduler.start()
+    if settings.PARTITIONING:
+        # partitions mensuelles créées PARTITION_PREMAKE_MONTHS mois à l'avance
+        scheduler.add_job(
+            partition_maintenance,
+            trigger=IntervalTrigger(hours=24),
+            id="partition_maintenance",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+            next_run_time=datetime.now(scheduler.timezone),  # et une fois au démarrage
+        )
+
+    # rollups KPI de /stats: refresh incrémental + rebuild complet quotidien
+    scheduler.add_job(
+        rollup_refresh,
+        trigger=IntervalTrigger(seconds=settings.ROLLUP_REFRESH_SECONDS),
+        id="rollup_refresh",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+        next_run_time=datetime.now(scheduler.timezone),
+    )
+    scheduler.add_job(
+        rollup_rebuild,
+        trigger=IntervalTrigger(hours=24),
+        id="rollup_rebuild",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
+
+    if settings.SIM_EVENTS_PER_SECOND > 0:
+        from .simulation import simulation_tick
+
+        # chaque exécution se cale sur SIM_TICK_SECONDS: les exécutions s'enchaînent
+        scheduler.add_job(
+            simulation_tick,
+            trigger=IntervalTrigger(seconds=settings.SIM_TICK_SECONDS),
+            id="simulation_tick",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+
+    return scheduler
 
 
-def stop_scheduler() -> None:
-    global scheduler
-    if scheduler is not None:
+# ----------------------------
+# Job runner (python -m app.jobs run)
+# ----------------------------
+# Le scheduler tourne dans son propre process, jamais dans les workers de
+# l'API. Plusieurs runners peuvent être lancés (HA): celui qui tient l'advisory
+# lock Postgres LEADER_LOCK_KEY exécute les jobs, les autres attendent. Le
+# verrou appartient à une connexion dédiée; si elle tombe, le verrou est
+# perdu: le heartbeat arrête le scheduler et le runner repasse en attente.
+
+LEADER_LOCK_KEY = 0x43524D4A  # "CRMJ"
+LOCK_RETRY_SECONDS = 10.0
+HEARTBEAT_SECONDS = 30.0
+
+
+def _heartbeat(lock_conn, scheduler: BlockingScheduler, lost: threading.Event) -> None:
+    try:
+        lock_conn.exec_driver_sql("SELECT 1")
+        lock_conn.commit()
+    except Exception:
+        logger.exception("job runner lost its lock connection")
+        lost.set()
         scheduler.shutdown(wait=False)
-        scheduler = None
+
+
+def run() -> None:
+    while True:
+        lost = threading.Event()
+        with engine.connect() as lock_conn:
+            leader = lock_conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": LEADER_LOCK_KEY})
+            lock_conn.commit()  # verrou de session: pas de transaction laissée ouverte
+            if not leader:
+                logger.info("another job runner is active, retrying in %.0fs", LOCK_RETRY_SECONDS)
+                time.sleep(LOCK_RETRY_SECONDS)
+                continue
+
+            logger.info("job runner is active (advisory lock %#x)", LEADER_LOCK_KEY)
+            scheduler = build_scheduler()
+            scheduler.add_job(
+                _heartbeat,
+                trigger=IntervalTrigger(seconds=HEARTBEAT_SECONDS),
+                args=(lock_conn, scheduler, lost),
+                id="job_runner_heartbeat",
+                max_instances=1,
+                coalesce=True,
+            )
+            try:
+                scheduler.start()  # bloquant jusqu'au shutdown
+            except (KeyboardInterrupt, SystemExit):
+                return
+            if not lost.is_set():
+                return
+        logger.warning("job runner back to standby")
+
+
+JOBS = {
+    "hourly_crm_job": hourly_crm_job,
+    "partition_maintenance": partition_maintenance,
+    "rollup_refresh": rollup_refresh,
+    "rollup_rebuild": rollup_rebuild,
+}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("run", help="run the scheduler (only one active runner, via a Postgres advisory lock)")
+    once = sub.add_parser("once", help="run one job now and exit")
+    once.add_argument("job", choices=sorted(JOBS))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    if args.command == "run":
+        run()
+    else:
+        JOBS[args.job]()
+
+
+if __name__ == "__main__":
+    main()
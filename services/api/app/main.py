@@ -1,11 +1,19 @@
 from __future__ import annotations
 
-from fastapi import FastAPI, Depends, HTTPException
+from datetime import datetime
+from functools import partial
+from typing import Literal
+
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy import text, select
 from sqlalchemy.orm import Session
 
-from .db import engine, Base, get_db, SessionLocal
-from . import crud
+from .config import settings
+from .db import get_db
+from . import cache, crud, etag, pool_metrics, search, startup, stats
+from .expand import DEVIS, VENTE, parse_expand
+from .pagination import decode_cursor, page_response
 from .models import (
     User,
     Entreprise,
@@ -15,25 +23,37 @@ from .models import (
     Devis,
     DevisProduit,
     Vente,
+    Action,
 )
 
-from .jobs import start_scheduler, stop_scheduler
-
-from .seeders import seed_crm_data
+from .schemas import (
+    ProduitOut,
+    DevisSummaryOut,
+    DevisOut,
+    DevisProduitOut,
+    DevisLineUpsert,
+    VenteOut,
+    UserOut,
+    EntrepriseOut,
+    InterlocuteurOut,
+    CampagneOut,
+    ActionOut,
+    StatsCountsOut,
+    PipelineOut,
+    RevenueBucketOut,
+    MonthlyRevenueOut,
+    TopDevisOut,
+    SearchHitOut,
+)
 
 
 app = FastAPI(title="CRM data simulation POC - FastAPI + Postgres", version="0.1.0")
 
+if settings.DB_MODE == "async":
+    from .async_api import router as async_router
 
-
-def reset_public_schema():
-    with engine.begin() as conn:
-        # Drop tout le schéma public + objets dépendants (tables, index, FK, etc.)
-        conn.execute(text("DROP SCHEMA IF EXISTS public CASCADE;"))
-        conn.execute(text("CREATE SCHEMA public;"))
-        # Optionnel: redonner les permissions par défaut
-        conn.execute(text("GRANT ALL ON SCHEMA public TO postgres;"))
-        conn.execute(text("GRANT ALL ON SCHEMA public TO public;"))
+    # inclus en premier: prend la main sur les routes sync de même chemin
+    app.include_router(async_router)
 
 
 
@@ -112,7 +132,7 @@ def seed_demo_data(db: Session) -> None:
     db.commit()
     db.refresh(devis)
 
-    # 7) Lignes devis (via CRUD pour recalcul total)
+    # 7) Lignes devis (via CRUD, total du devis mis à jour par trigger)
     crud.add_or_update_devis_line(db, devis_id=devis.id, produit_id=p1.id, quantity=3)
     crud.add_or_update_devis_line(db, devis_id=devis.id, produit_id=p2.id, quantity=2)
 
@@ -133,44 +153,88 @@ def seed_demo_data(db: Session) -> None:
 
 @app.on_event("startup")
 def on_startup():
-    # POC: Supprimer avant de creer  schema
-    reset_public_schema()
-
-    Base.metadata.create_all(bind=engine)
-
-
-    db = SessionLocal()
-    try:
-        #Seed les données
-        seed_crm_data(db, n_users=10, n_entreprises=100, seed=42)
-    finally:
-        db.close()
-
-    # start scheduler (if you still want hourly inserts for Action/Event you may adapt jobs)
-    start_scheduler()
-
+    # STARTUP_MODE=check: pas de reset ni de seed si la base est déjà à jour
+    # (voir startup.py); STARTUP_MODE=reset: on repart de zéro à chaque fois
+    startup.prepare_database(
+        dict(
+            n_users=10,
+            n_entreprises=100,
+            seed=42,
+            mode=settings.SEED_MODE,
+            workers=settings.SEED_WORKERS,
+            chunk_size=settings.SEED_CHUNK_SIZE,
+            defer_indexes=settings.SEED_DEFER_INDEXES,
+            index_workers=settings.SEED_INDEX_WORKERS,
+            maintenance_work_mem=settings.SEED_MAINTENANCE_WORK_MEM,
+        )
+    )
 
-@app.on_event("shutdown")
-def on_shutdown():
-    stop_scheduler()
+    # Scheduled jobs run in their own process: python -m app.jobs run
 
 
 # Health
 @app.get("/health")
 def health(db: Session = Depends(get_db)):
     db.execute(text("SELECT 1"))
-    return {"status": "ok"}
+    return {"status": "ok", "seed": startup.seed_state.as_dict()}
+
+
+# Metrics
+@app.get("/metrics/pool")
+def metrics_pool():
+    return pool_metrics.snapshot_all()
+
+
+@app.get("/metrics/cache")
+def metrics_cache():
+    return cache.response_cache.snapshot()
 
 
 # POC endpoints (simple CRUD)
 
+# GET conditionnels (voir etag.py): ETag calculé en index-only scan avant la
+# lecture; If-None-Match qui correspond => 304 sans corps.
+def _page_or_304(db: Session, page, model, limit: int, if_none_match: str | None) -> Response:
+    tag = etag.page_etag(db, page, model)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    return etag.tagged(page_response(crud.fetch_page(db, page), limit), tag)
+
+
+def _detail_or_304(tag: str | None, if_none_match: str | None, load, schema, not_found: str) -> Response:
+    if tag is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    obj = load()
+    if obj is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    return etag.tagged(ORJSONResponse(schema.model_validate(obj).model_dump()), tag)
+
+
 # --- Produits ---
-@app.get("/produits")
-def list_produits(limit: int = 50, offset: int = 0, db: Session = Depends(get_db)):
-    return crud.list_produits(db, limit=limit, offset=offset)
+# Les listes renvoient des dicts construits depuis les lignes SQL, sérialisés
+# directement par orjson (response_model sert à la doc OpenAPI).
+# Pagination: `cursor` (keyset, recommandé) ou `offset`; le curseur de la page
+# suivante est renvoyé dans l'en-tête X-Next-Cursor.
+# GET /produits, /produits/{id} et /devis/{id} passent par le cache de
+# réponses (cache.py), invalidé par les écritures de crud.py.
+@app.get("/produits", response_model=list[ProduitOut])
+def list_produits(
+    limit: int = 50,
+    offset: int = 0,
+    cursor: str | None = None,
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    key, hit = cache.lookup(cache.PRODUITS, limit, offset, cursor)
+    if hit is not None:
+        return etag.conditional(hit, if_none_match)
+    page = crud.produits_page(limit, offset, decode_cursor(cursor))
+    return cache.store(key, _page_or_304(db, page, Produit, limit, if_none_match))
 
 
-@app.post("/produits")
+@app.post("/produits", response_model=ProduitOut)
 def create_produit(
     sku: str,
     name: str,
@@ -185,12 +249,14 @@ def create_produit(
     return crud.create_produit(db, sku=sku, name=name, unit_price=unit_price, currency=currency, description=description)
 
 
-@app.get("/produits/{produit_id}")
-def get_produit(produit_id: int, db: Session = Depends(get_db)):
-    p = crud.get_produit(db, produit_id)
-    if not p:
-        raise HTTPException(status_code=404, detail="Produit not found")
-    return p
+@app.get("/produits/{produit_id}", response_model=ProduitOut)
+def get_produit(produit_id: int, if_none_match: str | None = Header(None), db: Session = Depends(get_db)):
+    key, hit = cache.lookup(cache.PRODUIT, produit_id)
+    if hit is not None:
+        return etag.conditional(hit, if_none_match)
+    tag = etag.detail_etag(db, Produit, produit_id)
+    load = partial(crud.get_produit, db, produit_id)
+    return cache.store(key, _detail_or_304(tag, if_none_match, load, ProduitOut, "Produit not found"))
 
 
 @app.delete("/produits/{produit_id}")
@@ -202,12 +268,23 @@ def delete_produit(produit_id: int, db: Session = Depends(get_db)):
 
 
 # --- Devis ---
-@app.get("/devis")
-def list_devis(limit: int = 50, offset: int = 0, db: Session = Depends(get_db)):
-    return crud.list_devis(db, limit=limit, offset=offset)
+@app.get("/devis", response_model=list[DevisSummaryOut])
+def list_devis(
+    limit: int = 50,
+    offset: int = 0,
+    cursor: str | None = None,
+    expand: str | None = None,
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    names = parse_expand(expand, DEVIS)
+    if not names:
+        return _page_or_304(db, crud.devis_page(limit, offset, decode_cursor(cursor)), Devis, limit, if_none_match)
+    rows = crud.list_devis_expanded(db, names, limit=limit, offset=offset, before_id=decode_cursor(cursor))
+    return page_response(rows, limit)
 
 
-@app.post("/devis")
+@app.post("/devis", response_model=DevisOut)
 def create_devis(
     owner_id: int,
     entreprise_id: int,
@@ -237,23 +314,37 @@ def create_devis(
     )
 
 
-@app.get("/devis/{devis_id}")
-def get_devis(devis_id: int, db: Session = Depends(get_db)):
-    d = crud.get_devis(db, devis_id)
-    if not d:
-        raise HTTPException(status_code=404, detail="Devis not found")
-    return d
-
-
-@app.get("/devis/{devis_id}/lines")
+@app.get("/devis/{devis_id}", response_model=DevisOut)
+def get_devis(
+    devis_id: int,
+    expand: str | None = None,
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    names = parse_expand(expand, DEVIS)
+    if names:
+        # toujours avec les lignes: reste un sur-ensemble de DevisOut
+        d = crud.get_devis_expanded(db, devis_id, names | {"lines"})
+        if not d:
+            raise HTTPException(status_code=404, detail="Devis not found")
+        return ORJSONResponse(d)
+    key, hit = cache.lookup(cache.DEVIS, devis_id)
+    if hit is not None:
+        return etag.conditional(hit, if_none_match)
+    tag = etag.devis_etag(db, devis_id)
+    load = partial(crud.get_devis, db, devis_id)
+    return cache.store(key, _detail_or_304(tag, if_none_match, load, DevisOut, "Devis not found"))
+
+
+@app.get("/devis/{devis_id}/lines", response_model=list[DevisProduitOut])
 def list_devis_lines(devis_id: int, db: Session = Depends(get_db)):
     d = crud.get_devis(db, devis_id)
     if not d:
         raise HTTPException(status_code=404, detail="Devis not found")
-    return crud.list_devis_lines(db, devis_id=devis_id)
+    return ORJSONResponse(crud.list_devis_lines(db, devis_id=devis_id))
 
 
-@app.post("/devis/{devis_id}/lines")
+@app.post("/devis/{devis_id}/lines", response_model=DevisProduitOut)
 def add_or_update_devis_line(
     devis_id: int,
     produit_id: int,
@@ -275,6 +366,14 @@ def add_or_update_devis_line(
     return line
 
 
+@app.post("/devis/{devis_id}/lines:batch", response_model=list[DevisProduitOut])
+def upsert_devis_lines(devis_id: int, lines: list[DevisLineUpsert], db: Session = Depends(get_db)):
+    rows = crud.upsert_devis_lines(db, devis_id=devis_id, lines=lines)
+    if rows is None:
+        raise HTTPException(status_code=404, detail="Devis or Produit not found")
+    return ORJSONResponse(rows)
+
+
 @app.delete("/devis/{devis_id}/lines/{produit_id}")
 def remove_devis_line(devis_id: int, produit_id: int, db: Session = Depends(get_db)):
     ok = crud.remove_devis_line(db, devis_id=devis_id, produit_id=produit_id)
@@ -284,12 +383,23 @@ def remove_devis_line(devis_id: int, produit_id: int, db: Session = Depends(get_
 
 
 # --- Ventes ---
-@app.get("/ventes")
-def list_ventes(limit: int = 50, offset: int = 0, db: Session = Depends(get_db)):
-    return crud.list_ventes(db, limit=limit, offset=offset)
+@app.get("/ventes", response_model=list[VenteOut])
+def list_ventes(
+    limit: int = 50,
+    offset: int = 0,
+    cursor: str | None = None,
+    expand: str | None = None,
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    names = parse_expand(expand, VENTE)
+    if not names:
+        return _page_or_304(db, crud.ventes_page(limit, offset, decode_cursor(cursor)), Vente, limit, if_none_match)
+    rows = crud.list_ventes_expanded(db, names, limit=limit, offset=offset, before_id=decode_cursor(cursor))
+    return page_response(rows, limit)
 
 
-@app.post("/ventes/from-devis")
+@app.post("/ventes/from-devis", response_model=VenteOut)
 def create_vente_from_devis(
     owner_id: int,
     entreprise_id: int,
@@ -319,9 +429,203 @@ def create_vente_from_devis(
     return v
 
 
-@app.get("/ventes/{vente_id}")
-def get_vente(vente_id: int, db: Session = Depends(get_db)):
-    v = crud.get_vente(db, vente_id)
-    if not v:
-        raise HTTPException(status_code=404, detail="Vente not found")
-    return v
+@app.get("/ventes/{vente_id}", response_model=VenteOut)
+def get_vente(
+    vente_id: int,
+    expand: str | None = None,
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    names = parse_expand(expand, VENTE)
+    if names:
+        v = crud.get_vente_expanded(db, vente_id, names)
+        if not v:
+            raise HTTPException(status_code=404, detail="Vente not found")
+        return ORJSONResponse(v)
+    tag = etag.detail_etag(db, Vente, vente_id)
+    return _detail_or_304(tag, if_none_match, partial(crud.get_vente, db, vente_id), VenteOut, "Vente not found")
+
+
+# --- Users / entreprises / interlocuteurs / campagnes / actions (lecture) ---
+# Même pagination que les autres listes; chaque filtre a son index (models.py).
+@app.get("/users", response_model=list[UserOut])
+def list_users(
+    limit: int = 50,
+    offset: int = 0,
+    cursor: str | None = None,
+    is_active: bool | None = None,
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    page = crud.users_page(limit, offset, decode_cursor(cursor), is_active=is_active)
+    return _page_or_304(db, page, User, limit, if_none_match)
+
+
+@app.get("/users/{user_id}", response_model=UserOut)
+def get_user(user_id: int, if_none_match: str | None = Header(None), db: Session = Depends(get_db)):
+    tag = etag.detail_etag(db, User, user_id)
+    load = partial(crud.get_user, db, user_id)
+    return _detail_or_304(tag, if_none_match, load, UserOut, "User not found")
+
+
+@app.get("/entreprises", response_model=list[EntrepriseOut])
+def list_entreprises(
+    limit: int = 50,
+    offset: int = 0,
+    cursor: str | None = None,
+    ville: str | None = None,
+    secteur: str | None = None,
+    cp: str | None = Query(None, pattern=r"^\d{1,5}$", description="code postal ou préfixe (ex. 75)"),
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    page = crud.entreprises_page(limit, offset, decode_cursor(cursor), ville=ville, secteur=secteur, cp=cp)
+    return _page_or_304(db, page, Entreprise, limit, if_none_match)
+
+
+@app.get("/entreprises/{entreprise_id}", response_model=EntrepriseOut)
+def get_entreprise(entreprise_id: int, if_none_match: str | None = Header(None), db: Session = Depends(get_db)):
+    tag = etag.detail_etag(db, Entreprise, entreprise_id)
+    load = partial(crud.get_entreprise, db, entreprise_id)
+    return _detail_or_304(tag, if_none_match, load, EntrepriseOut, "Entreprise not found")
+
+
+@app.get("/entreprises/{entreprise_id}/interlocuteurs", response_model=list[InterlocuteurOut])
+def list_entreprise_interlocuteurs(
+    entreprise_id: int,
+    limit: int = 50,
+    offset: int = 0,
+    cursor: str | None = None,
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    page = crud.interlocuteurs_page(limit, offset, decode_cursor(cursor), entreprise_id=entreprise_id)
+    return _page_or_304(db, page, Interlocuteur, limit, if_none_match)
+
+
+@app.get("/interlocuteurs", response_model=list[InterlocuteurOut])
+def list_interlocuteurs(
+    limit: int = 50,
+    offset: int = 0,
+    cursor: str | None = None,
+    entreprise_id: int | None = None,
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    page = crud.interlocuteurs_page(limit, offset, decode_cursor(cursor), entreprise_id=entreprise_id)
+    return _page_or_304(db, page, Interlocuteur, limit, if_none_match)
+
+
+@app.get("/interlocuteurs/{interlocuteur_id}", response_model=InterlocuteurOut)
+def get_interlocuteur(interlocuteur_id: int, if_none_match: str | None = Header(None), db: Session = Depends(get_db)):
+    tag = etag.detail_etag(db, Interlocuteur, interlocuteur_id)
+    load = partial(crud.get_interlocuteur, db, interlocuteur_id)
+    return _detail_or_304(tag, if_none_match, load, InterlocuteurOut, "Interlocuteur not found")
+
+
+@app.get("/campagnes", response_model=list[CampagneOut])
+def list_campagnes(
+    limit: int = 50,
+    offset: int = 0,
+    cursor: str | None = None,
+    type: str | None = None,
+    is_active: bool | None = None,
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    page = crud.campagnes_page(limit, offset, decode_cursor(cursor), type=type, is_active=is_active)
+    return _page_or_304(db, page, Campagne, limit, if_none_match)
+
+
+@app.get("/campagnes/{campagne_id}", response_model=CampagneOut)
+def get_campagne(campagne_id: int, if_none_match: str | None = Header(None), db: Session = Depends(get_db)):
+    tag = etag.detail_etag(db, Campagne, campagne_id)
+    load = partial(crud.get_campagne, db, campagne_id)
+    return _detail_or_304(tag, if_none_match, load, CampagneOut, "Campagne not found")
+
+
+@app.get("/actions", response_model=list[ActionOut])
+def list_actions(
+    limit: int = 50,
+    offset: int = 0,
+    cursor: str | None = None,
+    owner_id: int | None = None,
+    status: str | None = None,
+    kind: str | None = None,
+    due_after: datetime | None = None,
+    due_before: datetime | None = None,
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    page = crud.actions_page(
+        limit,
+        offset,
+        decode_cursor(cursor),
+        owner_id=owner_id,
+        status=status,
+        kind=kind,
+        due_after=due_after,
+        due_before=due_before,
+    )
+    return _page_or_304(db, page, Action, limit, if_none_match)
+
+
+@app.get("/actions/{action_id}", response_model=ActionOut)
+def get_action(action_id: int, if_none_match: str | None = Header(None), db: Session = Depends(get_db)):
+    tag = etag.detail_etag(db, Action, action_id)
+    load = partial(crud.get_action, db, action_id)
+    return _detail_or_304(tag, if_none_match, load, ActionOut, "Action not found")
+
+
+# --- Recherche (type-ahead) ---
+# Préfixes de mots (tsvector) + sous-chaîne (trigram) dès 3 caractères, voir search.py.
+@app.get("/search", response_model=list[SearchHitOut])
+def search_crm(
+    q: str = Query(..., min_length=2, max_length=100),
+    type: Literal["all", "entreprise", "interlocuteur"] = "all",
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    types = search.SEARCH_TYPES if type == "all" else (type,)
+    return ORJSONResponse(search.search(db, q, types=types, limit=limit))
+
+
+# --- Stats (dashboard) ---
+# Agrégats SQL (voir stats.py): réponse de quelques Ko quel que soit le volume.
+# Pipeline et CA par campagne / owner / mois: lus dans les rollups (rollups.py).
+@app.get("/stats/counts", response_model=StatsCountsOut)
+def stats_counts(db: Session = Depends(get_db)):
+    return ORJSONResponse(stats.counts(db))
+
+
+@app.get("/stats/pipeline", response_model=PipelineOut)
+def stats_pipeline(db: Session = Depends(get_db)):
+    return ORJSONResponse(stats.pipeline(db))
+
+
+@app.get("/stats/revenue", response_model=list[RevenueBucketOut])
+def stats_revenue(
+    by: Literal["campagne", "secteur", "owner"] = "campagne",
+    status: str | None = "won",
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    return ORJSONResponse(stats.revenue(db, by=by, status=status or None, limit=limit))
+
+
+@app.get("/stats/revenue/monthly", response_model=list[MonthlyRevenueOut])
+def stats_revenue_monthly(
+    status: str | None = "won",
+    months: int = Query(12, ge=1, le=120),
+    db: Session = Depends(get_db),
+):
+    return ORJSONResponse(stats.monthly_revenue(db, status=status or None, months=months))
+
+
+@app.get("/stats/top-devis", response_model=list[TopDevisOut])
+def stats_top_devis(
+    limit: int = Query(20, ge=1, le=500),
+    status: str | None = None,
+    db: Session = Depends(get_db),
+):
+    return ORJSONResponse(stats.top_devis(db, limit=limit, status=status))
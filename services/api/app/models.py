@@ -14,18 +14,39 @@ from sqlalchemy import (
     Text,
     UniqueConstraint,
     Index,
+    Computed,
+    DDL,
+    event,
     func,
 )
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from .config import settings
 from .db import Base
 
+# PARTITIONING=true: actions et ventes partitionnées par mois (voir
+# partitioning.py). La clé de partition entre dans la PK (contrainte
+# Postgres); le mapper garde `id` seul comme identité (db.get inchangé).
+PARTITIONED = settings.PARTITIONING
+
+
+def _id_etag_index(table: str) -> Index:
+    # (id) INCLUDE (updated_at): ETag des GET (etag.py) en index-only scan,
+    # à la place du simple index sur id
+    return Index(f"ix_{table}_id", "id", postgresql_include=["updated_at"])
+
+
+# Recherche (search.py): index trigram (gin_trgm_ops) et tsvector
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
 
 # USERS
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (_id_etag_index("users"),)
 
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(primary_key=True)
 
     email: Mapped[str] = mapped_column(String(255), unique=True, index=True, nullable=False)
     full_name: Mapped[str] = mapped_column(String(150), nullable=False)
@@ -48,14 +69,23 @@ class Entreprise(Base):
     __tablename__ = "entreprises"
     __table_args__ = (
         UniqueConstraint("siren", name="uq_entreprises_siren"),
-        #Index("ix_entreprises_cp", "cp"),
-        #Index("ix_entreprises_nom", "nom"),
+        _id_etag_index("entreprises"),
+        # cp: égalité et préfixe (LIKE '75%') quelle que soit la collation
+        Index("ix_entreprises_cp", "cp", postgresql_ops={"cp": "varchar_pattern_ops"}),
+        Index("ix_entreprises_nom", "nom"),
+        # filtres des listes (triées par id): égalité + ordre sans tri
+        Index("ix_entreprises_ville", "ville", "id"),
+        Index("ix_entreprises_secteur", "secteur", "id"),
+        # /search: trigram GiST (ILIKE '%foo%' + candidats par distance, KNN) et
+        # mots (nom, ville, secteur)
+        Index("ix_entreprises_nom_trgm", "nom", postgresql_using="gist", postgresql_ops={"nom": "gist_trgm_ops"}),
+        Index("ix_entreprises_search_vector", "search_vector", postgresql_using="gin"),
     )
 
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(primary_key=True)
 
     siren: Mapped[str] = mapped_column(String(9), nullable=False)
-    nom: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
+    nom: Mapped[str] = mapped_column(String(255), nullable=False)
 
     nb_employe: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     cp: Mapped[Optional[str]] = mapped_column(String(10), nullable=True)
@@ -68,6 +98,17 @@ class Entreprise(Base):
     email: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     phone: Mapped[Optional[str]] = mapped_column(String(30), nullable=True)
 
+    # colonne générée (jamais écrite par l'app / les COPY): nom > ville, secteur
+    search_vector: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple', coalesce(nom, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(ville, '') || ' ' || coalesce(secteur, '')), 'B')",
+            persisted=True,
+        ),
+        deferred=True,
+    )
+
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
@@ -86,12 +127,23 @@ class Interlocuteur(Base):
     __tablename__ = "interlocuteurs"
     __table_args__ = (
         Index("ix_interlocuteurs_email", "email"),
+        _id_etag_index("interlocuteurs"),
         Index("ix_interlocuteurs_nom", "last_name", "first_name"),
+        # FK + liste par entreprise triée par id
+        Index("ix_interlocuteurs_entreprise_id", "entreprise_id", "id"),
+        # /search: trigram GiST sur "prénom nom email" (sous-chaîne + KNN), mots (+ rôle)
+        Index(
+            "ix_interlocuteurs_search_text_trgm",
+            "search_text",
+            postgresql_using="gist",
+            postgresql_ops={"search_text": "gist_trgm_ops"},
+        ),
+        Index("ix_interlocuteurs_search_vector", "search_vector", postgresql_using="gin"),
     )
 
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(primary_key=True)
 
-    entreprise_id: Mapped[int] = mapped_column(ForeignKey("entreprises.id", ondelete="CASCADE"), nullable=False, index=True)
+    entreprise_id: Mapped[int] = mapped_column(ForeignKey("entreprises.id", ondelete="CASCADE"), nullable=False)
 
     first_name: Mapped[Optional[str]] = mapped_column(String(120), nullable=True)
     last_name: Mapped[str] = mapped_column(String(120), nullable=False)
@@ -102,6 +154,23 @@ class Interlocuteur(Base):
 
     is_primary: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
 
+    # colonnes générées: texte pour le trigram, tsvector nom > email, rôle
+    search_text: Mapped[Optional[str]] = mapped_column(
+        Text,
+        Computed("coalesce(first_name, '') || ' ' || last_name || ' ' || coalesce(email, '')", persisted=True),
+        deferred=True,
+    )
+    search_vector: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple', coalesce(first_name, '') || ' ' || last_name), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(email, '')), 'B') || "
+            "setweight(to_tsvector('simple', coalesce(role, '')), 'C')",
+            persisted=True,
+        ),
+        deferred=True,
+    )
+
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
@@ -118,10 +187,11 @@ class Campagne(Base):
     __tablename__ = "campagnes"
     __table_args__ = (
         UniqueConstraint("code", name="uq_campagnes_code"),
+        _id_etag_index("campagnes"),
         Index("ix_campagnes_type", "type"),
     )
 
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(primary_key=True)
 
     code: Mapped[str] = mapped_column(String(50), nullable=False)
     nom: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -147,10 +217,11 @@ class Produit(Base):
     __tablename__ = "produits"
     __table_args__ = (
         UniqueConstraint("sku", name="uq_produits_sku"),
+        _id_etag_index("produits"),
         Index("ix_produits_name", "name"),
     )
 
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(primary_key=True)
 
     sku: Mapped[str] = mapped_column(String(80), nullable=False)   # référence produit
     name: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -174,11 +245,15 @@ class Devis(Base):
     __tablename__ = "devis"
     __table_args__ = (
         UniqueConstraint("code", name="uq_devis_code"),
+        _id_etag_index("devis"),
         Index("ix_devis_status", "status"),
         Index("ix_devis_issue_date", "issue_date"),
+        # rollups.py: lignes modifiées depuis le watermark, puis groupes (owner, jour)
+        Index("ix_devis_updated_at", "updated_at"),
+        Index("ix_devis_owner_created", "owner_id", "created_at"),
     )
 
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(primary_key=True)
 
     owner_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
 
@@ -199,7 +274,8 @@ class Devis(Base):
 
     notes: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
-    # total peut être recalculé à partir des lignes; on le garde optionnel (cache)
+    # cache de SUM(lignes.line_total), maintenu par les triggers de devis_produits
+    # (NULL tant qu'aucune ligne n'a de total)
     total_amount: Mapped[Optional[float]] = mapped_column(Numeric(12, 2), nullable=True)
     currency: Mapped[str] = mapped_column(String(3), default="EUR", nullable=False)
 
@@ -243,18 +319,94 @@ class DevisProduit(Base):
     produit: Mapped["Produit"] = relationship(back_populates="devis_lines")
 
 
+# Maintenance incrémentale de devis.total_amount: triggers par statement avec
+# tables de transition, un seul UPDATE de devis par statement qui applique la
+# somme des deltas par devis (coût proportionnel aux lignes modifiées, pas au
+# nombre de lignes du devis). Vaut pour tous les chemins d'écriture: ORM, COPY
+# du seed, INSERT ... ON CONFLICT. Contrôle: `python -m app.totals verify`.
+#
+# Une table de transition n'est visible que pour son event => une fonction par
+# event. Après UPDATE/DELETE, le total repasse à NULL si le devis n'a plus de
+# ligne chiffrée (même règle que l'ancien recalcul Python).
+# Tout devis touché voit son updated_at avancer (ETag), même si ses lignes ne
+# sont pas chiffrées: les NULL sont ignorés par SUM (delta NULL = total inchangé),
+# pas filtrés avant le GROUP BY.
+_APPLY_DELTA = """
+    UPDATE devis d
+    SET total_amount = {total}, updated_at = now()
+    FROM (
+        SELECT devis_id, SUM(amount) AS delta
+        FROM ({deltas}) x
+        GROUP BY devis_id
+    ) s
+    WHERE d.id = s.devis_id
+"""
+
+_TOTAL_ADD = "CASE WHEN s.delta IS NULL THEN d.total_amount ELSE COALESCE(d.total_amount, 0) + s.delta END"
+_TOTAL_ADD_OR_NULL = f"""CASE
+        WHEN EXISTS (
+            SELECT 1 FROM devis_produits l
+            WHERE l.devis_id = d.id AND l.line_total IS NOT NULL
+        ) THEN {_TOTAL_ADD}
+    END"""
+
+_DELTAS = {
+    "INSERT": "SELECT devis_id, line_total AS amount FROM new_lines",
+    "UPDATE": (
+        "SELECT devis_id, line_total AS amount FROM new_lines "
+        "UNION ALL SELECT devis_id, -line_total FROM old_lines"
+    ),
+    "DELETE": "SELECT devis_id, -line_total AS amount FROM old_lines",
+}
+
+_TRANSITIONS = {
+    "INSERT": "NEW TABLE AS new_lines",
+    "UPDATE": "OLD TABLE AS old_lines NEW TABLE AS new_lines",
+    "DELETE": "OLD TABLE AS old_lines",
+}
+
+DEVIS_TOTALS_DDL: list[str] = []
+for _op, _deltas in _DELTAS.items():
+    _fn = f"devis_totals_{_op.lower()}"
+    _total = _TOTAL_ADD if _op == "INSERT" else _TOTAL_ADD_OR_NULL
+    DEVIS_TOTALS_DDL += [
+        f"""
+        CREATE OR REPLACE FUNCTION {_fn}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            {_APPLY_DELTA.format(total=_total, deltas=_deltas)};
+            RETURN NULL;
+        END
+        $$
+        """,
+        f"""
+        CREATE TRIGGER devis_produits_totals_{_op.lower()}
+        AFTER {_op} ON devis_produits REFERENCING {_TRANSITIONS[_op]}
+        FOR EACH STATEMENT EXECUTE FUNCTION {_fn}()
+        """,
+    ]
+
+for _ddl in DEVIS_TOTALS_DDL:
+    event.listen(DevisProduit.__table__, "after_create", DDL(_ddl))
+
+
 # ACTIONS (liée à campagne ou non + interlocuteur)
 class Action(Base):
     __tablename__ = "actions"
     __table_args__ = (
-        Index("ix_actions_kind", "kind"),
-        Index("ix_actions_status", "status"),
+        # filtres de GET /actions (liste triée par id): égalité + ordre sans tri
+        Index("ix_actions_kind", "kind", "id"),
+        Index("ix_actions_status", "status", "id"),
+        Index("ix_actions_owner_id", "owner_id", "id"),
+        # plage due_after / due_before
         Index("ix_actions_due_at", "due_at"),
+        _id_etag_index("actions"),
+        {"postgresql_partition_by": "RANGE (due_at)"} if PARTITIONED else {},
     )
+    __mapper_args__ = {"primary_key": ["id"]}
 
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
 
-    owner_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    owner_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
     entreprise_id: Mapped[int] = mapped_column(ForeignKey("entreprises.id", ondelete="CASCADE"), nullable=False, index=True)
     interlocuteur_id: Mapped[Optional[int]] = mapped_column(
@@ -270,7 +422,10 @@ class Action(Base):
     title: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     notes: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
-    due_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    # partitionné: due_at obligatoire (membre de la PK)
+    due_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), primary_key=PARTITIONED, nullable=not PARTITIONED
+    )
     done_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -288,12 +443,20 @@ class Action(Base):
 class Vente(Base):
     __tablename__ = "ventes"
     __table_args__ = (
-        UniqueConstraint("devis_id", name="uq_ventes_devis_id"),  # 1 vente par devis
+        # 1 vente par devis. Partitionné: une contrainte UNIQUE doit contenir
+        # created_at, elle ne garantirait plus rien; l'unicité est tenue par
+        # les écritures (crud, jobs, simulation) et ix_ventes_devis_id.
+        *(() if PARTITIONED else (UniqueConstraint("devis_id", name="uq_ventes_devis_id"),)),
         Index("ix_ventes_status", "status"),
         Index("ix_ventes_closed_at", "closed_at"),
+        Index("ix_ventes_updated_at", "updated_at"),
+        Index("ix_ventes_owner_created", "owner_id", "created_at"),
+        _id_etag_index("ventes"),
+        {"postgresql_partition_by": "RANGE (created_at)"} if PARTITIONED else {},
     )
+    __mapper_args__ = {"primary_key": ["id"]}
 
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
 
     owner_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
 
@@ -319,7 +482,9 @@ class Vente(Base):
     closed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
     notes: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), primary_key=PARTITIONED, nullable=False
+    )
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
     )
@@ -329,3 +494,48 @@ class Vente(Base):
     interlocuteur: Mapped[Optional["Interlocuteur"]] = relationship(back_populates="ventes")
     campagne: Mapped[Optional["Campagne"]] = relationship(back_populates="ventes")
     devis: Mapped["Devis"] = relationship(back_populates="vente")
+
+
+if PARTITIONED:
+    # lignes hors des mois créés: partition DEFAULT (due_at / created_at sont NOT NULL)
+    for _table in (Action.__table__, Vente.__table__):
+        event.listen(_table, "after_create", DDL(f"CREATE TABLE {_table.name}_default PARTITION OF {_table.name} DEFAULT"))
+
+
+# ROLLUPS (agrégats journaliers, maintenus par rollups.py)
+# Pas de FK: une ligne peut survivre à son owner / sa campagne jusqu'au
+# prochain rebuild. campagne_id = 0: sans campagne (colonne de PK).
+class RollupVentesDaily(Base):
+    __tablename__ = "rollup_ventes_daily"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    owner_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    campagne_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    status: Mapped[str] = mapped_column(String(30), primary_key=True)
+
+    count: Mapped[int] = mapped_column(Integer, nullable=False)
+    amount: Mapped[float] = mapped_column(Numeric(16, 2), nullable=False)
+
+
+class RollupDevisDaily(Base):
+    __tablename__ = "rollup_devis_daily"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    owner_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    campagne_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    status: Mapped[str] = mapped_column(String(30), primary_key=True)
+
+    count: Mapped[int] = mapped_column(Integer, nullable=False)
+    amount: Mapped[float] = mapped_column(Numeric(16, 2), nullable=False)
+
+
+# META (version du schéma et empreinte du seed, lus au démarrage)
+class AppMeta(Base):
+    __tablename__ = "app_meta"
+
+    key: Mapped[str] = mapped_column(String(80), primary_key=True)
+    value: Mapped[str] = mapped_column(Text, nullable=False)
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
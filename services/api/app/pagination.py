@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import base64
+from typing import List, Optional
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+
+# Pagination keyset: les listes sont triées par id décroissant, le curseur
+# encode le dernier id vu et la page suivante est lue avec `WHERE id < :id`
+# (seek sur la PK), quelle que soit la profondeur. Le curseur est opaque pour
+# le client: base64url d'un petit JSON.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps({"id": last_id})).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = orjson.loads(base64.urlsafe_b64decode(padded))["id"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(last_id, int) or isinstance(last_id, bool):  # bool est un int
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last_id
+
+
+def next_cursor(rows: List[dict], limit: int) -> Optional[str]:
+    # page incomplète => plus rien après
+    if limit <= 0 or len(rows) < limit:
+        return None
+    return encode_cursor(rows[-1]["id"])
+
+
+def page_response(rows: List[dict], limit: int) -> ORJSONResponse:
+    """Corps = la liste (inchangé), `next_cursor` dans l'en-tête X-Next-Cursor."""
+    response = ORJSONResponse(rows)
+    cursor = next_cursor(rows, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return response
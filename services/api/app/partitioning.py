@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import Iterable
+
+from sqlalchemy import text
+
+from .config import settings
+from .db import engine
+
+logger = logging.getLogger(__name__)
+
+# Partitionnement par mois (PARTITIONING=true, voir models.py):
+#   actions  PARTITION BY RANGE (due_at)
+#   ventes   PARTITION BY RANGE (created_at)
+#
+# Une partition par mois UTC (`actions_p2025_01`, ...) + une partition DEFAULT
+# (`actions_default`: mois pas encore créés). Les chargements en masse (seed,
+# backfill, restore) créent d'abord les mois de leurs données: la DEFAULT ne
+# reçoit que des restes, déplacés ensuite par split_default. Les requêtes
+# filtrées sur la clé ne lisent que les partitions concernées (partition
+# pruning). Le job runner crée les mois à venir à l'avance et détache les
+# mois plus anciens que la rétention: DETACH est instantané, la partition
+# détachée reste une table ordinaire (archive, pg_dump, DROP).
+#
+#   python -m app.partitioning maintain
+#   python -m app.partitioning split-default
+#   python -m app.partitioning detach --before 2024-01-01 [--drop]
+
+PARTITIONED_TABLES = {"actions": "due_at", "ventes": "created_at"}  # table -> clé
+
+
+def month_start(d: date | datetime) -> date:
+    return date(d.year, d.month, 1)
+
+
+def add_months(d: date, n: int) -> date:
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def _bound(month: date) -> str:
+    return f"'{month:%Y-%m-%d} 00:00:00+00'"
+
+
+def is_partitioned(conn, table: str) -> bool:
+    return conn.scalar(text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table}) or False
+
+
+def list_partitions(conn, table: str) -> dict[date, str]:
+    """Partitions mensuelles attachées à `table` (mois -> nom)."""
+    names = conn.scalars(
+        text(
+            """
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:t AS regclass)
+            """
+        ),
+        {"t": table},
+    ).all()
+    pattern = re.compile(rf"^{table}_p(\d{{4}})_(\d{{2}})$")
+    out = {}
+    for name in names:
+        m = pattern.match(name)
+        if m:
+            out[date(int(m.group(1)), int(m.group(2)), 1)] = name
+    return out
+
+
+def create_partition(conn, table: str, month: date) -> str:
+    """
+    Crée la partition du mois. Si la partition DEFAULT contient déjà des
+    lignes de ce mois, elles y sont déplacées (sinon l'ATTACH échouerait).
+    """
+    column = PARTITIONED_TABLES[table]
+    name = partition_name(table, month)
+    lo, hi = month, add_months(month, 1)
+    bounds = f"FOR VALUES FROM ({_bound(lo)}) TO ({_bound(hi)})"
+    where = f"{column} >= :lo AND {column} < :hi"
+    params = {
+        "lo": datetime(lo.year, lo.month, 1, tzinfo=timezone.utc),
+        "hi": datetime(hi.year, hi.month, 1, tzinfo=timezone.utc),
+    }
+
+    if not conn.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {table}_default WHERE {where})"), params):
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF {table} {bounds}"))
+        return name
+
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = conn.execute(text(f"INSERT INTO {name} SELECT * FROM {table}_default WHERE {where}"), params).rowcount
+    conn.execute(text(f"DELETE FROM {table}_default WHERE {where}"), params)
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} {bounds}"))
+    logger.info("partition %s: moved %d rows from %s_default", name, moved, table)
+    return name
+
+
+def ensure_partitions(
+    conn, start: date | datetime, end: date | datetime, tables: Iterable[str] = tuple(PARTITIONED_TABLES)
+) -> list[str]:
+    """Crée les partitions manquantes des mois de `start` à `end` inclus."""
+    created = []
+    for table in tables:
+        if not is_partitioned(conn, table):
+            continue
+        existing = list_partitions(conn, table)
+        month, last = month_start(start), month_start(end)
+        while month <= last:
+            if month not in existing:
+                created.append(create_partition(conn, table, month))
+            month = add_months(month, 1)
+    if created:
+        logger.info("partitions created: %s", ", ".join(created))
+    return created
+
+
+def key_range(conn, table: str) -> tuple[datetime, datetime] | None:
+    """(min, max) de la clé de partition de `table`; None si la table est vide."""
+    column = PARTITIONED_TABLES[table]
+    lo, hi = conn.execute(text(f"SELECT min({column}), max({column}) FROM {table}")).one()
+    # partitions en mois UTC: bornes ramenées en UTC
+    return None if lo is None else (lo.astimezone(timezone.utc), hi.astimezone(timezone.utc))
+
+
+def split_default(conn) -> list[str]:
+    """Crée une partition pour chaque mois présent dans les partitions DEFAULT (après un chargement)."""
+    created = []
+    for table, column in PARTITIONED_TABLES.items():
+        if not is_partitioned(conn, table):
+            continue
+        months = conn.scalars(
+            text(
+                f"""
+                SELECT DISTINCT date_trunc('month', {column} AT TIME ZONE 'UTC')::date
+                FROM {table}_default WHERE {column} IS NOT NULL ORDER BY 1
+                """
+            )
+        ).all()
+        existing = list_partitions(conn, table)
+        created += [create_partition(conn, table, m) for m in months if m not in existing]
+    return created
+
+
+def detach_partitions(conn, before: date, *, drop: bool = False) -> list[str]:
+    """Détache (et supprime avec `drop`) les partitions des mois antérieurs à `before`."""
+    detached = []
+    cutoff = month_start(before)
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(conn, table):
+            continue
+        for month, name in sorted(list_partitions(conn, table).items()):
+            if month >= cutoff:
+                break
+            conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            if drop:
+                conn.execute(text(f"DROP TABLE {name}"))
+            detached.append(name)
+    if detached:
+        logger.info("partitions %s: %s", "dropped" if drop else "detached", ", ".join(detached))
+    return detached
+
+
+def maintain(
+    conn,
+    *,
+    ahead: int | None = None,
+    retention_months: int | None = None,
+    drop: bool = False,
+    today: date | None = None,
+) -> None:
+    """Mois courant + `ahead` mois créés à l'avance; rétention en mois (0 = tout garder)."""
+    ahead = settings.PARTITION_PREMAKE_MONTHS if ahead is None else ahead
+    retention_months = settings.PARTITION_RETENTION_MONTHS if retention_months is None else retention_months
+    current = month_start(today or datetime.now(timezone.utc))
+    ensure_partitions(conn, current, add_months(current, ahead))
+    if retention_months > 0:
+        detach_partitions(conn, add_months(current, -retention_months), drop=drop)
+
+
+def partition_maintenance() -> None:
+    """Job du runner: partitions à venir + rétention."""
+    with engine.begin() as conn:
+        maintain(conn)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.partitioning")
+    sub = parser.add_subparsers(dest="command", required=True)
+    m = sub.add_parser("maintain", help="create upcoming monthly partitions and apply retention")
+    m.add_argument("--ahead", type=int, default=None, help="months to create ahead (default: PARTITION_PREMAKE_MONTHS)")
+    m.add_argument("--retention-months", type=int, default=None, help="default: PARTITION_RETENTION_MONTHS (0 = keep)")
+    m.add_argument("--drop", action="store_true", help="drop detached partitions instead of keeping them")
+    sub.add_parser("split-default", help="move rows out of the DEFAULT partitions into monthly partitions")
+    d = sub.add_parser("detach", help="detach the partitions of the months before a date")
+    d.add_argument("--before", type=date.fromisoformat, required=True)
+    d.add_argument("--drop", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    with engine.begin() as conn:
+        if args.command == "maintain":
+            maintain(conn, ahead=args.ahead, retention_months=args.retention_months, drop=args.drop)
+        elif args.command == "split-default":
+            split_default(conn)
+        else:
+            detach_partitions(conn, args.before, drop=args.drop)
+
+
+if __name__ == "__main__":
+    main()
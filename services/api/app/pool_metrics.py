@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import Pool
+
+# Métriques du pool de connexions, exposées par /metrics/pool.
+# - checkout / checkin / connect / invalidate: events SQLAlchemy du pool
+# - temps d'attente d'une connexion + échecs de checkout (timeout, erreur de
+#   connexion): mesurés autour de Pool._do_get via une sous-classe du pool
+
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.checkout_failures = 0
+        self.checkout_timeouts = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.wait_count = 0
+        self.wait_sum_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)  # dernier = +Inf
+        self.engine = None
+
+    def observe_wait(self, seconds: float) -> None:
+        ms = seconds * 1000.0
+        with self._lock:
+            self.wait_count += 1
+            self.wait_sum_ms += ms
+            self.wait_max_ms = max(self.wait_max_ms, ms)
+            for i, bound in enumerate(WAIT_BUCKETS_MS):
+                if ms <= bound:
+                    self.wait_buckets[i] += 1
+                    break
+            else:
+                self.wait_buckets[-1] += 1
+
+    def observe_failure(self, exc: BaseException) -> None:
+        with self._lock:
+            self.checkout_failures += 1
+            if isinstance(exc, PoolTimeout):
+                self.checkout_timeouts += 1
+
+    def _on_checkout(self, *args) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def _on_checkin(self, *args) -> None:
+        with self._lock:
+            self.checkins += 1
+            self.checked_out -= 1
+
+    def _on_connect(self, *args) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def _on_invalidate(self, *args) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self) -> dict:
+        pool = self.engine.pool if self.engine is not None else None
+        with self._lock:
+            cumulative, acc = {}, 0
+            for bound, n in zip(WAIT_BUCKETS_MS, self.wait_buckets):
+                acc += n
+                cumulative[str(bound)] = acc
+            cumulative["+Inf"] = acc + self.wait_buckets[-1]
+            data = {
+                "pool_class": type(pool).__name__ if pool is not None else None,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "checkout_failures": self.checkout_failures,
+                "checkout_timeouts": self.checkout_timeouts,
+                "wait_ms": {
+                    "count": self.wait_count,
+                    "sum": round(self.wait_sum_ms, 3),
+                    "max": round(self.wait_max_ms, 3),
+                    "buckets": cumulative,  # cumulatif (<= borne en ms)
+                },
+            }
+        # QueuePool / AsyncAdaptedQueuePool uniquement
+        if pool is not None and hasattr(pool, "overflow"):
+            data.update(size=pool.size(), checked_in=pool.checkedin(), overflow=pool.overflow())
+        return data
+
+
+class _TimedGetMixin:
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        except BaseException as e:
+            self.metrics.observe_failure(e)
+            raise
+        finally:
+            self.metrics.observe_wait(time.perf_counter() - t0)
+
+
+def instrumented_pool_class(base: type[Pool], metrics: PoolMetrics) -> type[Pool]:
+    # la classe porte les métriques: elles survivent à Pool.recreate()
+    return type(f"Instrumented{base.__name__}", (_TimedGetMixin, base), {"metrics": metrics})
+
+
+def attach(engine, metrics: PoolMetrics) -> PoolMetrics:
+    """Branche les events du pool de `engine` (sync, ou `AsyncEngine.sync_engine`)."""
+    metrics.engine = engine
+    event.listen(engine, "checkout", metrics._on_checkout)
+    event.listen(engine, "checkin", metrics._on_checkin)
+    event.listen(engine, "connect", metrics._on_connect)
+    event.listen(engine, "invalidate", metrics._on_invalidate)
+    return metrics
+
+
+registry: dict[str, PoolMetrics] = {}
+
+
+def snapshot_all() -> dict:
+    return {name: m.snapshot() for name, m in registry.items()}
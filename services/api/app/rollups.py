@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from datetime import datetime
+
+from sqlalchemy import Date, DateTime, and_, cast, delete, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .config import settings
+from .db import engine
+from .models import AppMeta, Devis, RollupDevisDaily, RollupVentesDaily, Vente
+from .startup import read_meta, write_meta
+
+logger = logging.getLogger(__name__)
+
+# Rollups KPI: agrégats journaliers (jour, owner, campagne, status) -> count,
+# amount, pour ventes (amount) et devis (total_amount). Jour = created_at
+# dans APP_TIMEZONE.
+#
+# Rafraîchissement incrémental: les lignes dont updated_at est dans
+# ]watermark, now() - ROLLUP_LAG_SECONDS] désignent les groupes (jour, owner,
+# campagne) touchés; ces groupes sont recalculés entièrement (tous status:
+# un changement de status déplace la ligne d'un bucket à l'autre) via
+# ix_*_owner_created. Le décalage laisse aux transactions en cours (updated_at
+# = début de transaction) le temps de committer.
+#
+# Non vus par l'incrémental: suppressions, changement d'owner / campagne,
+# lignes écrites avec un updated_at ancien (backfill, restore). Le job fait un
+# rebuild complet par jour; backfill et restore effacent le watermark, ce qui
+# force un rebuild au passage suivant.
+#
+# refresh et rebuild sont deux jobs distincts (max_instances=1 ne vaut que par
+# job) et peuvent se chevaucher: chacun prend d'abord l'advisory lock de
+# transaction ROLLUP_LOCK_KEY, ils s'exécutent donc l'un après l'autre (sinon
+# le DELETE du rebuild ne voit pas les lignes insérées par un refresh
+# concurrent et son INSERT viole la PK du rollup).
+#
+#   python -m app.rollups refresh
+#   python -m app.rollups rebuild
+
+WATERMARK_KEY = "rollup_watermark"
+ROLLUP_LOCK_KEY = 0x43524D52  # "CRMR"
+
+ROLLUPS = (
+    (Vente, Vente.amount, RollupVentesDaily),
+    (Devis, Devis.total_amount, RollupDevisDaily),
+)
+
+
+def _day(model):
+    return cast(func.timezone(settings.APP_TIMEZONE, model.created_at), Date)
+
+
+def _campagne(model):
+    return func.coalesce(model.campagne_id, 0)
+
+
+def _aggregate(model, amount_col):
+    keys = (_day(model), model.owner_id, _campagne(model), model.status)
+    return select(
+        keys[0].label("day"),
+        keys[1],
+        keys[2].label("campagne_id"),
+        keys[3],
+        func.count().label("count"),
+        func.coalesce(func.sum(amount_col), 0).label("amount"),
+    ).group_by(*keys)
+
+
+def _insert(rollup, stmt):
+    return pg_insert(rollup).from_select(["day", "owner_id", "campagne_id", "status", "count", "amount"], stmt)
+
+
+def _refresh_table(conn, model, amount_col, rollup, lo: datetime, hi: datetime) -> int:
+    touched = (
+        select(_day(model).label("day"), model.owner_id.label("owner_id"), _campagne(model).label("campagne_id"))
+        .where(model.updated_at > lo, model.updated_at <= hi)
+        .distinct()
+        .subquery("touched")
+    )
+    keys = select(touched.c.day, touched.c.owner_id, touched.c.campagne_id)
+    conn.execute(delete(rollup).where(tuple_(rollup.day, rollup.owner_id, rollup.campagne_id).in_(keys)))
+
+    # bornes du jour local -> plage created_at (seek sur owner_id, created_at)
+    day_start = func.timezone(settings.APP_TIMEZONE, cast(touched.c.day, DateTime))
+    day_end = func.timezone(settings.APP_TIMEZONE, cast(touched.c.day + 1, DateTime))
+    stmt = _aggregate(model, amount_col).join(
+        touched,
+        and_(
+            model.owner_id == touched.c.owner_id,
+            model.created_at >= day_start,
+            model.created_at < day_end,
+            _campagne(model) == touched.c.campagne_id,
+        ),
+    )
+    return conn.execute(_insert(rollup, stmt)).rowcount
+
+
+def _lock(conn) -> None:
+    # relâché au commit / rollback; réentrant (refresh -> rebuild)
+    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ROLLUP_LOCK_KEY})
+
+
+def rebuild(conn) -> datetime:
+    """Recalcule tous les rollups; renvoie le nouveau watermark."""
+    _lock(conn)
+    hi = _high_watermark(conn)
+    for model, amount_col, rollup in ROLLUPS:
+        conn.execute(delete(rollup))
+        conn.execute(_insert(rollup, _aggregate(model, amount_col)))
+    write_meta(conn, **{WATERMARK_KEY: hi.isoformat()})
+    return hi
+
+
+def _high_watermark(conn) -> datetime:
+    return conn.scalar(text("SELECT now() - make_interval(secs => :lag)"), {"lag": settings.ROLLUP_LAG_SECONDS})
+
+
+def refresh(conn) -> dict[str, int]:
+    """Applique les changements depuis le watermark (rebuild s'il n'y en a pas)."""
+    t0 = time.perf_counter()
+    _lock(conn)  # avant toute lecture: watermark et rollups vus après le rebuild concurrent
+    watermark = read_meta(conn).get(WATERMARK_KEY)
+    if watermark is None:
+        rebuild(conn)
+        logger.info("rollups rebuilt in %.3fs", time.perf_counter() - t0)
+        return {}
+
+    lo = datetime.fromisoformat(watermark)
+    hi = _high_watermark(conn)
+    groups = {}
+    if hi > lo:
+        for model, amount_col, rollup in ROLLUPS:
+            groups[rollup.__tablename__] = _refresh_table(conn, model, amount_col, rollup, lo, hi)
+        write_meta(conn, **{WATERMARK_KEY: hi.isoformat()})
+    logger.info("rollups refreshed up to %s in %.3fs: %s", hi, time.perf_counter() - t0, groups)
+    return groups
+
+
+def invalidate(conn) -> None:
+    """Après un chargement qui contourne updated_at: rebuild au prochain refresh."""
+    conn.execute(delete(AppMeta).where(AppMeta.key == WATERMARK_KEY))
+
+
+def is_ready(db) -> bool:
+    return db.scalar(select(AppMeta.value).where(AppMeta.key == WATERMARK_KEY)) is not None
+
+
+def rollup_refresh() -> None:
+    """Job du runner."""
+    with engine.begin() as conn:
+        refresh(conn)
+
+
+def rollup_rebuild() -> None:
+    """Job du runner (quotidien): rattrape suppressions et réaffectations."""
+    with engine.begin() as conn:
+        rebuild(conn)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.rollups")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("refresh", help="apply changes since the watermark")
+    sub.add_parser("rebuild", help="recompute every rollup from scratch")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.command == "refresh":
+        rollup_refresh()
+    else:
+        rollup_rebuild()
+
+
+if __name__ == "__main__":
+    main()
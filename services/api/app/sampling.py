@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+# Tirage aléatoire d'entités en temps constant, quelle que soit la taille de
+# la table: on garde en cache la plage [min(id), max(id)] de chaque modèle
+# (rafraîchie toutes les REFRESH_SECONDS, min/max lus sur l'index de la PK),
+# on tire un id dans la plage et on lit la première ligne `id >= tirage` (seek
+# sur la PK, une seule requête qui renvoie directement l'entité). Les trous
+# (lignes supprimées) sont absorbés par le `>=`; un tirage au-delà du dernier
+# id relit la plage avant de retenter (puis repli sur la première ligne).
+#
+# Le tirage n'est pas parfaitement uniforme (une ligne qui suit un trou est
+# plus souvent choisie), ce qui suffit pour générer de l'activité. Pas de
+# TABLESAMPLE SYSTEM_ROWS: il demande l'extension tsm_system_rows.
+
+REFRESH_SECONDS = 300.0
+
+
+@dataclass
+class IdRange:
+    lo: int
+    hi: int
+    loaded_at: float
+
+
+class Sampler:
+    def __init__(self, refresh_seconds: float = REFRESH_SECONDS, rng: random.Random | None = None):
+        self.refresh_seconds = refresh_seconds
+        self.rng = rng or random.Random()
+        self._ranges: dict[str, IdRange] = {}
+        self._lock = threading.Lock()
+
+    def id_range(self, db: Session, model) -> Optional[IdRange]:
+        key = model.__tablename__
+        with self._lock:
+            r = self._ranges.get(key)
+        if r is not None and time.monotonic() - r.loaded_at < self.refresh_seconds:
+            return r
+        return self.refresh(db, model)
+
+    def refresh(self, db: Session, model) -> Optional[IdRange]:
+        """Relit min/max(id); une table vide n'est pas mise en cache."""
+        lo, hi = db.execute(select(func.min(model.id), func.max(model.id))).one()
+        key = model.__tablename__
+        with self._lock:
+            if lo is None:
+                self._ranges.pop(key, None)
+                return None
+            r = self._ranges[key] = IdRange(lo, hi, time.monotonic())
+        return r
+
+    def invalidate(self, model=None) -> None:
+        with self._lock:
+            if model is None:
+                self._ranges.clear()
+            else:
+                self._ranges.pop(model.__tablename__, None)
+
+    def pick(self, db: Session, model):
+        r = self.id_range(db, model)
+        if r is None:
+            return None
+        obj = self._probe(db, model, r)
+        if obj is None:
+            # tirage après le dernier id encore présent: la plage est périmée
+            r = self.refresh(db, model)
+            if r is None:
+                return None
+            obj = self._probe(db, model, r) or db.scalar(select(model).order_by(model.id).limit(1))
+        return obj
+
+    def _probe(self, db: Session, model, r: IdRange):
+        target = self.rng.randint(r.lo, r.hi)
+        return db.scalar(select(model).where(model.id >= target).order_by(model.id).limit(1))
+
+    def pick_many(self, db: Session, model, k: int) -> List:
+        """Jusqu'à `k` entités distinctes (moins si la table est plus petite)."""
+        picked: dict[int, object] = {}
+        for _ in range(4 * k):
+            if len(picked) >= k:
+                break
+            obj = self.pick(db, model)
+            if obj is None:
+                break
+            picked.setdefault(obj.id, obj)
+        return list(picked.values())
+
+    def draw(self, db: Session, model, n: int, *columns) -> List:
+        """
+        `n` lignes (id, *columns) tirées avec remise, en une requête: ids tirés
+        dans la plage puis filtrés sur la table; un id tombé dans un trou est
+        remplacé par une ligne existante du même tirage.
+        """
+        r = self.id_range(db, model) if n > 0 else None
+        if r is None:
+            return []
+        ids = [self.rng.randint(r.lo, r.hi) for _ in range(n)]
+        found = {row[0]: row for row in db.execute(select(model.id, *columns).where(model.id.in_(set(ids))))}
+        if not found:
+            return []
+        live = list(found.values())
+        return [found.get(i) or self.rng.choice(live) for i in ids]
+
+
+sampler = Sampler()
+
+
+def pick_one(db: Session, model):
+    return sampler.pick(db, model)
+
+
+def pick_many(db: Session, model, k: int) -> List:
+    return sampler.pick_many(db, model, k)
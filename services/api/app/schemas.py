@@ -26,7 +26,7 @@ class UserUpdate(BaseModel):
 
 class UserOut(ORMBase):
     id: int
-    email: EmailStr
+    email: str
     full_name: str
     phone: Optional[str]
     is_active: bool
@@ -212,7 +212,7 @@ class DevisUpdate(BaseModel):
     campagne_id: Optional[int] = None
 
 
-class DevisOut(ORMBase):
+class DevisSummaryOut(ORMBase):
     id: int
     owner_id: int
     entreprise_id: int
@@ -228,6 +228,9 @@ class DevisOut(ORMBase):
     currency: str
     created_at: datetime
     updated_at: datetime
+
+
+class DevisOut(DevisSummaryOut):
     lines: List[DevisProduitOut] = []
 
 
@@ -310,3 +313,61 @@ class ActionOut(ORMBase):
     done_at: Optional[datetime]
     created_at: datetime
     updated_at: datetime
+
+
+# STATS (agrégats du dashboard, calculés en SQL)
+class StatsCountsOut(BaseModel):
+    users: int
+    entreprises: int
+    interlocuteurs: int
+    campagnes: int
+    produits: int
+    devis: int
+    ventes: int
+    actions: int
+
+
+class StatusBucketOut(BaseModel):
+    status: str
+    count: int
+    amount: float
+
+
+class PipelineOut(BaseModel):
+    devis: List[StatusBucketOut]
+    ventes: List[StatusBucketOut]
+
+
+class RevenueBucketOut(BaseModel):
+    key: Optional[int | str]  # id (campagne, owner) ou secteur
+    label: Optional[str]
+    count: int
+    amount: float
+
+
+class MonthlyRevenueOut(BaseModel):
+    month: date
+    count: int
+    amount: float
+
+
+class TopDevisOut(BaseModel):
+    id: int
+    code: str
+    title: Optional[str]
+    status: str
+    entreprise_id: int
+    entreprise_nom: str
+    total_amount: Optional[float]
+    currency: str
+    issue_date: Optional[date]
+
+
+# SEARCH
+class SearchHitOut(BaseModel):
+    type: str  # "entreprise" ou "interlocuteur"
+    id: int
+    label: str
+    sublabel: Optional[str]
+    entreprise_id: int
+    score: float
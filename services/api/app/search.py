@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import re
+from typing import List, Optional
+
+from sqlalchemy import Float, cast, func, literal, or_, select
+from sqlalchemy.orm import Session
+
+from .models import Entreprise, Interlocuteur
+
+# Recherche type-ahead sur entreprises et interlocuteurs (GET /search).
+#
+# Filtre: deux chemins d'index, combinés en BitmapOr:
+#   - mots: tsvector généré (search_vector, GIN), chaque mot de la saisie en
+#     préfixe (`dup:* & jea:*`), donc utile dès la première lettre
+#   - sous-chaîne: ILIKE '%saisie%' sur un index trigram (gist_trgm_ops), à
+#     partir de 3 caractères (en dessous, pas de trigramme à chercher)
+# Candidats: les CANDIDATES lignes les plus proches de la saisie en distance
+# trigram par mot (`texte <->> saisie`, 1 - word_similarity), lues dans
+# l'ordre par le même index GiST (KNN): une correspondance exacte (distance 0)
+# ou un préfixe passe avant le reste, même pour une saisie très fréquente.
+# Le score final (ts_rank_cd + word_similarity) ne classe que ces candidats.
+
+CANDIDATES = 200
+TRIGRAM_MIN_LENGTH = 3
+SEARCH_TYPES = ("entreprise", "interlocuteur")
+
+
+def _tsquery(q: str) -> Optional[str]:
+    words = re.findall(r"[^\W_]+", q.lower())
+    return " & ".join(f"{w}:*" for w in words) or None
+
+
+def _like_pattern(q: str) -> str:
+    return "%" + re.sub(r"([\\%_])", r"\\\1", q) + "%"
+
+
+def _search(db: Session, q: str, limit: int, *, kind, model, vector, text_col, label, sublabel, entreprise_id) -> List[dict]:
+    query = _tsquery(q)
+    conditions, score = [], cast(func.word_similarity(q, text_col), Float)
+    if query is not None:
+        tsq = func.to_tsquery("simple", query)
+        conditions.append(vector.op("@@")(tsq))
+        score = score + cast(func.ts_rank_cd(vector, tsq), Float)
+    if len(q) >= TRIGRAM_MIN_LENGTH:
+        conditions.append(text_col.ilike(_like_pattern(q), escape="\\"))
+    if not conditions:
+        return []
+
+    candidates = (
+        select(
+            literal(kind).label("type"),
+            model.id,
+            label.label("label"),
+            sublabel.label("sublabel"),
+            entreprise_id.label("entreprise_id"),
+            score.label("score"),
+        )
+        .where(or_(*conditions))
+        .order_by(text_col.op("<->>")(q), model.id)
+        .limit(CANDIDATES)
+        .subquery()
+    )
+    stmt = select(candidates).order_by(candidates.c.score.desc(), candidates.c.id).limit(limit)
+    return [dict(r) for r in db.execute(stmt).mappings()]
+
+
+def search_entreprises(db: Session, q: str, limit: int = 10) -> List[dict]:
+    return _search(
+        db,
+        q,
+        limit,
+        kind="entreprise",
+        model=Entreprise,
+        vector=Entreprise.search_vector,
+        text_col=Entreprise.nom,
+        label=Entreprise.nom,
+        sublabel=func.concat_ws(" - ", Entreprise.cp, Entreprise.ville, Entreprise.secteur),
+        entreprise_id=Entreprise.id,
+    )
+
+
+def search_interlocuteurs(db: Session, q: str, limit: int = 10) -> List[dict]:
+    return _search(
+        db,
+        q,
+        limit,
+        kind="interlocuteur",
+        model=Interlocuteur,
+        vector=Interlocuteur.search_vector,
+        text_col=Interlocuteur.search_text,
+        label=func.concat_ws(" ", Interlocuteur.first_name, Interlocuteur.last_name),
+        sublabel=Interlocuteur.email,
+        entreprise_id=Interlocuteur.entreprise_id,
+    )
+
+
+def search(db: Session, q: str, types: tuple[str, ...] = SEARCH_TYPES, limit: int = 10) -> List[dict]:
+    """Résultats des types demandés, fusionnés par score décroissant."""
+    q = q.strip()
+    hits = []
+    if "entreprise" in types:
+        hits += search_entreprises(db, q, limit)
+    if "interlocuteur" in types:
+        hits += search_interlocuteurs(db, q, limit)
+    hits.sort(key=lambda h: h["score"], reverse=True)
+    return hits[:limit]
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import logging
 import random
-import uuid
-from datetime import datetime, timedelta, date
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Iterator
 
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 
+from .bulk import DeferredIndexBuild, IdAllocator, TableLoadStats, copy_columns, copy_rows, log_load_stats
+from .columnar import ColumnarGenerator
 from .models import (
     User,
     Entreprise,
@@ -19,94 +24,124 @@ from .models import (
     Action,
 )
 
-
-def _rand_phone() -> str:
-    return "0" + "".join(str(random.randint(0, 9)) for _ in range(9))
-
-
-def _rand_cp() -> str:
-    return str(random.randint(1000, 95999)).zfill(5)
-
-
-def _rand_siren(existing: set[str]) -> str:
-    # SIREN: 9 chiffres (string). On évite les doublons.
-    while True:
-        s = "".join(str(random.randint(0, 9)) for _ in range(9))
-        if s not in existing:
-            existing.add(s)
-            return s
-
-
-def _pick(seq):
-    return seq[random.randint(0, len(seq) - 1)]
-
-
-def seed_crm_data(
-    db: Session,
+logger = logging.getLogger(__name__)
+
+# Entreprises (+ dépendants) générées puis écrites par transaction
+SEED_CHUNK_SIZE = 10_000
+
+
+# Ordre d'insertion (dépendances FK) + colonnes écrites par le seed
+SEED_TABLES: dict[str, tuple[type, tuple[str, ...]]] = {
+    "users": (User, ("id", "email", "full_name", "phone", "is_active")),
+    "campagnes": (Campagne, ("id", "code", "nom", "type", "is_active")),
+    "produits": (Produit, ("id", "sku", "name", "description", "unit_price", "currency", "is_active")),
+    "entreprises": (
+        Entreprise,
+        ("id", "siren", "nom", "nb_employe", "cp", "ville", "pays", "secteur", "website", "email", "phone"),
+    ),
+    "interlocuteurs": (
+        Interlocuteur,
+        ("id", "entreprise_id", "first_name", "last_name", "role", "email", "phone", "is_primary"),
+    ),
+    "devis": (
+        Devis,
+        (
+            "id", "owner_id", "entreprise_id", "interlocuteur_id", "campagne_id", "code", "title",
+            "status", "issue_date", "valid_until", "currency", "notes",
+        ),
+    ),
+    "devis_produits": (
+        DevisProduit,
+        ("id", "devis_id", "produit_id", "quantity", "unit_price", "currency", "line_total"),
+    ),
+    "ventes": (
+        Vente,
+        (
+            "id", "owner_id", "entreprise_id", "interlocuteur_id", "campagne_id", "devis_id", "reference",
+            "amount", "currency", "status", "probability", "expected_close_date", "notes",
+        ),
+    ),
+    "actions": (
+        Action,
+        (
+            "id", "owner_id", "entreprise_id", "interlocuteur_id", "campagne_id", "kind", "status",
+            "title", "notes", "due_at", "done_at",
+        ),
+    ),
+}
+
+
+def seed_time_range(now: datetime) -> tuple[datetime, datetime]:
+    """Bornes des dates générées (actions.due_at: now -10 j .. +21 j, ventes.created_at: now)."""
+    return now - timedelta(days=10), now + timedelta(days=21)
+
+
+def _rand_phone(rng: random.Random) -> str:
+    return "0" + "".join(str(rng.randint(0, 9)) for _ in range(9))
+
+
+def _rand_cp(rng: random.Random) -> str:
+    return str(rng.randint(1000, 95999)).zfill(5)
+
+
+def _siren(index: int, a: int, b: int) -> str:
+    # SIREN: 9 chiffres (string). Permutation affine de l'index => pas de doublon,
+    # sans garder l'ensemble des SIREN déjà tirés en mémoire.
+    return f"{(a * index + b) % 10**9:09d}"
+
+
+def _rand_hex(rng: random.Random, n: int) -> str:
+    # remplace uuid4().hex[:n]: dépend du seed, donc reproductible
+    return f"{rng.getrandbits(4 * n):0{n}x}"
+
+
+def _pick(rng: random.Random, seq):
+    return seq[rng.randint(0, len(seq) - 1)]
+
+
+@dataclass
+class _SeedContext:
+    now: datetime
+    user_ids: list[int]
+    campagne_ids: list[int]
+    produits: list[tuple[int, float]]  # (id, unit_price)
+    siren_a: int
+    siren_b: int
+
+
+def _generate_reference_rows(
+    rng: random.Random,
+    ids: dict[str, IdAllocator],
     *,
-    n_users: int = 10,
-    n_entreprises: int = 100,
-    seed: int = 42,
-) -> None:
-    """
-    Seed complet CRM:
-      - 10 users
-      - 100 entreprises
-      - interlocuteurs (1-3 / entreprise)
-      - campagnes (quelques-unes)
-      - produits (quelques-uns)
-      - devis + lignes
-      - ventes (liées à devis)
-      - actions (avec ou sans campagne)
-
-    Garde-fou: si au moins 1 user existe, on ne reseed pas.
-    """
-    random.seed(seed)
-
-    # Garde-fou simple
-    has_user = db.scalar(select(User.id).limit(1))
-    if has_user:
-        return
+    n_users: int,
+    now: datetime,
+) -> tuple[dict[str, list[tuple]], _SeedContext]:
+    """Users, campagnes, produits: peu de lignes, référencées par tout le reste."""
+    rows: dict[str, list[tuple]] = {t: [] for t in SEED_TABLES}
 
     # ----------------------------
     # USERS
     # ----------------------------
-    users: list[User] = []
+    user_ids: list[int] = []
     for i in range(n_users):
-        u = User(
-            email=f"user{i+1}@crm.local",
-            full_name=f"User {i+1}",
-            phone=_rand_phone(),
-            is_active=True,
-        )
-        db.add(u)
-        users.append(u)
-    db.commit()
-    for u in users:
-        db.refresh(u)
+        uid = ids["users"]()
+        rows["users"].append((uid, f"user{i+1}@crm.local", f"User {i+1}", _rand_phone(rng), True))
+        user_ids.append(uid)
 
     # ----------------------------
     # CAMPAGNES
     # ----------------------------
     campagne_types = ["email", "call", "linkedin", "webinar", "ads"]
-    campagnes: list[Campagne] = []
+    campagne_ids: list[int] = []
     for i in range(6):
-        c = Campagne(
-            code=f"CAMP-2026-{(i+1):03d}",
-            nom=f"Campagne {(i+1)}",
-            type=_pick(campagne_types),
-            is_active=True,
-        )
-        db.add(c)
-        campagnes.append(c)
-    db.commit()
-    for c in campagnes:
-        db.refresh(c)
+        cid = ids["campagnes"]()
+        rows["campagnes"].append((cid, f"CAMP-2026-{(i+1):03d}", f"Campagne {(i+1)}", _pick(rng, campagne_types), True))
+        campagne_ids.append(cid)
 
     # ----------------------------
     # PRODUITS
     # ----------------------------
-    produits: list[Produit] = []
+    produits: list[tuple[int, float]] = []
     product_names = [
         "Licence CRM - Basic",
         "Licence CRM - Pro",
@@ -116,194 +151,420 @@ def seed_crm_data(
         "Support Premium",
     ]
     for i, name in enumerate(product_names, start=1):
-        p = Produit(
-            sku=f"SKU-{i:03d}",
-            name=name,
-            description=f"Produit: {name}",
-            unit_price=random.choice([49.0, 99.0, 199.0, 299.0, 499.0]),
-            currency="EUR",
-            is_active=True,
-        )
-        db.add(p)
-        produits.append(p)
-    db.commit()
-    for p in produits:
-        db.refresh(p)
+        pid = ids["produits"]()
+        unit_price = rng.choice([49.0, 99.0, 199.0, 299.0, 499.0])
+        rows["produits"].append((pid, f"SKU-{i:03d}", name, f"Produit: {name}", unit_price, "EUR", True))
+        produits.append((pid, unit_price))
+
+    # Permutation SIREN (a premier avec 10^9)
+    a = rng.randrange(1, 10**9)
+    while a % 2 == 0 or a % 5 == 0:
+        a += 1
+    ctx = _SeedContext(now, user_ids, campagne_ids, produits, a, rng.randrange(10**9))
+    return rows, ctx
+
+
+def _iter_crm_chunks(
+    rng: random.Random,
+    ids: dict[str, IdAllocator],
+    ctx: _SeedContext,
+    *,
+    n_entreprises: int,
+    chunk_size: int,
+) -> Iterator[dict[str, list[tuple]]]:
+    """
+    Génère les entreprises une par une avec leurs dépendants (interlocuteurs,
+    devis + lignes + vente, actions) et rend un paquet toutes les
+    `chunk_size` entreprises: la mémoire ne dépend que de `chunk_size`.
+    Le flux RNG est consommé dans le même ordre quel que soit `chunk_size`.
+    """
+    now = ctx.now
+    today = now.date()
 
-    # ----------------------------
-    # ENTREPRISES + INTERLOCUTEURS
-    # ----------------------------
     secteurs = ["Retail", "Services", "Finance", "Industrie", "Tech", "Santé", "Éducation"]
     villes = ["Paris", "Lyon", "Marseille", "Nantes", "Lille", "Bordeaux", "Toulouse"]
     pays = "France"
 
-    sirens = set()
-    entreprises: list[Entreprise] = []
-    interlocuteurs: list[Interlocuteur] = []
-
-    for i in range(n_entreprises):
-        ent = Entreprise(
-            siren=_rand_siren(sirens),
-            nom=f"Entreprise {i+1} {uuid.uuid4().hex[:6].upper()}",
-            nb_employe=random.randint(1, 5000),
-            cp=_rand_cp(),
-            ville=_pick(villes),
-            pays=pays,
-            secteur=_pick(secteurs),
-            website=f"https://entreprise{i+1}.example.com",
-            email=f"contact{i+1}@entreprises.local",
-            phone=_rand_phone(),
-        )
-        db.add(ent)
-        entreprises.append(ent)
-
-    db.commit()
-    for ent in entreprises:
-        db.refresh(ent)
-
-    # Interlocuteurs 1 à 3 / entreprise
     last_names = ["Martin", "Bernard", "Thomas", "Petit", "Robert", "Richard", "Durand", "Dubois"]
     first_names = ["Alice", "Bob", "Chloé", "David", "Emma", "Fares", "Inès", "Jules"]
     roles = ["CEO", "DAF", "DSI", "Directeur Achats", "Directeur Commercial", "RH"]
 
-    for ent in entreprises:
-        k = random.randint(1, 3)
-        for j in range(k):
-            inter = Interlocuteur(
-                entreprise_id=ent.id,
-                first_name=_pick(first_names),
-                last_name=_pick(last_names),
-                role=_pick(roles),
-                email=f"{uuid.uuid4().hex[:8]}@{ent.nom.replace(' ', '').lower()}.local",
-                phone=_rand_phone(),
-                is_primary=(j == 0),
+    action_kinds = ["call", "email", "meeting", "linkedin"]
+    action_statuses = ["todo", "done", "canceled"]
+
+    rows: dict[str, list[tuple]] = {t: [] for t in SEED_TABLES}
+    for i in range(n_entreprises):
+        # ----------------------------
+        # ENTREPRISE
+        # ----------------------------
+        eid = ids["entreprises"]()
+        nom = f"Entreprise {i+1} {_rand_hex(rng, 6).upper()}"
+        rows["entreprises"].append(
+            (
+                eid,
+                _siren(i, ctx.siren_a, ctx.siren_b),
+                nom,
+                rng.randint(1, 5000),
+                _rand_cp(rng),
+                _pick(rng, villes),
+                pays,
+                _pick(rng, secteurs),
+                f"https://entreprise{i+1}.example.com",
+                f"contact{i+1}@entreprises.local",
+                _rand_phone(rng),
             )
-            db.add(inter)
-            interlocuteurs.append(inter)
+        )
 
-    db.commit()
-    # refresh en masse pas obligatoire pour usage FK (on a id après commit), mais ok si tu veux
-    # for inter in interlocuteurs: db.refresh(inter)
+        # Interlocuteurs 1 à 3 / entreprise
+        inter_ids: list[int] = []
+        for j in range(rng.randint(1, 3)):
+            iid = ids["interlocuteurs"]()
+            rows["interlocuteurs"].append(
+                (
+                    iid,
+                    eid,
+                    _pick(rng, first_names),
+                    _pick(rng, last_names),
+                    _pick(rng, roles),
+                    f"{_rand_hex(rng, 8)}@{nom.replace(' ', '').lower()}.local",
+                    _rand_phone(rng),
+                    j == 0,
+                )
+            )
+            inter_ids.append(iid)
+
+        # ----------------------------
+        # DEVIS + LIGNES + VENTE (~ 1 devis sur 2 entreprises)
+        # ----------------------------
+        if i % 2 == 0:
+            did = ids["devis"]()
+            owner = _pick(rng, ctx.user_ids)
+            inter = _pick(rng, inter_ids)
+            camp = _pick(rng, ctx.campagne_ids) if rng.random() < 0.7 else None
+            status = rng.choice(["draft", "sent", "accepted", "rejected"])
+            issue_date = today - timedelta(days=rng.randint(0, 60))
+            valid_until = today + timedelta(days=rng.randint(10, 90))
+
+            # Lignes devis: 1 à 4 produits
+            n_lines = rng.randint(1, 4)
+            chosen = rng.sample(ctx.produits, k=min(n_lines, len(ctx.produits)))
+            lines: list[tuple] = []
+            total = 0.0
+            for pid, unit_price in chosen:
+                qty = rng.randint(1, 10)
+                line_total = round(qty * unit_price, 2)
+                total += line_total
+                lines.append((ids["devis_produits"](), did, pid, qty, unit_price, "EUR", line_total))
+
+            # devis.total_amount est rempli par les triggers de devis_produits
+            rows["devis"].append(
+                (did, owner, eid, inter, camp, f"DEV-2026-{i+1:04d}", f"Devis - {nom}", status,
+                 issue_date, valid_until, "EUR", "Seeded devis")
+            )
+            rows["devis_produits"].extend(lines)
+
+            # Vente: pour les devis "accepted" (ou une partie)
+            if status == "accepted" and rng.random() < 0.9:
+                rows["ventes"].append(
+                    (
+                        ids["ventes"](),
+                        owner,
+                        eid,
+                        inter,
+                        camp,
+                        did,
+                        f"SALE-2026-{did:05d}",
+                        round(total, 2),
+                        "EUR",
+                        rng.choice(["open", "won"]),
+                        rng.choice([30, 50, 70, 90]),
+                        today + timedelta(days=rng.randint(5, 45)),
+                        "Seeded vente from accepted devis",
+                    )
+                )
+
+        # ----------------------------
+        # ACTIONS (~ 4 / entreprise, avec ou sans campagne)
+        # ----------------------------
+        owner = _pick(rng, ctx.user_ids)
+        inter = _pick(rng, inter_ids)
+        for _ in range(4):
+            camp = _pick(rng, ctx.campagne_ids) if rng.random() < 0.5 else None
+            due = now + timedelta(days=rng.randint(-10, 20), hours=rng.randint(0, 23))
+            st = _pick(rng, action_statuses)
+            done_at = (due + timedelta(hours=1)) if st == "done" else None
+            rows["actions"].append(
+                (
+                    ids["actions"](),
+                    owner,
+                    eid,
+                    inter if rng.random() < 0.9 else None,
+                    camp,
+                    _pick(rng, action_kinds),
+                    st,
+                    f"Action {_pick(rng, action_kinds)} - {nom}",
+                    "Seeded action",
+                    due,
+                    done_at,
+                )
+            )
 
-    # Map entreprise -> interlocuteurs
-    inter_by_ent: dict[int, list[Interlocuteur]] = {}
-    for inter in interlocuteurs:
-        inter_by_ent.setdefault(inter.entreprise_id, []).append(inter)
+        if (i + 1) % chunk_size == 0:
+            yield rows
+            rows = {t: [] for t in SEED_TABLES}
+
+    if rows["entreprises"]:
+        yield rows
 
-    # ----------------------------
-    # DEVIS + LIGNES + VENTES
-    # ----------------------------
-    devis_list: list[Devis] = []
-    ventes_list: list[Vente] = []
 
-    # On crée ~ 1 devis sur 2 entreprises
-    for idx, ent in enumerate(entreprises):
-        if idx % 2 == 1:
+def _write_orm(db: Session, rows: dict[str, list[tuple]], stats: dict[str, TableLoadStats]) -> None:
+    for table, (model, columns) in SEED_TABLES.items():
+        if not rows[table]:
             continue
+        t0 = time.perf_counter()
+        db.add_all([model(**dict(zip(columns, r))) for r in rows[table]])
+        db.flush()
+        s = stats.setdefault(table, TableLoadStats(table))
+        s.rows += len(rows[table])
+        s.seconds += time.perf_counter() - t0
+    db.commit()
+    db.expunge_all()
 
-        owner = _pick(users)
-        inter = _pick(inter_by_ent[ent.id])
-        camp = _pick(campagnes) if random.random() < 0.7 else None
-
-        code = f"DEV-2026-{idx+1:04d}"
-        d = Devis(
-            owner_id=owner.id,
-            entreprise_id=ent.id,
-            interlocuteur_id=inter.id,
-            campagne_id=(camp.id if camp else None),
-            code=code,
-            title=f"Devis - {ent.nom}",
-            status=random.choice(["draft", "sent", "accepted", "rejected"]),
-            issue_date=date.today() - timedelta(days=random.randint(0, 60)),
-            valid_until=date.today() + timedelta(days=random.randint(10, 90)),
-            currency="EUR",
-            notes="Seeded devis",
-        )
-        db.add(d)
-        devis_list.append(d)
 
+def _write_copy(db: Session, rows: dict[str, list[tuple]], stats: dict[str, TableLoadStats]) -> None:
+    for table, (_, columns) in SEED_TABLES.items():
+        if rows[table]:
+            copy_rows(db, table, columns, rows[table], stats=stats)
     db.commit()
-    for d in devis_list:
-        db.refresh(d)
-
-    # Lignes devis: 1 à 4 produits
-    for d in devis_list:
-        n_lines = random.randint(1, 4)
-        chosen = random.sample(produits, k=min(n_lines, len(produits)))
-
-        total = 0.0
-        for p in chosen:
-            qty = random.randint(1, 10)
-            unit_price = float(p.unit_price) if p.unit_price is not None else random.choice([49.0, 99.0, 199.0])
-            line_total = qty * unit_price
-            total += line_total
-
-            line = DevisProduit(
-                devis_id=d.id,
-                produit_id=p.id,
-                quantity=qty,
-                unit_price=unit_price,
-                currency="EUR",
-                line_total=line_total,
-            )
-            db.add(line)
 
-        # cache total dans devis (tu peux préférer recalcul dynamique)
-        d.total_amount = total
 
-    db.commit()
+def _reserve_ids(allocs: dict[str, IdAllocator], counts: dict[str, int]) -> dict[str, int]:
+    return {t: (allocs[t].reserve(n) if n else 0) for t, n in counts.items()}
+
+
+# ----------------------------
+# Seed colonnaire shardé (process pool)
+# ----------------------------
+# Un shard = un bloc d'entreprises (+ dépendants). Le flux RNG d'un bloc ne
+# dépend que de (seed, bloc) et ses ids sont calculés à l'avance à partir des
+# volumes de tous les blocs: le résultat est le même quel que soit `workers`.
+
+_shard_state: dict = {}
+
+
+def _shard_generator(gen_kwargs: dict, reference_ids: dict[str, int]) -> ColumnarGenerator:
+    """Générateur d'un worker: recharge users/campagnes/produits (ids), sans écrire."""
+    gen = ColumnarGenerator(**gen_kwargs)
+    gen.reference_batches(reference_ids)
+    return gen
+
+
+def _shard_first_ids(gen: ColumnarGenerator, base: dict[str, int]) -> list[tuple[int, dict[str, int]]]:
+    """(bloc, premiers ids par table) pour chaque bloc, les ids de tous les blocs partant de `base`."""
+    shards = []
+    offset = dict(base)
+    for block in gen.blocks():
+        shards.append((block, dict(offset)))
+        for t, n in gen.plan(block).counts.items():
+            offset[t] += n
+    return shards
+
+
+def _init_shard_worker(database_url: str, gen_kwargs: dict, reference_ids: dict[str, int]) -> None:
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    gen = _shard_generator(gen_kwargs, reference_ids)
+    engine = create_engine(database_url, pool_size=1, max_overflow=0)
+    _shard_state.update(gen=gen, session_factory=sessionmaker(bind=engine, autoflush=False))
+
+
+def _run_shard(block: int, first_ids: dict[str, int]) -> dict[str, TableLoadStats]:
+    gen: ColumnarGenerator = _shard_state["gen"]
+    stats: dict[str, TableLoadStats] = {}
+    with _shard_state["session_factory"]() as db:
+        for batch in gen.block_batches(gen.plan(block), first_ids):
+            copy_columns(db, batch, stats=stats)
+        db.commit()
+    return stats
+
+
+def _merge_stats(into: dict[str, TableLoadStats], other: dict[str, TableLoadStats]) -> None:
+    for table, s in other.items():
+        t = into.setdefault(table, TableLoadStats(table))
+        t.rows += s.rows
+        t.seconds += s.seconds
 
-    # Ventes: pour les devis "accepted" (ou une partie)
-    for d in devis_list:
-        if d.status == "accepted" and random.random() < 0.9:
-            v = Vente(
-                owner_id=d.owner_id,
-                entreprise_id=d.entreprise_id,
-                interlocuteur_id=d.interlocuteur_id,
-                campagne_id=d.campagne_id,
-                devis_id=d.id,
-                reference=f"SALE-2026-{d.id:05d}",
-                amount=d.total_amount,
-                currency=d.currency,
-                status=random.choice(["open", "won"]),
-                probability=random.choice([30, 50, 70, 90]),
-                expected_close_date=date.today() + timedelta(days=random.randint(5, 45)),
-                notes="Seeded vente from accepted devis",
-            )
-            db.add(v)
-            ventes_list.append(v)
 
+def _seed_columnar(
+    db: Session,
+    *,
+    n_users: int,
+    n_entreprises: int,
+    seed: int,
+    now: datetime,
+    workers: int,
+    chunk_size: int,
+    stats: dict[str, TableLoadStats],
+    after_first_block: Callable[[], None] | None = None,
+) -> None:
+    gen_kwargs = dict(seed=seed, n_users=n_users, n_entreprises=n_entreprises, now=now, block_size=chunk_size)
+    gen = ColumnarGenerator(**gen_kwargs)
+    allocs = {table: IdAllocator(db, table) for table in SEED_TABLES}
+
+    reference_ids = _reserve_ids(allocs, gen.reference_counts)
+    for batch in gen.reference_batches(reference_ids):
+        copy_columns(db, batch, stats=stats)
     db.commit()
 
-    # ----------------------------
-    # ACTIONS (avec ou sans campagne)
-    # ----------------------------
-    action_kinds = ["call", "email", "meeting", "linkedin"]
-    action_statuses = ["todo", "done", "canceled"]
+    # Volumes de chaque bloc (flux "structure", peu coûteux) -> ids de départ
+    counts = [gen.plan(block).counts for block in gen.blocks()]
+    base = _reserve_ids(allocs, {t: sum(c[t] for c in counts) for t in gen.BLOCK_TABLES})
+    shards = _shard_first_ids(gen, base)
+    db.commit()
 
-    # volume actions: ~ 4 actions / entreprise
-    now = datetime.now()
-    for ent in entreprises:
-        owner = _pick(users)
-        inter = _pick(inter_by_ent[ent.id])
-        for _ in range(4):
-            camp = _pick(campagnes) if random.random() < 0.5 else None
-            due = now + timedelta(days=random.randint(-10, 20), hours=random.randint(0, 23))
-            st = _pick(action_statuses)
-            done_at = (due + timedelta(hours=1)) if st == "done" else None
+    if after_first_block is not None and shards:
+        block, first_ids = shards.pop(0)
+        for batch in gen.block_batches(gen.plan(block), first_ids):
+            copy_columns(db, batch, stats=stats)
+        db.commit()
+        after_first_block()
+
+    if workers <= 1:
+        for block, first_ids in shards:
+            for batch in gen.block_batches(gen.plan(block), first_ids):
+                copy_columns(db, batch, stats=stats)
+            db.commit()
+        return
 
-            a = Action(
-                owner_id=owner.id,
-                entreprise_id=ent.id,
-                interlocuteur_id=inter.id if random.random() < 0.9 else None,
-                campagne_id=camp.id if camp else None,
-                kind=_pick(action_kinds),
-                status=st,
-                title=f"Action {_pick(action_kinds)} - {ent.nom}",
-                notes="Seeded action",
-                due_at=due,
-                done_at=done_at,
-            )
-            db.add(a)
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    database_url = db.get_bind().url.render_as_string(hide_password=False)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_shard_worker,
+        initargs=(database_url, gen_kwargs, reference_ids),
+    ) as pool:
+        futures = [pool.submit(_run_shard, block, first_ids) for block, first_ids in shards]
+        for f in futures:
+            _merge_stats(stats, f.result())
+
+
+def seed_crm_data(
+    db: Session,
+    *,
+    n_users: int = 10,
+    n_entreprises: int = 100,
+    seed: int = 42,
+    mode: str = "orm",
+    workers: int = 1,
+    chunk_size: int = SEED_CHUNK_SIZE,
+    now: datetime | None = None,
+    defer_indexes: bool = False,
+    index_workers: int = 4,
+    maintenance_work_mem: str = "512MB",
+) -> dict[str, TableLoadStats]:
+    """
+    Seed complet CRM:
+      - 10 users
+      - 100 entreprises
+      - interlocuteurs (1-3 / entreprise)
+      - campagnes (quelques-unes)
+      - produits (quelques-uns)
+      - devis + lignes
+      - ventes (liées à devis)
+      - actions (avec ou sans campagne)
+
+    mode:
+      - "orm": objets SQLAlchemy (add_all + commit par paquet)
+      - "copy": `COPY FROM STDIN` par table et par paquet, pour les gros volumes
+      - "columnar": générateur NumPy (colonnes entières) + COPY par bloc
 
+    Les données sont générées et écrites par paquets de `chunk_size`
+    entreprises (avec leurs dépendants), une transaction par paquet: la
+    mémoire est bornée par `chunk_size`, pas par le volume total.
+
+    Les ids sont pré-alloués depuis les séquences, donc pour un même `seed`
+    (et un même `now`) "orm" et "copy" écrivent exactement les mêmes lignes.
+    "columnar" a son propre flux RNG par bloc: déterministe pour
+    (seed, chunk_size), mais pas identique aux deux autres.
+
+    workers (mode "columnar" uniquement): nombre de process qui écrivent les
+    blocs en parallèle, chacun avec sa connexion. Les données ne dépendent
+    pas de `workers`. En parallèle, les secondes par table sont cumulées sur
+    les workers (lignes/s = débit moyen d'un worker).
+    Renvoie les stats (lignes, secondes, lignes/s) par table.
+
+    defer_indexes: après le premier paquet (chargé index en place, sert
+    d'étalonnage), index secondaires et FK sont retirés, puis reconstruits en
+    fin de seed sur `index_workers` connexions (voir bulk.DeferredIndexBuild),
+    avec un rapport du temps gagné par table.
+
+    Garde-fou: si au moins 1 user existe, on ne reseed pas.
+    """
+    if mode not in ("orm", "copy", "columnar"):
+        raise ValueError(f"Unknown seed mode: {mode!r}")
+    if workers > 1 and mode != "columnar":
+        raise ValueError("workers > 1 requires mode='columnar'")
+
+    # Garde-fou simple
+    has_user = db.scalar(select(User.id).limit(1))
+    if has_user:
+        return {}
+
+    now = now or datetime.now()
+    stats: dict[str, TableLoadStats] = {}
+
+    deferred: DeferredIndexBuild | None = None
+    after_first_block = None
+    if defer_indexes:
+        deferred = DeferredIndexBuild(
+            db.get_bind(), list(SEED_TABLES), workers=index_workers, maintenance_work_mem=maintenance_work_mem
+        )
+
+        def after_first_block() -> None:
+            deferred.drop(db, stats)
+
+    if mode == "columnar":
+        t0 = time.perf_counter()
+        _seed_columnar(
+            db,
+            n_users=n_users,
+            n_entreprises=n_entreprises,
+            seed=seed,
+            now=now,
+            workers=workers,
+            chunk_size=chunk_size,
+            stats=stats,
+            after_first_block=after_first_block,
+        )
+        if deferred is not None:
+            deferred.rebuild(stats)
+        log_load_stats(stats, label=f"seed[{mode} x{workers}]")
+        elapsed = time.perf_counter() - t0
+        total = sum(s.rows for s in stats.values())
+        rate = total / elapsed if elapsed > 0 else 0.0
+        logger.info("seed[%s x%d] %d rows in %.2fs (%.0f rows/s)", mode, workers, total, elapsed, rate)
+        return stats
+
+    write = _write_copy if mode == "copy" else _write_orm
+    rng = random.Random(seed)
+    ids = {table: IdAllocator(db, table) for table in SEED_TABLES}
+
+    rows, ctx = _generate_reference_rows(rng, ids, n_users=n_users, now=now)
+    write(db, rows, stats)
+    for i, rows in enumerate(_iter_crm_chunks(rng, ids, ctx, n_entreprises=n_entreprises, chunk_size=chunk_size)):
+        write(db, rows, stats)
+        if i == 0 and after_first_block is not None:
+            after_first_block()
+
+    for alloc in ids.values():
+        alloc.release()
     db.commit()
+    if deferred is not None:
+        deferred.rebuild(stats)
+
+    log_load_stats(stats, label=f"seed[{mode}]")
+    return stats
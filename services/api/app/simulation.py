@@ -0,0 +1,403 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from sqlalchemy import case, func, insert, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .db import SessionLocal
+from .models import PARTITIONED, Action, Campagne, Devis, DevisProduit, Interlocuteur, Produit, User, Vente
+from .sampling import sampler
+
+logger = logging.getLogger(__name__)
+
+# Mode simulation: flux continu d'événements CRM à débit cible (événements/s)
+# pour charger les consommateurs en aval. Les événements sont tirés par lots
+# selon un mix pondéré, puis écrits par type en INSERT/UPDATE multi-lignes,
+# un lot = une transaction. Les entités référencées (users, interlocuteurs,
+# devis...) sont tirées via sampling.py, une requête par table et par lot.
+#
+#   python -m app.simulation --rate 2000 --duration 60 --mix actions=50,lines=20
+
+EVENT_KINDS = ("actions", "devis", "lines", "ventes", "transitions")
+DEFAULT_MIX = "actions=50,devis=10,lines=20,ventes=5,transitions=15"
+
+ACTION_KINDS = ["call", "email", "meeting", "linkedin"]
+
+# latence max avant d'écrire un lot incomplet (débits faibles)
+FLUSH_SECONDS = 0.2
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    """`"actions=50,devis=10"` -> poids normalisés; ValueError si type inconnu."""
+    mix: dict[str, float] = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"unknown event kind {kind!r} (expected one of {', '.join(EVENT_KINDS)})")
+        mix[kind] = float(weight) if weight else 1.0
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("mix must have a positive weight")
+    return {k: w / total for k, w in mix.items() if w > 0}
+
+
+@dataclass
+class SimulationStats:
+    target_rate: float
+    events: int = 0  # événements tirés
+    written: int = 0  # événements appliqués (transition sans effet, vente déjà existante: non comptés)
+    batches: int = 0
+    failed_batches: int = 0
+    seconds: float = 0.0
+    by_kind: Counter = field(default_factory=Counter)
+
+    @property
+    def achieved_rate(self) -> float:
+        return self.written / self.seconds if self.seconds > 0 else 0.0
+
+    def log(self, label: str = "sim") -> None:
+        ratio = self.achieved_rate / self.target_rate * 100 if self.target_rate else 0.0
+        logger.info(
+            "%s target %.0f/s achieved %.0f/s (%.0f%%): %d events, %d written, %d batches (%d failed) in %.1fs %s",
+            label,
+            self.target_rate,
+            self.achieved_rate,
+            ratio,
+            self.events,
+            self.written,
+            self.batches,
+            self.failed_batches,
+            self.seconds,
+            dict(self.by_kind),
+        )
+
+
+class Simulator:
+    def __init__(self, mix: dict[str, float], *, rng: random.Random | None = None):
+        self.mix = mix
+        self.rng = rng or random.Random()
+        # unique par Simulator (un par tick du job, un par run CLI): aléatoire,
+        # pas l'heure, et indépendant de `rng` (seedé pour rejouer un mix)
+        self._run_id = uuid.uuid4().hex[:12]
+        self._seq = 0
+        self.writers: dict[str, Callable[[Session, int], int]] = {
+            "actions": self._write_actions,
+            "devis": self._write_devis,
+            "lines": self._write_lines,
+            "ventes": self._write_ventes,
+            "transitions": self._write_transitions,
+        }
+
+    # ----------------------------
+    # Lot
+    # ----------------------------
+    def write_batch(self, db: Session, n: int) -> Counter:
+        """Tire `n` événements selon le mix et les écrit dans une transaction."""
+        kinds = Counter(self.rng.choices(list(self.mix), weights=list(self.mix.values()), k=n))
+        written: Counter = Counter()
+        for kind, count in kinds.items():
+            written[kind] = self.writers[kind](db, count)
+        db.commit()
+        return written
+
+    def _code(self, prefix: str) -> str:
+        self._seq += 1
+        return f"{prefix}-{self._run_id}-{self._seq:08d}"
+
+    def _maybe(self, rows: list, p: float) -> list:
+        return [r if r is not None and self.rng.random() < p else None for r in rows]
+
+    # ----------------------------
+    # Writers (renvoient le nombre d'événements appliqués)
+    # ----------------------------
+    def _write_actions(self, db: Session, n: int) -> int:
+        inters = sampler.draw(db, Interlocuteur, n, Interlocuteur.entreprise_id)
+        users = sampler.draw(db, User, n)
+        if not inters or not users:
+            return 0
+        camps = self._maybe(sampler.draw(db, Campagne, n) or [None] * n, 0.5)
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                "owner_id": user.id,
+                "entreprise_id": inter.entreprise_id,
+                "interlocuteur_id": inter.id,
+                "campagne_id": camp.id if camp else None,
+                "kind": self.rng.choice(ACTION_KINDS),
+                "status": "todo",
+                "title": f"Sim action {self.rng.choice(ACTION_KINDS)}",
+                "notes": "Generated by simulation",
+                "due_at": now + timedelta(hours=self.rng.randint(1, 72)),
+            }
+            for inter, user, camp in zip(inters, users, camps)
+        ]
+        db.execute(insert(Action), rows)
+        return len(rows)
+
+    def _write_devis(self, db: Session, n: int) -> int:
+        inters = sampler.draw(db, Interlocuteur, n, Interlocuteur.entreprise_id)
+        users = sampler.draw(db, User, n)
+        if not inters or not users:
+            return 0
+        camps = self._maybe(sampler.draw(db, Campagne, n) or [None] * n, 0.6)
+        today = datetime.now(timezone.utc).date()
+        rows = [
+            {
+                "owner_id": user.id,
+                "entreprise_id": inter.entreprise_id,
+                "interlocuteur_id": inter.id,
+                "campagne_id": camp.id if camp else None,
+                "code": self._code("SIM-DEV"),
+                "title": "Devis simulation",
+                "status": "draft",
+                "issue_date": today,
+                "valid_until": today + timedelta(days=30),
+                "currency": "EUR",
+                "notes": "Generated by simulation",
+            }
+            for inter, user, camp in zip(inters, users, camps)
+        ]
+        devis_ids = db.scalars(insert(Devis).returning(Devis.id, sort_by_parameter_order=True), rows).all()
+
+        # 1 à 3 lignes par devis (le total suit via les triggers)
+        n_lines = [self.rng.randint(1, 3) for _ in devis_ids]
+        produits = sampler.draw(db, Produit, sum(n_lines), Produit.unit_price)
+        lines: dict[tuple[int, int], dict] = {}
+        it = iter(produits)
+        for did, k in zip(devis_ids, n_lines):
+            for p in (next(it, None) for _ in range(k)):
+                if p is not None:
+                    lines[(did, p.id)] = self._line(did, p)
+        if lines:
+            db.execute(insert(DevisProduit), list(lines.values()))
+        return len(rows)
+
+    def _line(self, devis_id: int, produit) -> dict:
+        qty = self.rng.randint(1, 8)
+        return {
+            "devis_id": devis_id,
+            "produit_id": produit.id,
+            "quantity": qty,
+            "unit_price": produit.unit_price,
+            "currency": "EUR",
+            "line_total": qty * produit.unit_price if produit.unit_price is not None else None,
+        }
+
+    def _write_lines(self, db: Session, n: int) -> int:
+        devis = sampler.draw(db, Devis, n)
+        produits = sampler.draw(db, Produit, n, Produit.unit_price)
+        if not devis or not produits:
+            return 0
+        # un couple (devis, produit) au plus une fois par statement (ON CONFLICT)
+        lines = {(d.id, p.id): self._line(d.id, p) for d, p in zip(devis, produits)}
+        t = DevisProduit.__table__
+        stmt = pg_insert(DevisProduit)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_devis_produit",
+            set_={
+                "quantity": t.c.quantity + stmt.excluded.quantity,
+                "line_total": (t.c.quantity + stmt.excluded.quantity) * t.c.unit_price,
+            },
+        )
+        db.execute(stmt, list(lines.values()))
+        return len(lines)
+
+    def _write_ventes(self, db: Session, n: int) -> int:
+        devis_ids = {d.id for d in sampler.draw(db, Devis, n)}
+        if not devis_ids:
+            return 0
+        # une vente par devis: les devis qui en ont déjà une sont ignorés (NOT
+        # EXISTS; ON CONFLICT en plus quand uq_ventes_devis_id existe, hors partitionnement).
+        # Devis verrouillés d'abord, dans une requête à part: le NOT EXISTS de
+        # l'INSERT (nouveau snapshot) voit alors les ventes des écritures concurrentes
+        db.execute(select(Devis.id).where(Devis.id.in_(devis_ids)).order_by(Devis.id).with_for_update())
+        src = select(
+            Devis.owner_id,
+            Devis.entreprise_id,
+            Devis.interlocuteur_id,
+            Devis.campagne_id,
+            Devis.id,
+            func.concat("SIM-SALE-", Devis.id),
+            Devis.total_amount,
+            Devis.currency,
+            literal("open"),
+            literal(50),
+            literal("Generated by simulation"),
+        ).where(Devis.id.in_(devis_ids), ~select(Vente.id).where(Vente.devis_id == Devis.id).exists())
+        stmt = pg_insert(Vente).from_select(
+            [
+                "owner_id",
+                "entreprise_id",
+                "interlocuteur_id",
+                "campagne_id",
+                "devis_id",
+                "reference",
+                "amount",
+                "currency",
+                "status",
+                "probability",
+                "notes",
+            ],
+            src,
+        )
+        if not PARTITIONED:
+            stmt = stmt.on_conflict_do_nothing(index_elements=["devis_id"])
+        return db.execute(stmt).rowcount
+
+    def _write_transitions(self, db: Session, n: int) -> int:
+        # actions todo -> done ; devis draft -> sent -> accepted/rejected ; ventes open -> won/lost
+        targets = Counter(self.rng.choices(["actions", "devis", "ventes"], k=n))
+        now = datetime.now(timezone.utc)
+        won = func.random() < 0.6
+        written = 0
+
+        ids = {r.id for r in sampler.draw(db, Action, targets["actions"])}
+        if ids:
+            written += db.execute(
+                update(Action)
+                .where(Action.id.in_(ids), Action.status == "todo")
+                .values(status="done", done_at=now)
+            ).rowcount
+
+        ids = {r.id for r in sampler.draw(db, Devis, targets["devis"])}
+        if ids:
+            written += db.execute(
+                update(Devis)
+                .where(Devis.id.in_(ids), Devis.status.in_(["draft", "sent"]))
+                .values(
+                    status=case(
+                        (Devis.status == "draft", "sent"),
+                        (won, "accepted"),
+                        else_="rejected",
+                    )
+                )
+            ).rowcount
+
+        ids = {r.id for r in sampler.draw(db, Vente, targets["ventes"])}
+        if ids:
+            written += db.execute(
+                update(Vente)
+                .where(Vente.id.in_(ids), Vente.status == "open")
+                .values(status=case((won, "won"), else_="lost"), closed_at=now)
+            ).rowcount
+
+        return written
+
+
+def run(
+    *,
+    rate: float,
+    mix: dict[str, float],
+    duration: float | None = None,
+    batch_size: int = 500,
+    report_every: float = 10.0,
+    stop: threading.Event | None = None,
+    session_factory=SessionLocal,
+) -> SimulationStats:
+    """
+    Émet `rate` événements/s pendant `duration` secondes (None = jusqu'à `stop`
+    ou Ctrl-C).
+    Le retard accumulé (base trop lente) est rattrapé par lots de `batch_size`;
+    l'écart entre débit cible et débit atteint est visible dans les stats.
+    """
+    if rate <= 0:
+        raise ValueError("rate must be > 0")
+    sim = Simulator(mix)
+    stats = SimulationStats(target_rate=rate)
+    window = SimulationStats(target_rate=rate)
+    start = last_report = time.monotonic()
+    last_write = 0.0
+    emitted = 0
+
+    db = session_factory()
+    try:
+        while not (stop and stop.is_set()):
+            elapsed = time.monotonic() - start
+            if duration is not None and elapsed >= duration:
+                break
+            due = int(rate * elapsed) - emitted
+            # on attend un lot plein, ou FLUSH_SECONDS depuis le dernier lot
+            if due < batch_size and (due <= 0 or elapsed - last_write < FLUSH_SECONDS):
+                wait = min((emitted + batch_size) / rate, last_write + FLUSH_SECONDS) - elapsed
+                time.sleep(min(max(wait, 0.001), 0.5))
+                continue
+
+            last_write = elapsed
+            n = min(due, batch_size)
+            emitted += n
+            for s in (stats, window):
+                s.events += n
+                s.batches += 1
+            try:
+                written = sim.write_batch(db, n)
+            except Exception:
+                db.rollback()
+                logger.exception("simulation batch failed")
+                stats.failed_batches += 1
+                window.failed_batches += 1
+                continue
+            for s in (stats, window):
+                s.written += sum(written.values())
+                s.by_kind.update(written)
+
+            now = time.monotonic()
+            if report_every and now - last_report >= report_every:
+                window.seconds = now - last_report
+                window.log("sim[window]")
+                window = SimulationStats(target_rate=rate)
+                last_report = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+
+    stats.seconds = time.monotonic() - start
+    stats.log()
+    return stats
+
+
+def simulation_tick() -> None:
+    """Job scheduler: un intervalle de SIM_TICK_SECONDS au débit SIM_EVENTS_PER_SECOND."""
+    run(
+        rate=settings.SIM_EVENTS_PER_SECOND,
+        mix=parse_mix(settings.SIM_MIX),
+        duration=settings.SIM_TICK_SECONDS,
+        batch_size=settings.SIM_BATCH_SIZE,
+        report_every=0,
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.simulation")
+    parser.add_argument("--rate", type=float, default=settings.SIM_EVENTS_PER_SECOND or 1000.0, help="target events per second")
+    parser.add_argument("--duration", type=float, default=None, help="seconds to run (default: until Ctrl-C)")
+    parser.add_argument("--mix", default=settings.SIM_MIX, help=f"weighted event mix (default: {DEFAULT_MIX})")
+    parser.add_argument("--batch-size", type=int, default=settings.SIM_BATCH_SIZE, help="events per transaction")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between rate reports")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    run(
+        rate=args.rate,
+        mix=parse_mix(args.mix),
+        duration=args.duration,
+        batch_size=args.batch_size,
+        report_every=args.report_every,
+    )
+
+
+if __name__ == "__main__":
+    main()
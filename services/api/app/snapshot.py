@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from . import rollups
+from .bulk import (
+    TableLoadStats,
+    disabled_triggers,
+    drop_secondary_objects,
+    log_load_stats,
+    partitioned_tables,
+    rebuild_secondary_objects,
+    reset_sequences,
+)
+from .cache import response_cache
+from .db import Base, SessionLocal, engine
+from .partitioning import PARTITIONED_TABLES, ensure_partitions, key_range, split_default
+from .seeders import SEED_TABLES
+from .startup import SCHEMA_VERSION, read_meta, write_meta
+
+logger = logging.getLogger(__name__)
+
+# Snapshot / restore d'un jeu de données: une archive = un répertoire avec un
+# flux `COPY ... (FORMAT binary)` compressé (gzip) par table + manifest.json
+# (colonnes, lignes, version du schéma, empreinte du seed).
+#
+# Le format binaire de COPY dépend des types des colonnes: on ne restaure que
+# sur la même version de schéma (sauf --force).
+#
+#   python -m app.snapshot create ./snapshots/seed-42
+#   python -m app.snapshot restore ./snapshots/seed-42
+
+SNAPSHOT_TABLES = tuple(SEED_TABLES)  # ordre des dépendances FK
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+
+
+def _columns(table: str) -> list[str]:
+    # colonnes générées (search_vector, ...): recalculées par Postgres
+    return [c.name for c in Base.metadata.tables[table].columns if c.computed is None]
+
+
+def _raw_cursor(db: Session):
+    return db.connection().connection.dbapi_connection.cursor()
+
+
+def create_snapshot(path: str | Path, *, level: int = 3) -> dict:
+    """Exporte les tables CRM dans `path` (lecture cohérente: REPEATABLE READ)."""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    manifest = {
+        "format": FORMAT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "schema_version": SCHEMA_VERSION,
+        "tables": {},
+    }
+
+    conn = engine.connect().execution_options(isolation_level="REPEATABLE READ")
+    try:
+        with Session(bind=conn) as db:
+            db.execute(text("SET TRANSACTION READ ONLY"))
+            manifest["seed_fingerprint"] = read_meta(db.connection()).get("seed_fingerprint")
+            partitioned = partitioned_tables(db, SNAPSHOT_TABLES)
+            with _raw_cursor(db) as cur:
+                for table in SNAPSHOT_TABLES:
+                    t0 = time.perf_counter()
+                    columns = _columns(table)
+                    file = f"{table}.copy.gz"
+                    # COPY TO refuse une table partitionnée: on passe par une requête
+                    if table in partitioned:
+                        source = f"(SELECT {', '.join(columns)} FROM {table})"
+                    else:
+                        source = f"{table} ({', '.join(columns)})"
+                    with gzip.open(path / file, "wb", compresslevel=level) as f:
+                        cur.copy_expert(f"COPY {source} TO STDOUT (FORMAT binary)", f)
+                    rows = cur.rowcount
+                    manifest["tables"][table] = {
+                        "file": file,
+                        "columns": columns,
+                        "rows": rows,
+                        "bytes": (path / file).stat().st_size,
+                    }
+                    if table in PARTITIONED_TABLES:
+                        # mois à créer avant le COPY au restore (clé de partition)
+                        bounds = key_range(db.connection(), table)
+                        manifest["tables"][table]["key_range"] = bounds and [b.isoformat() for b in bounds]
+                    logger.info("snapshot %-15s %10d rows in %7.2fs", table, rows, time.perf_counter() - t0)
+            db.rollback()
+    finally:
+        conn.close()
+
+    (path / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def restore_snapshot(
+    path: str | Path,
+    *,
+    force: bool = False,
+    maintenance_work_mem: str = "1GB",
+    parallel_workers: int = 4,
+) -> dict[str, TableLoadStats]:
+    """
+    Remplace les tables CRM par le contenu de l'archive, en une transaction:
+    TRUNCATE, retrait des index secondaires / FK, COPY FREEZE dans l'ordre
+    des dépendances (triggers utilisateur désactivés: devis.total_amount est
+    déjà dans l'archive), reconstruction des index / FK, séquences, app_meta.
+    """
+    path = Path(path)
+    manifest = json.loads((path / MANIFEST).read_text())
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"unsupported snapshot format: {manifest.get('format')!r}")
+    if manifest["schema_version"] != SCHEMA_VERSION and not force:
+        raise ValueError(
+            f"snapshot schema {manifest['schema_version']} != current schema {SCHEMA_VERSION} (use --force)"
+        )
+
+    Base.metadata.create_all(bind=engine)
+    stats: dict[str, TableLoadStats] = {}
+    tables = [t for t in SNAPSHOT_TABLES if t in manifest["tables"]]
+
+    with SessionLocal() as db:
+        t0 = time.perf_counter()
+        db.execute(text(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY CASCADE"))
+        # partitions des mois de l'archive créées vides avant le COPY; archives
+        # sans key_range (plus anciennes): tout passe par DEFAULT puis split_default
+        for table in tables:
+            bounds = manifest["tables"][table].get("key_range")
+            if bounds:
+                ensure_partitions(db.connection(), *map(datetime.fromisoformat, bounds), tables=(table,))
+        deferred = drop_secondary_objects(db, tables)
+        partitioned = partitioned_tables(db, tables)
+
+        with _raw_cursor(db) as cur:
+            for table in tables:
+                entry = manifest["tables"][table]
+                # FREEZE n'est pas permis sur une table partitionnée
+                options = "FORMAT binary" if table in partitioned else "FORMAT binary, FREEZE"
+                with disabled_triggers(db, table, "USER"):
+                    t1 = time.perf_counter()
+                    with gzip.open(path / entry["file"], "rb") as f:
+                        cur.copy_expert(f"COPY {table} ({', '.join(entry['columns'])}) FROM STDIN ({options})", f)
+                    s = stats.setdefault(table, TableLoadStats(table))
+                    s.rows += cur.rowcount
+                    s.seconds += time.perf_counter() - t1
+
+        rebuild_secondary_objects(
+            db, deferred, maintenance_work_mem=maintenance_work_mem, parallel_workers=parallel_workers, stats=stats
+        )
+        reset_sequences(db, tables)
+        split_default(db.connection())
+        rollups.invalidate(db.connection())
+        response_cache.clear()
+        meta = {"schema_version": SCHEMA_VERSION}
+        if manifest.get("seed_fingerprint"):
+            meta["seed_fingerprint"] = manifest["seed_fingerprint"]
+        write_meta(db.connection(), **meta)
+        db.commit()
+
+    log_load_stats(stats, label="restore")
+    logger.info("restore %s in %.2fs", path, time.perf_counter() - t0)
+    return stats
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.snapshot")
+    sub = parser.add_subparsers(dest="command", required=True)
+    create = sub.add_parser("create", help="export the CRM tables as compressed binary COPY streams")
+    create.add_argument("path")
+    create.add_argument("--level", type=int, default=3, help="gzip level (1 = fastest, 9 = smallest)")
+    restore = sub.add_parser("restore", help="replace the CRM tables with a snapshot")
+    restore.add_argument("path")
+    restore.add_argument("--force", action="store_true", help="restore even if the schema version differs")
+    restore.add_argument("--maintenance-work-mem", default="1GB")
+    restore.add_argument("--parallel-workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.command == "create":
+        create_snapshot(args.path, level=args.level)
+    else:
+        restore_snapshot(
+            args.path,
+            force=args.force,
+            maintenance_work_mem=args.maintenance_work_mem,
+            parallel_workers=args.parallel_workers,
+        )
+
+
+if __name__ == "__main__":
+    main()
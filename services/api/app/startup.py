@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterator
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from .cache import response_cache
+from .config import settings
+from .db import Base, SessionLocal, engine
+from .models import DEVIS_TOTALS_DDL, AppMeta
+from .partitioning import ensure_partitions, maintain as maintain_partitions, split_default
+from .seeders import seed_crm_data, seed_time_range
+
+logger = logging.getLogger(__name__)
+
+# Démarrage de l'API.
+#
+# STARTUP_MODE=reset: comportement historique, DROP SCHEMA + create_all + seed
+# à chaque démarrage.
+# STARTUP_MODE=check (défaut): la table app_meta garde la version du schéma
+# (empreinte du DDL des modèles) et l'empreinte du seed (paramètres). Si les
+# deux correspondent, ni reset ni seed: l'API est prête tout de suite. Sinon
+# reset + create_all, puis seed; avec SEED_IN_BACKGROUND le seed tourne dans
+# un thread et l'API répond pendant ce temps (état dans /health).
+#
+# Plusieurs workers uvicorn: le premier qui prend l'advisory lock
+# STARTUP_LOCK_KEY prépare la base (et le garde jusqu'à la fin du seed), les
+# autres ne touchent à rien.
+
+STARTUP_LOCK_KEY = 0x43524D53  # "CRMS"
+
+
+def _schema_version() -> str:
+    dialect = postgresql.dialect()
+    h = hashlib.sha256()
+    for table in Base.metadata.sorted_tables:
+        h.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            h.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    for ddl in DEVIS_TOTALS_DDL:
+        h.update(ddl.encode())
+    return h.hexdigest()[:16]
+
+
+SCHEMA_VERSION = _schema_version()
+
+
+def seed_fingerprint(params: dict) -> str:
+    # "orm" et "copy" écrivent les mêmes lignes; chunk_size ne change que "columnar";
+    # workers et index différés ne changent que la façon d'écrire
+    p = dict(params)
+    for key in ("workers", "defer_indexes", "index_workers", "maintenance_work_mem"):
+        p.pop(key, None)
+    if p.get("mode") != "columnar":
+        p["mode"] = "rows"
+        p.pop("chunk_size", None)
+    return hashlib.sha256(json.dumps(p, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class SeedState:
+    """État du seed dans ce process (exposé par /health)."""
+
+    def __init__(self):
+        self.status = "pending"  # pending, current, running, done, failed, external
+        self.seconds: float | None = None
+        self.error: str | None = None
+
+    def as_dict(self) -> dict:
+        return {"status": self.status, "seconds": self.seconds, "error": self.error}
+
+
+seed_state = SeedState()
+
+
+@contextmanager
+def phase(name: str, timings: dict[str, float]) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - t0
+        logger.info("startup %-12s %.3fs", name, timings[name])
+
+
+def reset_public_schema(conn) -> None:
+    # Drop tout le schéma public + objets dépendants (tables, index, FK, etc.)
+    conn.execute(text("DROP SCHEMA IF EXISTS public CASCADE;"))
+    conn.execute(text("CREATE SCHEMA public;"))
+    # Optionnel: redonner les permissions par défaut
+    conn.execute(text("GRANT ALL ON SCHEMA public TO postgres;"))
+    conn.execute(text("GRANT ALL ON SCHEMA public TO public;"))
+
+
+def read_meta(conn) -> dict[str, str]:
+    if conn.scalar(text("SELECT to_regclass('public.app_meta')")) is None:
+        return {}
+    return dict(conn.execute(text("SELECT key, value FROM app_meta")).all())
+
+
+def write_meta(conn, **values: str) -> None:
+    stmt = pg_insert(AppMeta).values([{"key": k, "value": v} for k, v in values.items()])
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={"value": stmt.excluded.value, "updated_at": text("now()")},
+        )
+    )
+
+
+def _release(lock_conn) -> None:
+    # close() ne fait que rendre la connexion au pool (ROLLBACK), un advisory
+    # lock de session y survit: unlock explicite, sinon connexion invalidée
+    try:
+        lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": STARTUP_LOCK_KEY})
+        lock_conn.commit()
+    except Exception:
+        lock_conn.invalidate()
+        logger.exception("startup: advisory unlock failed, connection discarded")
+    finally:
+        lock_conn.close()
+
+
+def _seed(lock_conn, params: dict, fingerprint: str) -> None:
+    seed_state.status = "running"
+    t0 = time.perf_counter()
+    try:
+        with SessionLocal() as db:
+            seed_crm_data(db, **params)
+        with engine.begin() as conn:
+            split_default(conn)  # partitionnement: restes éventuels (fuseau, `now` du seed)
+            write_meta(conn, seed_fingerprint=fingerprint)
+        response_cache.clear()  # réponses lues pendant le seed
+        seed_state.status = "done"
+    except Exception as e:
+        seed_state.status = "failed"
+        seed_state.error = repr(e)
+        logger.exception("seed failed")
+    finally:
+        seed_state.seconds = round(time.perf_counter() - t0, 3)
+        logger.info("startup %-12s %.3fs (%s)", "seed", seed_state.seconds, seed_state.status)
+        _release(lock_conn)
+
+
+def prepare_database(seed_params: dict) -> dict[str, float]:
+    """Reset / create_all / seed selon STARTUP_MODE; renvoie les durées par phase."""
+    timings: dict[str, float] = {}
+    t0 = time.perf_counter()
+
+    lock_conn = engine.connect()
+    with phase("lock", timings):
+        leader = lock_conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": STARTUP_LOCK_KEY})
+        lock_conn.commit()
+    if not leader:
+        lock_conn.close()
+        seed_state.status = "external"
+        logger.info("startup: database is being prepared by another process")
+        return timings
+
+    fingerprint = seed_fingerprint(seed_params)
+    try:
+        with phase("check", timings), engine.connect() as conn:
+            meta = read_meta(conn)
+        current = (
+            settings.STARTUP_MODE == "check"
+            and meta.get("schema_version") == SCHEMA_VERSION
+            and meta.get("seed_fingerprint") == fingerprint
+        )
+        if current:
+            seed_state.status = "current"
+            logger.info("startup: schema %s and seed %s are current, skipping reset", SCHEMA_VERSION, fingerprint)
+            _release(lock_conn)
+            return timings
+
+        with phase("reset", timings), engine.begin() as conn:
+            reset_public_schema(conn)
+        response_cache.clear()  # backend partagé: réponses de l'ancienne base
+        with phase("create_all", timings), engine.begin() as conn:
+            Base.metadata.create_all(bind=conn)
+            maintain_partitions(conn)  # sans effet si PARTITIONING=false
+            # mois des données du seed créés avant le chargement (pas de détour par DEFAULT)
+            ensure_partitions(conn, *seed_time_range(datetime.now(timezone.utc)))
+            write_meta(conn, schema_version=SCHEMA_VERSION)
+    except Exception:
+        _release(lock_conn)
+        raise
+
+    if settings.SEED_IN_BACKGROUND:
+        threading.Thread(target=_seed, args=(lock_conn, seed_params, fingerprint), name="seed", daemon=True).start()
+    else:
+        _seed(lock_conn, seed_params, fingerprint)
+        timings["seed"] = seed_state.seconds
+
+    logger.info("startup ready in %.3fs (seed: %s)", time.perf_counter() - t0, seed_state.status)
+    return timings
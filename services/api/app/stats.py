@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+from typing import List, Optional
+
+from sqlalchemy import Date, Float, Integer, cast, func, select
+from sqlalchemy.orm import Session
+
+from . import rollups
+from .config import settings
+from .models import (
+    Action,
+    Campagne,
+    Devis,
+    Entreprise,
+    Interlocuteur,
+    Produit,
+    RollupDevisDaily,
+    RollupVentesDaily,
+    User,
+    Vente,
+)
+
+# Agrégats du dashboard: tout est calculé en SQL (COUNT / SUM ... GROUP BY),
+# l'API ne renvoie que le résultat (quelques lignes quel que soit le volume).
+# Pipeline, CA par campagne / owner et CA mensuel sont lus dans les rollups
+# journaliers (rollups.py, en retard d'au plus ROLLUP_REFRESH_SECONDS +
+# ROLLUP_LAG_SECONDS) quand STATS_FROM_ROLLUPS et qu'ils ont été construits;
+# sinon calculés sur les tables.
+
+COUNTED = {
+    "users": User,
+    "entreprises": Entreprise,
+    "interlocuteurs": Interlocuteur,
+    "campagnes": Campagne,
+    "produits": Produit,
+    "devis": Devis,
+    "ventes": Vente,
+    "actions": Action,
+}
+
+REVENUE_DIMENSIONS = ("campagne", "secteur", "owner")
+
+
+def _amount(col):
+    return cast(func.coalesce(func.sum(col), 0), Float).label("amount")
+
+
+def counts(db: Session) -> dict:
+    # un seul aller-retour: un scalar subquery par table
+    stmt = select(*[select(func.count()).select_from(m).scalar_subquery().label(k) for k, m in COUNTED.items()])
+    return dict(db.execute(stmt).mappings().one())
+
+
+def _by_status(db: Session, model, amount_col) -> List[dict]:
+    stmt = (
+        select(model.status, func.count().label("count"), _amount(amount_col))
+        .group_by(model.status)
+        .order_by(func.count().desc())
+    )
+    return [dict(r) for r in db.execute(stmt).mappings()]
+
+
+def _use_rollups(db: Session) -> bool:
+    return settings.STATS_FROM_ROLLUPS and rollups.is_ready(db)
+
+
+def _rollup_by_status(db: Session, rollup) -> List[dict]:
+    count = func.sum(rollup.count)
+    stmt = (
+        select(rollup.status, cast(count, Integer).label("count"), _amount(rollup.amount))
+        .group_by(rollup.status)
+        .order_by(count.desc())
+    )
+    return [dict(r) for r in db.execute(stmt).mappings()]
+
+
+def pipeline(db: Session) -> dict:
+    if _use_rollups(db):
+        return {
+            "devis": _rollup_by_status(db, RollupDevisDaily),
+            "ventes": _rollup_by_status(db, RollupVentesDaily),
+        }
+    return {
+        "devis": _by_status(db, Devis, Devis.total_amount),
+        "ventes": _by_status(db, Vente, Vente.amount),
+    }
+
+
+def revenue(db: Session, by: str, status: Optional[str] = "won", limit: int = 50) -> List[dict]:
+    """CA des ventes (status=None: toutes) par campagne, secteur d'entreprise ou owner."""
+    if by in ("campagne", "owner") and _use_rollups(db):
+        return _rollup_revenue(db, by, status, limit)
+    if by == "campagne":
+        key, label = Vente.campagne_id, Campagne.nom
+        stmt = select(key.label("key"), label.label("label")).outerjoin(Campagne, Campagne.id == Vente.campagne_id)
+    elif by == "secteur":
+        key = label = Entreprise.secteur
+        stmt = select(key.label("key"), label.label("label")).join(Entreprise, Entreprise.id == Vente.entreprise_id)
+    elif by == "owner":
+        key, label = Vente.owner_id, User.full_name
+        stmt = select(key.label("key"), label.label("label")).join(User, User.id == Vente.owner_id)
+    else:
+        raise ValueError(f"unknown revenue dimension: {by!r}")
+
+    stmt = stmt.add_columns(func.count().label("count"), _amount(Vente.amount)).group_by(key, label)
+    if status is not None:
+        stmt = stmt.where(Vente.status == status)
+    stmt = stmt.order_by(func.sum(Vente.amount).desc().nulls_last()).limit(limit)
+    return [dict(r) for r in db.execute(stmt).mappings()]
+
+
+def _rollup_revenue(db: Session, by: str, status: Optional[str], limit: int) -> List[dict]:
+    r = RollupVentesDaily
+    if by == "campagne":
+        key = func.nullif(r.campagne_id, 0)
+        stmt = select(key.label("key"), Campagne.nom.label("label")).outerjoin(Campagne, Campagne.id == r.campagne_id)
+        group = (r.campagne_id, Campagne.nom)
+    else:
+        stmt = select(r.owner_id.label("key"), User.full_name.label("label")).outerjoin(User, User.id == r.owner_id)
+        group = (r.owner_id, User.full_name)
+
+    amount = func.sum(r.amount)
+    stmt = stmt.add_columns(cast(func.sum(r.count), Integer).label("count"), _amount(r.amount)).group_by(*group)
+    if status is not None:
+        stmt = stmt.where(r.status == status)
+    stmt = stmt.order_by(amount.desc().nulls_last()).limit(limit)
+    return [dict(row) for row in db.execute(stmt).mappings()]
+
+
+def monthly_revenue(db: Session, status: Optional[str] = "won", months: int = 12) -> List[dict]:
+    """CA des ventes par mois de création (mois en APP_TIMEZONE), `months` derniers mois."""
+    if _use_rollups(db):
+        r = RollupVentesDaily
+        month = cast(func.date_trunc("month", r.day), Date)
+        stmt = select(month.label("month"), cast(func.sum(r.count), Integer).label("count"), _amount(r.amount))
+        status_col = r.status
+    else:
+        month = cast(func.date_trunc("month", func.timezone(settings.APP_TIMEZONE, Vente.created_at)), Date)
+        stmt = select(month.label("month"), func.count().label("count"), _amount(Vente.amount))
+        status_col = Vente.status
+
+    if status is not None:
+        stmt = stmt.where(status_col == status)
+    stmt = stmt.group_by(month).order_by(month.desc()).limit(months)
+    return [dict(row) for row in db.execute(stmt).mappings()][::-1]
+
+
+def top_devis(db: Session, limit: int = 20, status: Optional[str] = None) -> List[dict]:
+    stmt = (
+        select(
+            Devis.id,
+            Devis.code,
+            Devis.title,
+            Devis.status,
+            Devis.entreprise_id,
+            Entreprise.nom.label("entreprise_nom"),
+            cast(Devis.total_amount, Float).label("total_amount"),
+            Devis.currency,
+            Devis.issue_date,
+        )
+        .join(Entreprise, Entreprise.id == Devis.entreprise_id)
+        .where(Devis.total_amount.is_not(None))
+        .order_by(Devis.total_amount.desc())
+        .limit(limit)
+    )
+    if status is not None:
+        stmt = stmt.where(Devis.status == status)
+    return [dict(r) for r in db.execute(stmt).mappings()]
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+
+# Contrôle du cache devis.total_amount (maintenu par les triggers de
+# devis_produits, voir models.py) contre la somme réelle des lignes.
+#
+#   python -m app.totals verify [--fix] [--limit N]
+
+_LINE_SUMS = """
+    SELECT d.id AS devis_id, d.total_amount AS cached, s.lines_sum
+    FROM devis d
+    LEFT JOIN (
+        SELECT devis_id, SUM(line_total) AS lines_sum
+        FROM devis_produits
+        GROUP BY devis_id
+    ) s ON s.devis_id = d.id
+    WHERE d.total_amount IS DISTINCT FROM s.lines_sum
+"""
+
+
+def find_drift(db: Session, limit: int | None = None) -> List[dict]:
+    """Devis dont le total en cache diffère de SUM(line_total)."""
+    sql = _LINE_SUMS + " ORDER BY d.id"
+    if limit is not None:
+        sql += " LIMIT :limit"
+    return [dict(r) for r in db.execute(text(sql), {"limit": limit}).mappings()]
+
+
+def fix_drift(db: Session) -> int:
+    """Réaligne les totaux en écart sur la somme des lignes; renvoie le nombre de devis corrigés."""
+    result = db.execute(
+        text(
+            f"""
+            UPDATE devis d
+            SET total_amount = drift.lines_sum, updated_at = now()
+            FROM ({_LINE_SUMS}) drift
+            WHERE d.id = drift.devis_id
+            """
+        )
+    )
+    db.commit()
+    return result.rowcount
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.totals")
+    sub = parser.add_subparsers(dest="command", required=True)
+    verify = sub.add_parser("verify", help="report devis whose total_amount differs from the line sums")
+    verify.add_argument("--fix", action="store_true", help="rewrite drifted totals from the line sums")
+    verify.add_argument("--limit", type=int, default=20, help="max rows to print (default: 20)")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        drift = find_drift(db)
+        for row in drift[: args.limit]:
+            print(f"devis {row['devis_id']}: cached={row['cached']} lines={row['lines_sum']}")
+        if len(drift) > args.limit:
+            print(f"... {len(drift) - args.limit} more")
+        print(f"{len(drift)} devis with drifted total_amount")
+
+        if drift and args.fix:
+            print(f"fixed {fix_drift(db)} devis")
+            return 0
+        return 1 if drift else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
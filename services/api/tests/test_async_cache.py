@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import orjson
+import pytest
+from fastapi import HTTPException
+
+from app import async_api, cache
+
+# Routes async avec un backend de cache lent / indisponible (Redis en panne,
+# timeouts): la boucle d'événements ne doit jamais attendre le backend.
+
+DELAY = 0.2
+N = 5
+
+
+class SlowBackend:
+    """Backend bloquant: chaque appel dort DELAY (comme un socket qui attend)."""
+
+    name = "slow"
+    blocking = True
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+
+    def _wait(self) -> None:
+        time.sleep(DELAY)
+        if self.fail:
+            raise ConnectionError("backend down")
+
+    def version(self, scope: str) -> int:
+        self._wait()
+        return 0
+
+    def get(self, key: str) -> bytes:
+        self._wait()
+        return orjson.dumps({"ETag": '"t"'}) + b"\n" + orjson.dumps({"id": 1})
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._wait()
+
+    def bump(self, scope: str, ttl: float) -> None:
+        self._wait()
+
+
+class _Result:
+    def first(self):
+        return None
+
+
+class FakeSession:
+    """Session async minimale: aucune ligne (produit inconnu)."""
+
+    async def execute(self, stmt):
+        return _Result()
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    def use(fail: bool = False) -> SlowBackend:
+        b = SlowBackend(fail)
+        monkeypatch.setattr(cache.response_cache, "backend", b)
+        return b
+
+    return use
+
+
+async def _max_loop_lag(task) -> float:
+    """Plus grand retard de la boucle pendant `task` (sonde toutes les 10 ms)."""
+    lag = 0.0
+    while not task.done():
+        t0 = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lag = max(lag, time.perf_counter() - t0 - 0.01)
+    return lag
+
+
+async def _concurrently(coros):
+    task = asyncio.ensure_future(asyncio.gather(*coros, return_exceptions=True))
+    lag = await _max_loop_lag(task)
+    return await task, lag
+
+
+def test_slow_backend_does_not_block_the_event_loop(backend):
+    backend()
+
+    async def run():
+        t0 = time.perf_counter()
+        calls = [async_api.get_produit(1, if_none_match=None, db=FakeSession()) for _ in range(N)]
+        results, lag = await _concurrently(calls)
+        return results, lag, time.perf_counter() - t0
+
+    results, lag, elapsed = asyncio.run(run())
+    assert all(r.status_code == 200 and r.headers["X-Cache"] == "HIT" for r in results)
+    # version + get par requête, en parallèle dans le threadpool
+    assert elapsed < N * 2 * DELAY / 2
+    assert lag < DELAY / 2
+
+
+def test_unavailable_backend_falls_back_to_the_database(backend):
+    backend(fail=True)
+
+    async def run():
+        calls = [async_api.get_produit(1, if_none_match=None, db=FakeSession()) for _ in range(N)]
+        return await _concurrently(calls)
+
+    results, lag = asyncio.run(run())
+    # miss => lecture en base (FakeSession: produit inconnu => 404), pas de 500
+    assert all(isinstance(r, HTTPException) and r.status_code == 404 for r in results)
+    assert lag < DELAY / 2
+
+
+def test_invalidation_from_async_writes_does_not_block(backend):
+    backend()
+
+    async def run():
+        return await _concurrently([cache.invalidate_devis_async(i) for i in range(N)])
+
+    _, lag = asyncio.run(run())
+    assert lag < DELAY / 2
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from app.columnar import ColumnarGenerator
+from app.seeders import _shard_first_ids, _shard_generator
+
+# Déterminisme du générateur colonnaire: même (seed, chunk_size, now) =>
+# mêmes octets, quel que soit l'ordre des blocs ou le nombre de workers.
+
+NOW = datetime(2026, 1, 15, 10, 30)
+GEN_KWARGS = dict(seed=42, n_users=7, n_entreprises=2_500, now=NOW, block_size=600)
+REFERENCE_IDS = {"users": 1, "campagnes": 1, "produits": 1}
+BASE_IDS = {t: 1 for t in ColumnarGenerator.BLOCK_TABLES}
+
+
+def _fingerprint(batches) -> list[tuple]:
+    """Batches -> (table, colonne, dtype, octets des valeurs, octets du masque NULL)."""
+    out = []
+    for b in batches:
+        for name, values in b.columns.items():
+            mask = b.nulls.get(name)
+            out.append(
+                (b.table, name, values.dtype.str, np.ascontiguousarray(values).tobytes(), None if mask is None else mask.tobytes())
+            )
+    return out
+
+
+def _generate(gen_kwargs: dict, blocks_order=None) -> list[tuple]:
+    gen = ColumnarGenerator(**gen_kwargs)
+    out = _fingerprint(gen.reference_batches(REFERENCE_IDS))
+    shards = dict(_shard_first_ids(gen, BASE_IDS))
+    per_block = {b: _fingerprint(gen.block_batches(gen.plan(b), shards[b])) for b in (blocks_order or gen.blocks())}
+    for b in gen.blocks():
+        out += per_block[b]
+    return out
+
+
+# Côté worker (process spawn), comme seeders._init_shard_worker / _run_shard sans la base
+_worker_gen: ColumnarGenerator | None = None
+
+
+def _init_worker(gen_kwargs: dict, reference_ids: dict[str, int]) -> None:
+    global _worker_gen
+    _worker_gen = _shard_generator(gen_kwargs, reference_ids)
+
+
+def _worker_block(block: int, first_ids: dict[str, int]) -> list[tuple]:
+    return _fingerprint(_worker_gen.block_batches(_worker_gen.plan(block), first_ids))
+
+
+def test_same_seed_same_bytes():
+    assert _generate(GEN_KWARGS) == _generate(GEN_KWARGS)
+
+
+def test_other_seed_other_rows():
+    assert _generate(GEN_KWARGS) != _generate({**GEN_KWARGS, "seed": 43})
+
+
+def test_block_order_does_not_matter():
+    gen = ColumnarGenerator(**GEN_KWARGS)
+    assert _generate(GEN_KWARGS, blocks_order=reversed(gen.blocks())) == _generate(GEN_KWARGS)
+
+
+def test_shard_ids_are_contiguous():
+    gen = ColumnarGenerator(**GEN_KWARGS)
+    gen.reference_batches(REFERENCE_IDS)
+    seen = {t: [] for t in gen.BLOCK_TABLES}
+    for block, first_ids in _shard_first_ids(gen, BASE_IDS):
+        for batch in gen.block_batches(gen.plan(block), first_ids):
+            seen[batch.table].append(batch.columns["id"])
+    for table, ids in seen.items():
+        ids = np.concatenate(ids)
+        assert np.array_equal(ids, np.arange(1, len(ids) + 1)), table
+
+
+def test_parallel_workers_match_single_process():
+    single = ColumnarGenerator(**GEN_KWARGS)
+    single.reference_batches(REFERENCE_IDS)
+    shards = _shard_first_ids(single, BASE_IDS)
+    expected = [_fingerprint(single.block_batches(single.plan(b), ids)) for b, ids in shards]
+
+    with ProcessPoolExecutor(
+        max_workers=2,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(GEN_KWARGS, REFERENCE_IDS),
+    ) as pool:
+        parallel = list(pool.map(_worker_block, *zip(*shards)))
+
+    assert parallel == expected
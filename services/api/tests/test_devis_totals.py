@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Devis, DevisProduit, Entreprise, Produit, User
+from app.totals import find_drift
+
+# Triggers devis_produits -> devis.total_amount / updated_at (models.py), sur
+# lignes chiffrées et non chiffrées (produit sans unit_price: line_total NULL).
+
+
+@pytest.fixture
+def db(pg_engine):
+    with Session(pg_engine) as db:
+        yield db
+
+
+@pytest.fixture
+def refs(db):
+    user = User(email="totals@crm.local", full_name="Totals")
+    ent = Entreprise(siren="999999999", nom="Totals SA")
+    priced = Produit(sku="TOT-PRICED", name="Chiffré", unit_price=Decimal("10.00"))
+    unpriced = Produit(sku="TOT-UNPRICED", name="Sans prix", unit_price=None)
+    db.add_all([user, ent, priced, unpriced])
+    db.commit()
+    yield user, ent, priced, unpriced
+    db.execute(delete(Devis).where(Devis.owner_id == user.id))
+    db.execute(delete(Produit).where(Produit.id.in_([priced.id, unpriced.id])))
+    db.execute(delete(Entreprise).where(Entreprise.id == ent.id))
+    db.execute(delete(User).where(User.id == user.id))
+    db.commit()
+
+
+def _new_devis(db, refs, code: str) -> int:
+    user, ent, _, _ = refs
+    devis_id = db.scalar(insert(Devis).values(owner_id=user.id, entreprise_id=ent.id, code=code).returning(Devis.id))
+    db.commit()
+    return devis_id
+
+
+def _state(db, devis_id: int):
+    db.expire_all()
+    return db.execute(select(Devis.total_amount, Devis.updated_at).where(Devis.id == devis_id)).one()
+
+
+def _write(db, devis_id: int, stmt):
+    """Une écriture par transaction; renvoie (total, updated_at) avant / après."""
+    before = _state(db, devis_id)
+    db.execute(stmt)
+    db.commit()
+    return before, _state(db, devis_id)
+
+
+def _line(devis_id: int, produit: Produit, quantity: int) -> dict:
+    line_total = None if produit.unit_price is None else produit.unit_price * quantity
+    return dict(
+        devis_id=devis_id, produit_id=produit.id, quantity=quantity, unit_price=produit.unit_price, line_total=line_total
+    )
+
+
+def test_priced_and_unpriced_lines(db, refs):
+    _, _, priced, unpriced = refs
+    devis_id = _new_devis(db, refs, "TOT-1")
+    lines = DevisProduit.__table__
+
+    # INSERT chiffrée
+    before, after = _write(db, devis_id, insert(lines).values(_line(devis_id, priced, 2)))
+    assert after.total_amount == Decimal("20.00") and after.updated_at > before.updated_at
+
+    # INSERT non chiffrée: total inchangé, updated_at avance
+    before, after = _write(db, devis_id, insert(lines).values(_line(devis_id, unpriced, 1)))
+    assert after.total_amount == Decimal("20.00") and after.updated_at > before.updated_at
+
+    # UPDATE quantité de la ligne non chiffrée (le cas qui laissait l'ETag figé)
+    stmt = update(lines).where(lines.c.devis_id == devis_id, lines.c.produit_id == unpriced.id).values(quantity=5)
+    before, after = _write(db, devis_id, stmt)
+    assert after.total_amount == Decimal("20.00") and after.updated_at > before.updated_at
+
+    # UPDATE de la ligne chiffrée
+    stmt = (
+        update(lines)
+        .where(lines.c.devis_id == devis_id, lines.c.produit_id == priced.id)
+        .values(quantity=3, line_total=Decimal("30.00"))
+    )
+    before, after = _write(db, devis_id, stmt)
+    assert after.total_amount == Decimal("30.00") and after.updated_at > before.updated_at
+
+    # DELETE de la ligne chiffrée: plus de ligne chiffrée => total NULL
+    stmt = delete(lines).where(lines.c.devis_id == devis_id, lines.c.produit_id == priced.id)
+    before, after = _write(db, devis_id, stmt)
+    assert after.total_amount is None and after.updated_at > before.updated_at
+
+    # DELETE de la dernière ligne (non chiffrée)
+    before, after = _write(db, devis_id, delete(lines).where(lines.c.devis_id == devis_id))
+    assert after.total_amount is None and after.updated_at > before.updated_at
+
+    assert not [r for r in find_drift(db) if r["devis_id"] == devis_id]
+
+
+def test_unpriced_only_devis_keeps_null_total(db, refs):
+    _, _, _, unpriced = refs
+    devis_id = _new_devis(db, refs, "TOT-2")
+    lines = DevisProduit.__table__
+
+    before, after = _write(db, devis_id, insert(lines).values(_line(devis_id, unpriced, 1)))
+    assert after.total_amount is None and after.updated_at > before.updated_at
+
+    stmt = update(lines).where(lines.c.devis_id == devis_id).values(quantity=4)
+    before, after = _write(db, devis_id, stmt)
+    assert after.total_amount is None and after.updated_at > before.updated_at
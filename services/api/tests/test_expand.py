@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timezone
+
+import orjson
+
+from app.expand import DEVIS, VENTE, dump, parse_expand
+from app.models import Campagne, Devis, DevisProduit, Entreprise, Interlocuteur, Produit, User, Vente
+
+# Pages dépliées sérialisées comme dans les endpoints (dump + orjson), sur des
+# objets transients aux valeurs du seed (emails en .local compris).
+
+NOW = datetime(2026, 1, 15, 10, 0, tzinfo=timezone.utc)
+
+
+def _devis() -> Devis:
+    owner = User(id=1, email="user1@crm.local", full_name="User 1", is_active=True, created_at=NOW, updated_at=NOW)
+    entreprise = Entreprise(
+        id=1, siren="123456789", nom="Entreprise 1", email="contact1@entreprises.local", created_at=NOW, updated_at=NOW
+    )
+    interlocuteur = Interlocuteur(
+        id=1,
+        entreprise_id=1,
+        first_name="Jean",
+        last_name="Dupont",
+        email="0a1b2c3d@entreprise-1.local",
+        is_primary=True,
+        created_at=NOW,
+        updated_at=NOW,
+    )
+    campagne = Campagne(id=1, code="CAMP-1", nom="Campagne 1", type="email", is_active=True, created_at=NOW, updated_at=NOW)
+    produit = Produit(id=1, sku="SKU-1", name="Produit 1", unit_price=100.0, currency="EUR", is_active=True, created_at=NOW, updated_at=NOW)
+    d = Devis(
+        id=1,
+        owner_id=1,
+        entreprise_id=1,
+        interlocuteur_id=1,
+        campagne_id=1,
+        code="DEV-2026-0001",
+        status="accepted",
+        issue_date=date(2026, 1, 15),
+        total_amount=200.0,
+        currency="EUR",
+        created_at=NOW,
+        updated_at=NOW,
+    )
+    d.owner, d.entreprise, d.interlocuteur, d.campagne = owner, entreprise, interlocuteur, campagne
+    d.lines = [
+        DevisProduit(
+            id=1, devis_id=1, produit_id=1, quantity=2, unit_price=100.0, currency="EUR", line_total=200.0, created_at=NOW
+        )
+    ]
+    d.lines[0].produit = produit
+    d.vente = Vente(
+        id=1, owner_id=1, entreprise_id=1, devis_id=1, amount=200.0, currency="EUR", status="won", created_at=NOW, updated_at=NOW
+    )
+    d.vente.owner, d.vente.entreprise = owner, entreprise
+    return d
+
+
+def test_devis_page_expanded_serializes():
+    names = parse_expand("*,lines.produit", DEVIS)
+    page = orjson.loads(orjson.dumps([dump(_devis(), DEVIS, names)]))
+    row = page[0]
+    assert row["owner"]["email"] == "user1@crm.local"
+    assert row["entreprise"]["email"] == "contact1@entreprises.local"
+    assert row["interlocuteur"]["email"] == "0a1b2c3d@entreprise-1.local"
+    assert row["campagne"]["code"] == "CAMP-1"
+    assert row["lines"][0]["produit"]["sku"] == "SKU-1"
+    assert row["vente"]["status"] == "won"
+
+
+def test_vente_page_expanded_serializes():
+    names = parse_expand("*,devis.lines.produit", VENTE)
+    vente = _devis().vente
+    row = orjson.loads(orjson.dumps([dump(vente, VENTE, names)]))[0]
+    assert row["owner"]["email"] == "user1@crm.local"
+    assert row["devis"]["lines"][0]["produit"]["id"] == 1
+    assert "vente" not in row["devis"]
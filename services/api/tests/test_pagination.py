@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import base64
+from datetime import datetime
+
+import orjson
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, delete, insert
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models import Produit
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, next_cursor, page_response
+
+# Curseurs (pagination.py) et pages keyset (crud._page) des listes.
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("last_id", [1, 42, 2**31 + 7, 2**62])
+def test_cursor_round_trip(last_id):
+    cursor = encode_cursor(last_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == last_id
+
+
+@pytest.mark.parametrize("cursor", [None, ""])
+def test_no_cursor(cursor):
+    assert decode_cursor(cursor) is None
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "!!!",
+        "abc",
+        _b64(b"not json"),
+        _b64(b"[1, 2]"),
+        _b64(b'{"last": 3}'),
+        _b64(b'{"id": "3"}'),
+        _b64(b'{"id": 3.5}'),
+        _b64(b'{"id": null}'),
+        _b64(b'{"id": true}'),
+    ],
+)
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+
+def test_next_cursor_only_on_full_pages():
+    rows = [{"id": 30}, {"id": 20}, {"id": 10}]
+    assert decode_cursor(next_cursor(rows, 3)) == 10
+    assert next_cursor(rows, 4) is None
+    assert next_cursor([], 3) is None
+    assert next_cursor(rows, 0) is None
+
+
+def test_page_response_header():
+    response = page_response([{"id": 5}, {"id": 4}], 2)
+    assert orjson.loads(response.body) == [{"id": 5}, {"id": 4}]
+    assert decode_cursor(response.headers[NEXT_CURSOR_HEADER]) == 4
+    assert NEXT_CURSOR_HEADER not in page_response([{"id": 5}], 2).headers
+
+
+# Continuité keyset: SQLite en mémoire (table produits seule), et Postgres
+# quand TEST_DATABASE_URL est défini (voir conftest.py).
+
+SKU_PREFIX = "PAGE-TEST-"
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def engine(request):
+    if request.param == "sqlite":
+        engine = create_engine("sqlite://")
+        Produit.__table__.create(engine)
+        yield engine
+        engine.dispose()
+        return
+    engine = request.getfixturevalue("pg_engine")
+    yield engine
+    with engine.begin() as conn:
+        conn.execute(delete(Produit).where(Produit.sku.like(SKU_PREFIX + "%")))
+
+
+def _insert(db: Session, n: int, start: int) -> None:
+    now = datetime(2026, 1, 1)
+    db.execute(
+        insert(Produit),
+        [
+            dict(sku=f"{SKU_PREFIX}{i}", name=f"Produit {i}", currency="EUR", is_active=True, created_at=now, updated_at=now)
+            for i in range(start, start + n)
+        ],
+    )
+    db.commit()
+
+
+def _walk(db: Session, limit: int, between_pages=None) -> list[int]:
+    seen, cursor = [], None
+    while True:
+        rows = crud.fetch_page(db, crud.produits_page(limit, 0, decode_cursor(cursor)))
+        seen += [r["id"] for r in rows if r["sku"].startswith(SKU_PREFIX)]
+        cursor = next_cursor(rows, limit)
+        if cursor is None:
+            return seen
+        if between_pages is not None:
+            between_pages()
+
+
+def test_keyset_walk_has_no_duplicates_or_gaps(engine):
+    with Session(engine) as db:
+        _insert(db, 25, 0)
+        expected = [r["id"] for r in crud.fetch_page(db, crud.produits_page(1000)) if r["sku"].startswith(SKU_PREFIX)]
+        assert len(expected) == 25
+
+        inserted = iter(range(100, 1000, 3))
+        ids = _walk(db, 10, between_pages=lambda: _insert(db, 3, next(inserted)))
+
+        # les lignes insérées pendant le parcours (ids plus grands) ne décalent rien
+        assert ids == expected
+        assert ids == sorted(ids, reverse=True)
+
+
+def test_cursor_ignores_offset(engine):
+    with Session(engine) as db:
+        _insert(db, 10, 0)
+        top = crud.fetch_page(db, crud.produits_page(3))
+        cursor_id = top[-1]["id"]
+        with_offset = crud.fetch_page(db, crud.produits_page(3, 5, cursor_id))
+        without = crud.fetch_page(db, crud.produits_page(3, 0, cursor_id))
+        assert with_offset == without
+        assert all(r["id"] < cursor_id for r in without)
@@ -9,12 +9,27 @@ st.set_page_config(page_title="CRM Dashboard (POC)", layout="wide")
 st.title("CRM Dashboard (Streamlit)")
 
 
+@st.cache_resource
+def _etag_store() -> dict:
+    # (url, params) -> (ETag, corps) de la dernière réponse 200
+    return {}
+
+
 @st.cache_data(ttl=30)
 def api_get(path: str, params=None):
+    # GET conditionnel: l'API répond 304 sans corps si rien n'a changé
     url = f"{FASTAPI_BASE_URL}{path}"
-    r = requests.get(url, params=params, timeout=10)
+    key = (url, tuple(sorted((params or {}).items())))
+    store = _etag_store()
+    headers = {"If-None-Match": store[key][0]} if key in store else {}
+    r = requests.get(url, params=params, headers=headers, timeout=10)
+    if r.status_code == 304:
+        return store[key][1]
     r.raise_for_status()
-    return r.json()
+    data = r.json()
+    if "ETag" in r.headers:
+        store[key] = (r.headers["ETag"], data)
+    return data
 
 
 def safe_df(data):
@@ -36,77 +51,89 @@ with st.sidebar:
             st.error(f"Erreur API: {e}")
 
 # --- Récupération données
-colA, colB, colC = st.columns(3)
-
-try:
-    produits = api_get("/produits", params={"limit": 200, "offset": 0})
-except Exception:
-    produits = []
-
-try:
-    devis = api_get("/devis", params={"limit": 200, "offset": 0})
-except Exception:
-    devis = []
+# Les agrégats sont calculés par l'API (/stats/*, GROUP BY en SQL): la réponse
+# reste de quelques Ko quel que soit le nombre de lignes en base.
+def api_get_or(path: str, default, params=None):
+    try:
+        return api_get(path, params=params)
+    except Exception:
+        return default
 
-try:
-    ventes = api_get("/ventes", params={"limit": 200, "offset": 0})
-except Exception:
-    ventes = []
 
-df_produits = safe_df(produits)
-df_devis = safe_df(devis)
-df_ventes = safe_df(ventes)
+counts = api_get_or("/stats/counts", {})
+pipeline = api_get_or("/stats/pipeline", {"devis": [], "ventes": []})
+top_devis = api_get_or("/stats/top-devis", [], params={"limit": 20})
 
 # --- KPI
+colA, colB, colC, colD = st.columns(4)
 with colA:
-    st.metric("Produits", len(df_produits))
+    st.metric("Produits", counts.get("produits", "-"))
 with colB:
-    st.metric("Devis", len(df_devis))
+    st.metric("Devis", counts.get("devis", "-"))
 with colC:
-    st.metric("Ventes", len(df_ventes))
+    st.metric("Ventes", counts.get("ventes", "-"))
+with colD:
+    st.metric("Actions", counts.get("actions", "-"))
 
-# --- Pipeline / stats simples
+# --- Pipeline / top devis
 st.divider()
 c1, c2 = st.columns([2, 3])
 
 with c1:
     st.subheader("Pipeline ventes (par status)")
-    if not df_ventes.empty and "status" in df_ventes.columns:
-        vc = (
-            df_ventes["status"]
-            .fillna("unknown")
-            .astype(str)
-            .value_counts()
-            .rename_axis("status")
-            .reset_index(name="count")
-        )
-        st.dataframe(vc, use_container_width=True)
+    df_pipe = safe_df(pipeline.get("ventes"))
+    if not df_pipe.empty:
+        st.dataframe(df_pipe, use_container_width=True)
     else:
-        st.info("Aucune vente ou champ status absent.")
+        st.info("Aucune vente.")
+
+    st.subheader("Devis (par status)")
+    df_pipe_devis = safe_df(pipeline.get("devis"))
+    if not df_pipe_devis.empty:
+        st.dataframe(df_pipe_devis, use_container_width=True)
+    else:
+        st.info("Aucun devis.")
 
 with c2:
     st.subheader("Top devis (montants)")
-    if not df_devis.empty and "total_amount" in df_devis.columns:
-        dd = df_devis.copy()
-        dd["total_amount"] = pd.to_numeric(dd["total_amount"], errors="coerce").fillna(0)
-        st.dataframe(dd.sort_values("total_amount", ascending=False).head(20), use_container_width=True)
+    df_top = safe_df(top_devis)
+    if not df_top.empty:
+        st.dataframe(df_top, use_container_width=True)
     else:
-        st.info("Aucun devis ou champ total_amount absent.")
+        st.info("Aucun devis avec montant.")
 
-# --- Tables détaillées
+# --- Chiffre d'affaires
+st.divider()
+st.subheader("Chiffre d'affaires (ventes gagnées)")
+by = st.radio("Par", ["campagne", "secteur", "owner"], horizontal=True)
+df_rev = safe_df(api_get_or("/stats/revenue", [], params={"by": by, "status": "won", "limit": 20}))
+if not df_rev.empty:
+    st.bar_chart(df_rev.assign(label=df_rev["label"].fillna("(aucun)")).set_index("label")["amount"])
+    st.dataframe(df_rev, use_container_width=True)
+else:
+    st.info("Aucune vente gagnée.")
+
+st.subheader("Chiffre d'affaires mensuel (12 derniers mois)")
+df_month = safe_df(api_get_or("/stats/revenue/monthly", [], params={"status": "won", "months": 12}))
+if not df_month.empty:
+    st.bar_chart(df_month.set_index("month")["amount"])
+else:
+    st.info("Aucune vente gagnée.")
+
+# --- Derniers éléments (une page, pas la table entière)
 st.divider()
 tab1, tab2, tab3 = st.tabs(["Produits", "Devis", "Ventes"])
 
 with tab1:
-    st.subheader("Liste Produits")
-    st.dataframe(df_produits, use_container_width=True)
+    st.subheader("Derniers produits")
+    st.dataframe(safe_df(api_get_or("/produits", [], params={"limit": 50})), use_container_width=True)
 
 with tab2:
-    st.subheader("Liste Devis")
-    st.dataframe(df_devis, use_container_width=True)
+    st.subheader("Derniers devis")
+    st.dataframe(safe_df(api_get_or("/devis", [], params={"limit": 50})), use_container_width=True)
 
 with tab3:
-    st.subheader("Liste Ventes")
-    st.dataframe(df_ventes, use_container_width=True)
+    st.subheader("Dernières ventes")
+    st.dataframe(safe_df(api_get_or("/ventes", [], params={"limit": 50})), use_container_width=True)
 
 st.caption("Données lues via FastAPI (réseau docker) — cache Streamlit 30s.")